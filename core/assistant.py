@@ -1,6 +1,8 @@
-from core.task_manager import route_command
-from modules.voice_interface import speak, listen
+from core.task_manager import route_command, route_command_stream
+from core.llm import prefetch_context
+from modules.voice_interface import speak, speak_stream, listen, speech_started, stt, GREETING, GOODBYE
 from modules.wakeword_detector import wait_for_wake_word
+from modules.lazy_loader import warm_up
 import smtplib
 from email.mime.text import MIMEText
 import schedule
@@ -8,9 +10,14 @@ import time
 import threading
 import os
 from dotenv import load_dotenv
+from modules.logger import log
+from modules.tracing import tracer
 
 load_dotenv()
 
+# Speak replies sentence by sentence while the LLM is still generating them.
+STREAMING_ENABLED = os.getenv("SANYA_STREAMING", "1") == "1"
+
 def notify(message: str, email: str = os.getenv("EMAIL_ADDRESS")):
     msg = MIMEText(message)
     msg['Subject'] = 'Sanya Notification'
@@ -22,13 +29,9 @@ def notify(message: str, email: str = os.getenv("EMAIL_ADDRESS")):
             server.starttls()
             server.login(os.getenv("EMAIL_ADDRESS"), os.getenv("EMAIL_PASSWORD"))
             server.sendmail(os.getenv("EMAIL_ADDRESS"), email, msg.as_string())
-        print(f"[Notification] Sent email: {message}")
-        with open("logs/sanya.log", "a", encoding="utf-8") as log_file:
-            log_file.write(f"[Notification] Sent email: {message}\n")
+        log.info(f"[Notification] Sent email: {message}")
     except Exception as e:
-        print(f"[Notification] Error sending email: {e}")
-        with open("logs/sanya.log", "a", encoding="utf-8") as log_file:
-            log_file.write(f"[Notification] Error sending email: {e}\n")
+        log.error(f"[Notification] Error sending email: {e}")
 
 def schedule_task(task: callable, interval_minutes: int):
     schedule.every(interval_minutes).minutes.do(task)
@@ -37,16 +40,34 @@ def schedule_task(task: callable, interval_minutes: int):
             schedule.run_pending()
             time.sleep(60)
     threading.Thread(target=run_schedule, daemon=True).start()
-    print(f"[Schedule] Scheduled task to run every {interval_minutes} minutes")
-    with open("logs/sanya.log", "a", encoding="utf-8") as log_file:
-        log_file.write(f"[Schedule] Scheduled task to run every {interval_minutes} minutes\n")
+    log.info(f"[Schedule] Scheduled task to run every {interval_minutes} minutes")
+
+def respond_streaming(user_input: str) -> str:
+    speech = None
+
+    def say(sentence):
+        # The audio stream is only opened once there is something to say, so task
+        # replies are spoken the usual way after they have run.
+        nonlocal speech
+        if speech is None:
+            speech = speak_stream()
+        speech.say(sentence)
+
+    response, spoken = route_command_stream(user_input, say)
+    if speech is not None:
+        speech.close()
+    if not spoken:
+        speak(response)
+    return response
 
 def run_assistant():
-    greeting = "Hello Sir. I am Sanya, Your Systematic Artificial Neural Yielded Assistant. How can I help you today?"
-    speak(greeting)
-    print(greeting)
-    with open("logs/sanya.log", "a", encoding="utf-8") as log_file:
-        log_file.write(f"{greeting}\n")
+    # Load models in the background in the order they are first needed: TTS for the
+    # greeting, then the wake word, then the models used once a command is heard.
+    offline_stt = ["vosk"] if stt.name == "vosk" else []
+    warm_up(["tts", "wake_word"] + offline_stt + ["tts_phrases", "sentence_transformer", "sentiment"])
+
+    speak(GREETING)
+    log.info(GREETING)
 
     # Example: Schedule a task to notify every 60 minutes
     def check_status():
@@ -54,28 +75,34 @@ def run_assistant():
     schedule_task(check_status, 60)
 
     while True:
-        wait_for_wake_word()
-        speak("Yes sir.", 1)
-        user_input = listen()
-        print(f"You: {user_input}")
-        with open("logs/sanya.log", "a", encoding="utf-8") as log_file:
-            log_file.write(f"You: {user_input}\n")
+        tracer.begin_turn()
+        wake_at = wait_for_wake_word()
+        if speech_started(wake_at):
+            # "Sanya, open notepad" in one breath: no acknowledgement, and the audio
+            # after the wake word goes straight to recognition
+            tracer.since("wake", "wake.trigger")
+            user_input = listen(since=wake_at, on_partial=prefetch_context)
+        else:
+            speak("Yes sir.", 1)
+            tracer.since("wake", "wake.trigger")
+            user_input = listen(on_partial=prefetch_context)
+        tracer.mark("heard")
+        log.info(f"You: {user_input}")
 
         exit_phrases = ["exit", "quit", "bye", "goodbye", "thank you", "your work is done", "you can go", "well done"]
 
         if any(phrase in user_input.lower() for phrase in exit_phrases):
-            goodbye = "Goodbye Sir. Have a great day."
-            speak(goodbye, 2)
-            print(f"Sanya: {goodbye}")
-            with open("logs/sanya.log", "a", encoding="utf-8") as log_file:
-                log_file.write(f"Sanya: {goodbye}\n")
+            speak(GOODBYE, 2)
+            log.info(f"Sanya: {GOODBYE}")
             break
 
-        response = route_command(user_input)
-        speak(response)
-        print(f"Sanya: {response}")
-        with open("logs/sanya.log", "a", encoding="utf-8") as log_file:
-            log_file.write(f"Sanya: {response}\n")
+        with tracer.span("turn.respond"):
+            if STREAMING_ENABLED:
+                response = respond_streaming(user_input)
+            else:
+                response = route_command(user_input)
+                speak(response)
+        log.info(f"Sanya: {response}")
 
 if __name__ == "__main__":
     run_assistant()
\ No newline at end of file
@@ -0,0 +1,108 @@
+import os
+import re
+import difflib
+import threading
+from modules.logger import log
+
+# Rough size limit for the project section of each code_project step prompt.
+STEP_TOKEN_BUDGET = int(os.getenv("SANYA_STEP_TOKEN_BUDGET", "6000"))
+CHARS_PER_TOKEN = 4
+SUMMARY_NAMES = 12  # definitions listed per summarised file
+
+DEFINITION = re.compile(
+    r"^\s*(?:async\s+)?(?:def|class|function)\s+([A-Za-z_$][\w$]*)"  # Python / JS
+    r"|^\s*(?:const|let|var)\s+([A-Za-z_$][\w$]*)\s*=\s*(?:async\s*)?(?:function|\()"  # JS arrow/function values
+    r"|^([^{}\n/@][^{}\n]*?)\s*\{"  # CSS selectors
+    r"|\bid=[\"']([^\"']+)[\"']",  # HTML ids
+    re.MULTILINE,
+)
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+def summarize_file(filename: str, content: str) -> str:
+    names = []
+    for match in DEFINITION.finditer(content):
+        name = next(group for group in match.groups() if group).strip()
+        if name not in names:
+            names.append(name)
+    summary = f"{len(content.splitlines())} lines"
+    if names:
+        more = f", +{len(names) - SUMMARY_NAMES} more" if len(names) > SUMMARY_NAMES else ""
+        summary += f"; defines {', '.join(names[:SUMMARY_NAMES])}{more}"
+    return summary
+
+
+class ContextBudgeter:
+    """
+    Builds code_project step prompts within a token budget. Files the step is about
+    (those it names, or all of them when it names none) are sent in full, most
+    recently changed first; other files that changed since the previous step are sent
+    as a unified diff, and the rest as a one-line summary. Whatever does not fit the
+    budget is summarised too.
+    """
+
+    def __init__(self, budget: int = STEP_TOKEN_BUDGET):
+        self.budget = budget
+        self.previous = {}  # filename -> content at the previous step
+        self.sizes = []  # (step, tokens, {"full": n, "diff": n, "summary": n})
+        self.lock = threading.Lock()  # steps may build prompts concurrently
+
+    def _diff(self, filename: str, content: str) -> str:
+        return "".join(difflib.unified_diff(
+            self.previous[filename].splitlines(keepends=True), content.splitlines(keepends=True),
+            fromfile=f"{filename} (previous step)", tofile=filename,
+        ))
+
+    def build_step_prompt(self, step: int, step_desc: str, step_output: str, files: dict, changed=None) -> str:
+        """`changed` lists files changed by the previous step, when the caller tracks that."""
+        with self.lock:
+            return self._build_step_prompt(step, step_desc, step_output, files, changed)
+
+    def _build_step_prompt(self, step: int, step_desc: str, step_output: str, files: dict, changed=None) -> str:
+        header = (
+            f"Complete step {step}: {step_desc}\nExpected output: {step_output}\n"
+            "Generate the required content and return it in a code_project task. Do not prompt the user.\n"
+            "Only change files shown in full, and return their complete contents.\n"
+            "Project files:\n"
+        )
+        mentioned = {name for name in files if os.path.basename(name).lower() in step_desc.lower()}
+        relevant = mentioned or set(files)
+        if changed is None:
+            changed = {name for name in files if self.previous.get(name) != files[name]}
+        changed = set(changed)
+        order = sorted(files, key=lambda name: (name not in relevant, name not in changed, name))
+
+        remaining = self.budget - estimate_tokens(header)
+        sections = []
+        counts = {"full": 0, "diff": 0, "summary": 0}
+        for filename in order:
+            content = files[filename]
+            kind, text = "summary", f"--- {filename} (summary: {summarize_file(filename, content)})"
+            if filename in relevant:
+                candidate = f"--- {filename} (full)\n{content}"
+                if estimate_tokens(candidate) <= remaining:
+                    kind, text = "full", candidate
+            elif filename in changed and filename in self.previous:
+                diff = self._diff(filename, content)
+                candidate = f"--- {filename} (changed in the previous step)\n{diff}"
+                if diff and estimate_tokens(candidate) <= remaining:
+                    kind, text = "diff", candidate
+            if estimate_tokens(text) > remaining:
+                text = f"--- {filename}"
+            sections.append(text)
+            remaining -= estimate_tokens(text)
+            counts[kind] += 1
+        self.previous = dict(files)
+
+        prompt = header + ("\n".join(sections) if sections else "(none yet)")
+        tokens = estimate_tokens(prompt)
+        self.sizes.append((step, tokens, counts))
+        log.info(f"[TaskManager] Step {step} prompt: ~{tokens} tokens (budget {self.budget}; {counts})")
+        return prompt
+
+    def report(self) -> str:
+        return ", ".join(
+            f"step {step} ~{tokens} tok ({counts['full']} full, {counts['diff']} diff, {counts['summary']} summary)"
+            for step, tokens, counts in self.sizes
+        )
@@ -1,19 +1,45 @@
-import google.generativeai as genai
 import os
 import json
 import re
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
 from datetime import datetime
+from functools import lru_cache
 import pytz
 
 from core.memory_manager import MemoryManager
+from modules.topic_classifier import TopicClassifier
+from modules.vector_store import EMBEDDINGS
+from core.response_cache import ResponseCache
+from core.llm_backend import create_client
+from modules.logger import log
+from modules.tracing import tracer
 
 from dotenv import load_dotenv
 
 load_dotenv()
 
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-model = genai.GenerativeModel("gemini-2.0-flash")
+# All model calls go through one client: SANYA_LLM_BACKEND=local swaps Gemini for the
+# offline stand-in. Deadlines (seconds) cover queueing, retries and backoff per call.
+llm = create_client()
+LLM_DEADLINES = {"reply": 30.0, "reasoning": 10.0, "classify": 8.0}
 memory = MemoryManager()
+topic_classifier = TopicClassifier()
+
+# The separate reasoning call never fed the main prompt, so it is off unless asked for;
+# when enabled its steps are added to the prompt as a plan.
+REASONING_ENABLED = os.getenv("SANYA_REASONING", "0") == "1"
+# Per-part latency budgets (seconds) for context assembly in ask_llm.
+CONTEXT_BUDGETS = {"short_term": 0.1, "long_term": 0.75, "reasoning": 4.0}
+context_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="context")
+prefetched = {}  # normalised partial transcript -> context lookup futures
+prefetch_lock = threading.Lock()
+response_cache = ResponseCache(embed=EMBEDDINGS.encode)
+# Parsing, remembering and caching a streamed reply happens off the speech path; one
+# worker keeps turns in order, and the next turn's short-term lookup waits for it.
+bookkeeping_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="bookkeeping")
+pending_bookkeeping = None
 
 def reason(prompt: str) -> list:
     reasoning_prompt = f"""
@@ -22,53 +48,108 @@ def reason(prompt: str) -> list:
     Prompt: "{prompt}"
     """
     try:
-        response = model.generate_content(reasoning_prompt).text.strip()
-        print(f"[LLM] Raw reasoning response: {response}")  # Debug log
+        response = llm.generate(reasoning_prompt, timeout=LLM_DEADLINES["reasoning"]).strip()
+        log.debug(f"[LLM] Raw reasoning response: {response}")
         response = re.sub(r'^```json\s*|\s*```$', '', response).strip()
         response = re.sub(r'\\(?![nrt"\\])', '', response)  # Remove invalid escapes
         if not response.startswith("{"):
             raise json.JSONDecodeError("No JSON object found", response, 0)
         return json.loads(response).get("steps", [])
     except json.JSONDecodeError as e:
-        print(f"[LLM] Reasoning error (JSON Decode): {str(e)}. Using default steps.")
-        with open("logs/sanya.log", "a", encoding="utf-8") as log_file:
-            log_file.write(f"[LLM] Reasoning error (JSON Decode): {str(e)}. Raw response: {response}\n")
+        log.error(f"[LLM] Reasoning error (JSON Decode): {str(e)}. Using default steps.")
         return ["1. Analyze the prompt", "2. Generate initial code", "3. Test and refine"]
     except Exception as e:
-        print(f"[LLM] Reasoning error: {str(e)}. Using default steps.")
-        with open("logs/sanya.log", "a", encoding="utf-8") as log_file:
-            log_file.write(f"[LLM] Reasoning error: {str(e)}\n")
+        log.error(f"[LLM] Reasoning error: {str(e)}. Using default steps.")
         return ["1. Analyze the prompt", "2. Generate initial code", "3. Test and refine"]
 
-def ask_llm(prompt: str, iteration: int = 0, previous_response: str = None) -> dict:
-    try:
-        steps = reason(prompt) if iteration == 0 else []
-        if steps and iteration == 0:
-            print(f"[LLM] Reasoning steps: {steps}")
-            with open("logs/sanya.log", "a", encoding="utf-8") as log_file:
-                log_file.write(f"[LLM] Reasoning steps: {steps}\n")
-            for step in steps:
-                print(f"[LLM] Processing step: {step}")
-                with open("logs/sanya.log", "a", encoding="utf-8") as log_file:
-                    log_file.write(f"[LLM] Processing step: {step}\n")
-
-        short_term_context = memory.get_short_term_context(context_window=memory.last_topic)
-        long_term_context = memory.search_long_term_memory(prompt)
-        memory_context = "\n\n".join([
-            "[SHORT-TERM MEMORY CONTEXT]\n" + short_term_context,
-            "[LONG-TERM MEMORY CONTEXT]\n" + long_term_context,
-        ])
-
-        ist = pytz.timezone('Asia/Kolkata')
-        current_time = datetime.now(ist)
-        date_str = current_time.strftime("%B %d, %Y")
-        time_str = current_time.strftime("%I:%M %p")
-        # Prepare the prompt with iteration context
-        iteration_context = ""
-        if previous_response:
-            iteration_context = f"\nPrevious Response:\n{previous_response}\n\nNow refine or proceed with the next step."
-
-        full_prompt = f"""
+def _short_term_context() -> str:
+    if pending_bookkeeping is not None:
+        pending_bookkeeping.result()
+    return memory.get_short_term_context(context_window=memory.last_topic)
+
+def _context_jobs(prompt: str) -> dict:
+    return {
+        "short_term": context_pool.submit(_short_term_context),
+        "long_term": context_pool.submit(memory.search_long_term_memory, prompt),
+    }
+
+def _prefetch_key(text: str) -> str:
+    return " ".join(re.sub(r"[^\w\s']", " ", text.lower()).split())
+
+def prefetch_context(partial: str):
+    """
+    Starts the context lookups for a partial transcript while the user is still
+    speaking. If the final transcript matches, assemble_context uses these results;
+    if not, the lookups have still loaded the embedding model and warmed the caches.
+    At most one prefetch runs at a time.
+    """
+    key = _prefetch_key(partial)
+    with prefetch_lock:
+        if not key or key in prefetched:
+            return
+        if any(not future.done() for jobs in prefetched.values() for future in jobs.values()):
+            return
+        prefetched.clear()
+        prefetched[key] = _context_jobs(partial)
+
+def assemble_context(prompt: str, iteration: int = 0) -> dict:
+    """
+    Runs the independent context lookups concurrently, or picks up the ones
+    prefetch_context() started for this prompt. Each part gets CONTEXT_BUDGETS
+    seconds from the start of assembly; a part that misses its budget is left empty
+    (it keeps running in the background) so a slow lookup cannot stall the turn.
+    """
+    start = time.perf_counter()
+    jobs = None
+    if iteration == 0:
+        with prefetch_lock:
+            jobs = prefetched.pop(_prefetch_key(prompt), None)
+            prefetched.clear()
+    if jobs is None:
+        jobs = _context_jobs(prompt)
+    if REASONING_ENABLED and iteration == 0:
+        jobs["reasoning"] = context_pool.submit(reason, prompt)
+
+    parts, timings = {}, {}
+    for name, future in jobs.items():
+        remaining = CONTEXT_BUDGETS[name] - (time.perf_counter() - start)
+        try:
+            parts[name] = future.result(timeout=max(remaining, 0))
+            timings[name] = f"{(time.perf_counter() - start) * 1000:.0f}ms"
+            tracer.record(f"llm.context.{name}", time.perf_counter() - start)
+        except FuturesTimeoutError:
+            parts[name] = None
+            timings[name] = f"timeout>{CONTEXT_BUDGETS[name] * 1000:.0f}ms"
+        except Exception as e:
+            parts[name] = None
+            timings[name] = f"error: {e}"
+    log.debug(f"[LLM] Context assembly: {timings}")
+    return parts
+
+def build_prompt(prompt: str, iteration: int = 0, previous_response: str = None) -> str:
+    with tracer.span("llm.context"):
+        context = assemble_context(prompt, iteration)
+    steps = context.get("reasoning") or []
+    if steps:
+        log.info(f"[LLM] Reasoning steps: {steps}")
+
+    memory_context = "\n\n".join([
+        "[SHORT-TERM MEMORY CONTEXT]\n" + (context["short_term"] or ""),
+        "[LONG-TERM MEMORY CONTEXT]\n" + (context["long_term"] or ""),
+    ])
+    if steps:
+        memory_context += "\n\n[PLAN]\n" + "\n".join(f"- {step}" for step in steps)
+
+    ist = pytz.timezone('Asia/Kolkata')
+    current_time = datetime.now(ist)
+    date_str = current_time.strftime("%B %d, %Y")
+    time_str = current_time.strftime("%I:%M %p")
+    # Prepare the prompt with iteration context
+    iteration_context = ""
+    if previous_response:
+        iteration_context = f"\nPrevious Response:\n{previous_response}\n\nNow refine or proceed with the next step."
+
+    return f"""
         You are Sanya, an intelligent assistant. You MUST reply in strict JSON format for action commands, or natural language if the user is just asking something general.
         For a JSON format, return only the JSON object (e.g., {{ "task": "create_file", "filename": ..., "content": ... }}).
         If the user says:
@@ -78,9 +159,12 @@ def ask_llm(prompt: str, iteration: int = 0, previous_response: str = None) -> d
         - "Check CPU usage" → reply as JSON: {{ "task": "get_system_info", "info_type": "check_cpu" }}
         - "What's the date today" → reply naturally: "Today's date is {date_str}."
         - "What's the time" → reply naturally: "The current time is {time_str}."
-        - "Write a Python script for..." → break down the task into steps, generate the script, and reply as JSON: {{ "task": "code_project", "language": "python", "steps": [...], "files": [{{"filename": ..., "content": ...}}], "run": true, "test": true }}
+        - "Write a Python script for..." → break down the task into steps, generate the script, and reply as JSON: {{ "task": "code_project", "language": "python", "steps": [...], "files": [{{"filename": ..., "content": ...}}], "run": true, "test": true, "tests": [{{"input": stdin text, "expected": expected output}}] }}
         - "Create a web app for..." → break down the task into steps, generate HTML/CSS/JS files, and reply as JSON: {{ "task": "code_project", "language": "web", "steps": [...], "files": [{{"filename": ..., "content": ...}}], "run": true, "test": true }}
+        - Each code_project step may be a string or {{ "step": ..., "files": [files it changes], "depends_on": [earlier step numbers] }}; steps on separate files can run in parallel.
         - "Edit the script..." → update the specified file and reply as JSON: {{ "task": "edit_file", "filename": ..., "content": ... }}
+        - "Which web apps are running" → reply as JSON: {{ "task": "list_web_servers" }}
+        - "Stop the web app on port..." → reply as JSON: {{ "task": "stop_web_server", "port": ... }}
         - "Search for..." → reply as JSON: {{ "task": "web_search", "query": ... }}
         
         Here is your memory context:
@@ -91,25 +175,102 @@ def ask_llm(prompt: str, iteration: int = 0, previous_response: str = None) -> d
         Now respond to: "{prompt}"
         """.strip()
 
-        response = model.generate_content(full_prompt)
-        reply = response.text.strip()
+JSON_FENCE = "```json"
+
+def is_json_reply(text: str) -> bool:
+    """True once the start of a reply shows it is a JSON task rather than speech."""
+    return text.lstrip().startswith(("{", JSON_FENCE))
+
+def decode_task(reply: str):
+    """
+    The JSON task a reply carries, or None for a spoken reply. A ```json block that
+    does not parse is treated as speech; a bare { reply that does not parse raises.
+    """
+    reply = reply.strip()
+    if reply.startswith("{"):
+        return json.loads(reply)
+    if reply.startswith(JSON_FENCE):
+        try:
+            return json.loads(re.sub(r'^```json\s*|\s*```$', '', reply))
+        except json.JSONDecodeError:
+            return None
+    return None
+
+def parse_reply(prompt: str, reply: str) -> dict:
+    task = decode_task(reply)
+    if task is not None:
+        return task
+    reply = reply.strip()
+    memory.append_to_short_term("user", prompt)
+    memory.append_to_short_term("assistant", reply)
+    return {"reply": reply}
 
-        if reply.startswith("{"):
-            return json.loads(reply)
-        elif reply.startswith("```json"):
-            return json.loads(reply[7:-3])
-        else:
-            memory.append_to_short_term("user", prompt)
-            memory.append_to_short_term("assistant", reply)
-            return {"reply": reply}
+def ask_llm(prompt: str, iteration: int = 0, previous_response: str = None) -> dict:
+    # Only top-level user turns are cacheable; project steps depend on evolving files
+    cacheable = iteration == 0 and previous_response is None
+    try:
+        if cacheable:
+            with tracer.span("llm.cache"):
+                cached = response_cache.get(prompt)
+            if cached is not None:
+                log.info(f"[LLM] Response cache hit for: {prompt} {response_cache.stats()}")
+                return cached
+
+        full_prompt = build_prompt(prompt, iteration, previous_response)
+        with tracer.span("llm.generate"):
+            reply = llm.generate(full_prompt, timeout=LLM_DEADLINES["reply"])
+        with tracer.span("llm.parse"):
+            result = parse_reply(prompt, reply)
+        if cacheable:
+            response_cache.put(prompt, result)
+        return result
 
     except Exception as e:
-        print(f"[LLM] Error: {str(e)}")
-        with open("logs/sanya.log", "a", encoding="utf-8") as log_file:
-            log_file.write(f"[LLM] Error: {str(e)}\n")
+        log.error(f"[LLM] Error: {str(e)}")
         return {"error": str(e)}
 
-def classify_message(text):
+def ask_llm_stream(prompt: str):
+    """
+    Streaming variant of ask_llm for top-level user turns. Yields the reply text as it
+    is generated; once the stream is exhausted the reply is parsed, remembered and
+    cached exactly as ask_llm would, but on the bookkeeping thread, so the last
+    sentence reaches speech without waiting for it. A cached response is yielded in
+    one piece (tasks as their JSON). Errors are raised to the caller.
+    """
+    global pending_bookkeeping
+    with tracer.span("llm.cache"):
+        cached = response_cache.get(prompt)
+    if cached is not None:
+        log.info(f"[LLM] Response cache hit for: {prompt} {response_cache.stats()}")
+        yield cached["reply"] if "reply" in cached else json.dumps(cached)
+        return
+
+    full_prompt = build_prompt(prompt)
+    start = time.perf_counter()
+    first_chunk_at = None
+    parts = []
+    for text in llm.stream(full_prompt, timeout=LLM_DEADLINES["reply"]):
+        if not text:
+            continue
+        if first_chunk_at is None:
+            first_chunk_at = time.perf_counter() - start
+            tracer.record("llm.first_chunk", first_chunk_at)
+        parts.append(text)
+        yield text
+
+    total = time.perf_counter() - start
+    tracer.record("llm.stream", total)
+    log.info(f"[LLM] Streamed reply (first chunk {first_chunk_at or 0:.2f}s, total {total:.2f}s)")
+    pending_bookkeeping = bookkeeping_pool.submit(_remember_streamed, prompt, "".join(parts))
+
+def _remember_streamed(prompt: str, reply: str):
+    try:
+        with tracer.span("llm.parse"):
+            response_cache.put(prompt, parse_reply(prompt, reply))
+    except Exception as e:
+        log.error(f"[LLM] Could not remember streamed reply: {str(e)}")
+
+def _classify_with_llm(text):
     classification_prompt = f"""
     You are a classifier bot. Analyze the following message for its topic and importance based on context, intent, and sentiment.
     Return a single JSON object in the format: {{"topic": "<topic>", "important": true or false}}
@@ -117,13 +278,26 @@ def classify_message(text):
     Mark as important if the message involves personal details, feedback, instructions, coding requests, or critical tasks.
     Message: "{text}"
     """
+    response = llm.generate(classification_prompt, timeout=LLM_DEADLINES["classify"]).strip()
+    match = re.search(r'\{.*?\}', response, re.DOTALL)
+    if not match:
+        raise ValueError(f"No JSON object in classifier response: {response}")
+    return json.loads(match.group(0))
+
+@lru_cache(maxsize=1024)
+def _classify_cached(text):
+    # Exceptions propagate uncached, so a failed LLM call is retried next time
+    topic, important, confidence = topic_classifier.classify(text)
+    if topic is not None:
+        return topic, important
+    log.info(f"[LLM] Local classification unsure ({confidence:.2f}), asking the LLM.")
+    result = _classify_with_llm(text)
+    return result.get("topic", "unknown"), bool(result.get("important", False))
+
+def classify_message(text):
     try:
-        response = model.generate_content(classification_prompt).text.strip()
-        match = re.search(r'\{.*?\}', response, re.DOTALL)
-        if match:
-            return json.loads(match.group(0))
+        topic, important = _classify_cached(" ".join(text.split()))
+        return {"topic": topic, "important": important}
     except Exception as e:
-        print(f"[LLM] Classification error: {str(e)}")
-        with open("logs/sanya.log", "a", encoding="utf-8") as log_file:
-            log_file.write(f"[LLM] Classification error: {str(e)}\n")
-    return {"topic": "unknown", "important": False}
\ No newline at end of file
+        log.error(f"[LLM] Classification error: {str(e)}")
+    return {"topic": "unknown", "important": False}
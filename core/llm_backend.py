@@ -0,0 +1,227 @@
+import os
+import re
+import json
+import time
+import random
+import hashlib
+import threading
+from modules.logger import log
+
+# Backend selection and call policy; all overridable from the environment.
+LLM_BACKEND = os.getenv("SANYA_LLM_BACKEND", "gemini")
+GEMINI_MODEL = os.getenv("SANYA_GEMINI_MODEL", "gemini-2.0-flash")
+LLM_MAX_CONCURRENCY = int(os.getenv("SANYA_LLM_CONCURRENCY", "4"))
+LLM_MAX_RETRIES = int(os.getenv("SANYA_LLM_RETRIES", "2"))
+LLM_BACKOFF_BASE = 0.5  # seconds; attempt n waits up to base * 2**n (full jitter)
+LLM_BACKOFF_MAX = 4.0
+LOCAL_LATENCY = float(os.getenv("SANYA_LOCAL_LATENCY", "0.2"))  # seconds before the first chunk
+LOCAL_CHUNK_LATENCY = float(os.getenv("SANYA_LOCAL_CHUNK_LATENCY", "0.02"))
+
+# Errors worth another attempt, matched by class name so the Google client libraries
+# don't have to be imported to recognise them.
+RETRYABLE_ERRORS = {
+    "TimeoutError", "ConnectionError", "ConnectionResetError",
+    "DeadlineExceeded", "ServiceUnavailable", "ResourceExhausted",
+    "InternalServerError", "TooManyRequests", "Aborted",
+}
+
+class LLMTimeoutError(TimeoutError):
+    pass
+
+
+class LLMBackend:
+    """Minimal interface every backend implements."""
+    name = "base"
+
+    def generate(self, prompt: str, timeout: float) -> str:
+        raise NotImplementedError
+
+    def stream(self, prompt: str, timeout: float):
+        yield self.generate(prompt, timeout)
+
+
+class GeminiBackend(LLMBackend):
+    """
+    Google Gemini via google.generativeai. The library is configured and the model
+    created on first use; the one model object (and the client connection under it)
+    is shared by every call and thread.
+    """
+    name = "gemini"
+
+    def __init__(self, model_name: str = GEMINI_MODEL, api_key: str = None):
+        self.model_name = model_name
+        self.api_key = api_key
+        self.model = None
+        self.lock = threading.Lock()
+
+    def _model(self):
+        if self.model is None:
+            with self.lock:
+                if self.model is None:
+                    import google.generativeai as genai
+                    genai.configure(api_key=self.api_key or os.getenv("GEMINI_API_KEY"))
+                    self.model = genai.GenerativeModel(self.model_name)
+        return self.model
+
+    def generate(self, prompt: str, timeout: float) -> str:
+        response = self._model().generate_content(prompt, request_options={"timeout": timeout})
+        return response.text
+
+    def stream(self, prompt: str, timeout: float):
+        response = self._model().generate_content(prompt, stream=True, request_options={"timeout": timeout})
+        for chunk in response:
+            yield chunk.text
+
+
+class LocalBackend(LLMBackend):
+    """
+    Offline stand-in that answers deterministically from the prompt, after a
+    configurable delay, so the whole pipeline can be exercised and load-tested
+    without network access. It recognises the classifier, reasoning and assistant
+    prompts from core/llm and replies in the shape each one expects.
+    """
+    name = "local"
+
+    def __init__(self, latency: float = LOCAL_LATENCY, chunk_latency: float = LOCAL_CHUNK_LATENCY):
+        self.latency = latency
+        self.chunk_latency = chunk_latency
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def reply_for(self, prompt: str) -> str:
+        if "You are a classifier bot" in prompt:
+            return json.dumps({"topic": "unknown", "important": False})
+        if "list of actionable steps" in prompt:
+            return json.dumps({"steps": ["1. Analyze the prompt", "2. Act on it", "3. Report back"]})
+
+        match = re.search(r'Now respond to: "(.*)"\s*$', prompt, re.DOTALL)
+        command = (match.group(1) if match else prompt).strip()
+        lowered = command.lower()
+        if "cpu" in lowered:
+            return json.dumps({"task": "get_system_info", "info_type": "check_cpu"})
+        if lowered.startswith("open "):
+            return json.dumps({"task": "open_app", "app": command[5:].strip()})
+        if lowered.startswith(("search for ", "search ")):
+            return json.dumps({"task": "web_search", "query": command.split(" ", 2)[-1]})
+        digest = hashlib.sha1(command.encode("utf-8")).hexdigest()[:8]
+        return f"This is a local test reply. You said: {command}. Reference {digest}."
+
+    def _sleep(self, seconds: float, deadline: float):
+        if time.monotonic() + seconds > deadline:
+            time.sleep(max(deadline - time.monotonic(), 0))
+            raise LLMTimeoutError("local backend exceeded the call deadline")
+        time.sleep(seconds)
+
+    def generate(self, prompt: str, timeout: float) -> str:
+        return "".join(self.stream(prompt, timeout))
+
+    def stream(self, prompt: str, timeout: float):
+        deadline = time.monotonic() + timeout
+        with self.lock:
+            self.calls += 1
+        self._sleep(self.latency, deadline)
+        words = re.findall(r"\S+\s*", self.reply_for(prompt))
+        for i in range(0, len(words), 4):
+            if i:
+                self._sleep(self.chunk_latency, deadline)
+            yield "".join(words[i:i + 4])
+
+
+BACKENDS = {"gemini": GeminiBackend, "local": LocalBackend}
+
+
+class LLMClient:
+    """
+    Front end used by core/llm. Every call gets a deadline covering queueing, all
+    attempts and backoff; retryable failures are retried a bounded number of times
+    with full-jitter exponential backoff; and at most `max_concurrency` calls are in
+    flight against the backend at once.
+    """
+
+    def __init__(self, backend: LLMBackend, max_concurrency: int = LLM_MAX_CONCURRENCY,
+                 max_retries: int = LLM_MAX_RETRIES):
+        self.backend = backend
+        self.max_retries = max_retries
+        self.slots = threading.BoundedSemaphore(max_concurrency)
+        self.stats_lock = threading.Lock()
+        self.calls = 0
+        self.retries = 0
+        self.failures = 0
+
+    @staticmethod
+    def is_retryable(error: Exception) -> bool:
+        return any(cls.__name__ in RETRYABLE_ERRORS for cls in type(error).__mro__)
+
+    def _acquire(self, deadline: float):
+        if not self.slots.acquire(timeout=max(deadline - time.monotonic(), 0)):
+            raise LLMTimeoutError("timed out waiting for a free LLM slot")
+
+    def _backoff(self, attempt: int, deadline: float, error: Exception):
+        delay = random.uniform(0, min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * 2 ** attempt))
+        with self.stats_lock:
+            if time.monotonic() + delay >= deadline:
+                self.failures += 1
+                raise error
+            self.retries += 1
+        log.warning(f"[LLM] {self.backend.name} call failed ({type(error).__name__}: {error}); retrying in {delay:.2f}s")
+        time.sleep(delay)
+
+    def _attempts(self, timeout: float):
+        deadline = time.monotonic() + timeout
+        with self.stats_lock:
+            self.calls += 1
+        for attempt in range(self.max_retries + 1):
+            if time.monotonic() >= deadline:
+                break
+            yield attempt, deadline
+        with self.stats_lock:
+            self.failures += 1
+        raise LLMTimeoutError(f"LLM call did not complete within {timeout:.1f}s")
+
+    def generate(self, prompt: str, timeout: float) -> str:
+        for attempt, deadline in self._attempts(timeout):
+            self._acquire(deadline)
+            try:
+                return self.backend.generate(prompt, max(deadline - time.monotonic(), 0.001))
+            except Exception as e:
+                if not self.is_retryable(e) or attempt == self.max_retries:
+                    with self.stats_lock:
+                        self.failures += 1
+                    raise
+                error = e
+            finally:
+                self.slots.release()
+            self._backoff(attempt, deadline, error)
+
+    def stream(self, prompt: str, timeout: float):
+        """Like generate, but yields chunks. Only failures before the first chunk are retried."""
+        for attempt, deadline in self._attempts(timeout):
+            self._acquire(deadline)
+            started = False
+            try:
+                for chunk in self.backend.stream(prompt, max(deadline - time.monotonic(), 0.001)):
+                    if time.monotonic() > deadline:
+                        raise LLMTimeoutError(f"LLM stream did not complete within {timeout:.1f}s")
+                    started = True
+                    yield chunk
+                return
+            except Exception as e:
+                if started or not self.is_retryable(e) or attempt == self.max_retries:
+                    with self.stats_lock:
+                        self.failures += 1
+                    raise
+                error = e
+            finally:
+                self.slots.release()
+            self._backoff(attempt, deadline, error)
+
+    def stats(self) -> dict:
+        with self.stats_lock:
+            return {"backend": self.backend.name, "calls": self.calls, "retries": self.retries, "failures": self.failures}
+
+
+def create_client(name: str = None, **backend_options) -> LLMClient:
+    name = name or LLM_BACKEND
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown LLM backend '{name}'. Choose from: {', '.join(BACKENDS)}")
+    return LLMClient(BACKENDS[name](**backend_options))
@@ -1,11 +1,32 @@
 import os
 import time
+import atexit
+import threading
+from collections import deque, defaultdict
 from datetime import datetime
-from modules.vector_store import search_vector_store, add_to_vector_store
+from modules.vector_store import search_vector_store, add_many
 import json
+from modules.logger import log
 
 SHORT_TERM_MEMORY_PATH = "memory/short_term.json"
 SNAPSHOT_DIR = "memory/long_term/snapshots"
+PERSIST_DELAY = 2.0  # seconds of quiet before short-term memory is written to disk
+
+class MemoryRecord:
+    __slots__ = ("role", "message", "topic", "important")
+
+    def __init__(self, role: str, message: str, topic: str = "unknown", important: bool = False):
+        self.role = role
+        self.message = message
+        self.topic = topic
+        self.important = important
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "MemoryRecord":
+        return cls(data["role"], data["message"], data.get("topic", "unknown"), data.get("important", False))
+
+    def to_dict(self) -> dict:
+        return {"role": self.role, "message": self.message, "topic": self.topic, "important": self.important}
 
 class MemoryManager:
     def __init__(self):
@@ -13,142 +34,160 @@ class MemoryManager:
         os.makedirs(os.path.dirname(SHORT_TERM_MEMORY_PATH), exist_ok=True)
         self.flush_threshold = 5
         self.last_topic = None
-        # Initialize short-term memory file if it doesn't exist
+        # Short-term memory lives in memory; the file is only read here and written back
+        # (debounced, atomically) after changes and at shutdown.
+        self.buffer = deque()
+        self.by_topic = defaultdict(deque)
+        self.lock = threading.RLock()
+        self.io_lock = threading.Lock()
+        self.dirty = False
+        self.persist_timer = None
+        atexit.register(self.flush)
+
+        memory = []
+        from_snapshot = False
         if not os.path.exists(SHORT_TERM_MEMORY_PATH) or os.path.getsize(SHORT_TERM_MEMORY_PATH) == 0:
             with open(SHORT_TERM_MEMORY_PATH, "w", encoding="utf-8") as f:
                 json.dump([], f)
-            print("[MemoryManager] Initialized empty short_term.json")
-            with open("logs/sanya.log", "a", encoding="utf-8") as log_file:
-                log_file.write("[MemoryManager] Initialized empty short_term.json\n")
+            log.info("[MemoryManager] Initialized empty short_term.json")
         else:
             snapshots = sorted(
                 [f for f in os.listdir(SNAPSHOT_DIR) if f.startswith("short_term_snapshot")],
                 reverse=True
             )
+            source = os.path.join(SNAPSHOT_DIR, snapshots[0]) if snapshots else SHORT_TERM_MEMORY_PATH
+            try:
+                with open(source, "r", encoding="utf-8") as f:
+                    content = f.read().strip()
+                    memory = json.loads(content) if content else []
+            except json.JSONDecodeError:
+                log.warning(f"[MemoryManager] Corrupt {source}. Reinitializing.")
             if snapshots:
-                latest_snapshot = os.path.join(SNAPSHOT_DIR, snapshots[0])
-                with open(latest_snapshot, "r", encoding="utf-8") as f:
-                    memory = json.load(f)
-                with open(SHORT_TERM_MEMORY_PATH, "w", encoding="utf-8") as f:
-                    json.dump(memory, f, indent=2)
-                print(f"[MemoryManager] Loaded from snapshot: {latest_snapshot}")
-                with open("logs/sanya.log", "a", encoding="utf-8") as log_file:
-                    log_file.write(f"[MemoryManager] Loaded from snapshot: {latest_snapshot}\n")
+                from_snapshot = True
+                log.info(f"[MemoryManager] Loaded from snapshot: {source}")
+
+        for data in memory[-self.capacity:]:
+            self._push(MemoryRecord.from_dict(data))
+        if from_snapshot:
+            self._schedule_persist()
+
+    @property
+    def capacity(self) -> int:
+        return self.flush_threshold * 2
+
+    def _push(self, record: MemoryRecord):
+        self.buffer.append(record)
+        self.by_topic[record.topic].append(record)
+
+    def _pop_oldest(self) -> MemoryRecord:
+        record = self.buffer.popleft()
+        # The oldest record overall is also the oldest of its topic
+        topic_records = self.by_topic[record.topic]
+        topic_records.popleft()
+        if not topic_records:
+            del self.by_topic[record.topic]
+        return record
+
+    def _schedule_persist(self):
+        with self.lock:
+            self.dirty = True
+            if self.persist_timer is None:
+                self.persist_timer = threading.Timer(PERSIST_DELAY, self.flush)
+                self.persist_timer.daemon = True
+                self.persist_timer.start()
+
+    def flush(self):
+        """
+        Writes short-term memory to disk if it changed (temp file + rename). The
+        snapshot is taken under io_lock, so concurrent flushes reach the disk in the
+        order they read the buffer and the newest one always lands last.
+        """
+        with self.io_lock:
+            with self.lock:
+                if self.persist_timer is not None:
+                    self.persist_timer.cancel()
+                    self.persist_timer = None
+                if not self.dirty:
+                    return
+                self.dirty = False
+                memory = [record.to_dict() for record in self.buffer]
+            tmp_path = SHORT_TERM_MEMORY_PATH + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(memory, f, separators=(",", ":"))
+            os.replace(tmp_path, SHORT_TERM_MEMORY_PATH)
 
     def recall(self, query: str = None, topic: str = None) -> str:
         if query:
             return self.search_long_term_memory(query)
         if topic:
-            try:
-                with open(SHORT_TERM_MEMORY_PATH, "r", encoding="utf-8") as f:
-                    memory = json.load(f)
-                relevant = [m for m in memory if m.get("topic") == topic]
-                return "\n".join([f"{m['role']}: {m['message']}" for m in relevant])
-            except Exception as e:
-                print(f"[MemoryManager] Error recalling by topic: {e}")
-                with open("logs/sanya.log", "a", encoding="utf-8") as log_file:
-                    log_file.write(f"[MemoryManager] Error recalling by topic: {e}\n")
-                return ""
+            with self.lock:
+                relevant = list(self.by_topic.get(topic, ()))
+            return "\n".join([f"{m.role}: {m.message}" for m in relevant])
         return self.get_short_term_context()
 
     def get_short_term_context(self, max_messages=5, context_window=None) -> str:
         try:
-            with open(SHORT_TERM_MEMORY_PATH, "r", encoding="utf-8") as f:
-                content = f.read().strip()
-                memory = json.loads(content) if content else []
-            if context_window:
-                recent = [m for m in memory if m.get("topic") == context_window][-max_messages:]
-            else:
-                recent = memory[-max_messages:]
-            context = "\n".join([f"{m['role']}: {m['message']}" for m in recent])
-            print(f"[MemoryManager] Retrieved short-term context: {context}")
-            with open("logs/sanya.log", "a", encoding="utf-8") as log_file:
-                log_file.write(f"[MemoryManager] Retrieved short-term context: {context}\n")
+            with self.lock:
+                memory = self.by_topic.get(context_window, ()) if context_window else self.buffer
+                recent = list(memory)[-max_messages:]
+            context = "\n".join([f"{m.role}: {m.message}" for m in recent])
+            log.debug(f"[MemoryManager] Retrieved short-term context: {context}")
             return context
         except Exception as e:
-            print(f"[MemoryManager] Error retrieving short-term context: {e}")
-            with open("logs/sanya.log", "a", encoding="utf-8") as log_file:
-                log_file.write(f"[MemoryManager] Error retrieving short-term context: {e}\n")
+            log.error(f"[MemoryManager] Error retrieving short-term context: {e}")
             return ""
 
     def search_long_term_memory(self, query: str, top_k=3) -> str:
         try:
             results = search_vector_store(query, top_k=top_k)
             long_term_context = "\n".join([f"- {res['text']}" for res in results])
-            print(f"[MemoryManager] Long-term memory search results: {long_term_context}")
-            with open("logs/sanya.log", "a", encoding="utf-8") as log_file:
-                log_file.write(f"[MemoryManager] Long-term memory search results: {long_term_context}\n")
+            log.debug(f"[MemoryManager] Long-term memory search results: {long_term_context}")
             return long_term_context
         except Exception as e:
-            print(f"[MemoryManager] Error searching long-term memory: {e}")
-            with open("logs/sanya.log", "a", encoding="utf-8") as log_file:
-                log_file.write(f"[MemoryManager] Error searching long-term memory: {e}\n")
+            log.error(f"[MemoryManager] Error searching long-term memory: {e}")
             return ""
 
     def append_to_short_term(self, role: str, message: str):
         from core.llm import classify_message
         try:
-            if os.path.exists(SHORT_TERM_MEMORY_PATH):
-                try:
-                    with open(SHORT_TERM_MEMORY_PATH, "r", encoding="utf-8") as f:
-                        content = f.read().strip()
-                        memory = json.loads(content) if content else []
-                except json.JSONDecodeError:
-                    print("[MemoryManager] Corrupt short_term.json. Reinitializing.")
-                    with open("logs/sanya.log", "a", encoding="utf-8") as log_file:
-                        log_file.write("[MemoryManager] Corrupt short_term.json. Reinitializing.\n")
-                    memory = []
-            else:
-                memory = []
-
             classification = classify_message(message)
             self.last_topic = classification["topic"]
-            memory.append({"role": role, "message": message, "topic": classification["topic"], "important": classification["important"]})
-            print(f"[MemoryManager] Added to short-term memory: {role}: {message} (Topic: {classification['topic']})")
-            with open("logs/sanya.log", "a", encoding="utf-8") as log_file:
-                log_file.write(f"[MemoryManager] Added to short-term memory: {role}: {message} (Topic: {classification['topic']})\n")
+            with self.lock:
+                self._push(MemoryRecord(role, message, classification["topic"], classification["important"]))
+                dropped = [self._pop_oldest() for _ in range(len(self.buffer) - self.capacity)]
+            log.info(f"[MemoryManager] Added to short-term memory: {role}: {message} (Topic: {classification['topic']})")
 
-            if len(memory) > self.flush_threshold * 2:
-                dropped = memory[:-self.flush_threshold * 2]
-                memory = memory[-self.flush_threshold * 2:]
+            # Messages were classified when appended; reuse that instead of asking again
+            dropped_user = [msg for msg in dropped if msg.role == "user"]
+            if dropped_user:
+                add_many(
+                    [msg.message for msg in dropped_user],
+                    [{"topic": msg.topic, "important": msg.important} for msg in dropped_user],
+                )
 
-                for msg in dropped:
-                    if msg["role"] == "user":
-                        add_to_vector_store(msg["message"], classify_message(msg["message"]))
-
-            with open(SHORT_TERM_MEMORY_PATH, "w", encoding="utf-8") as f:
-                json.dump(memory, f, indent=2)
+            self._schedule_persist()
 
         except Exception as e:
-            print(f"[MemoryManager] Failed to append short-term memory: {e}")
-            with open("logs/sanya.log", "a", encoding="utf-8") as log_file:
-                log_file.write(f"[MemoryManager] Failed to append short-term memory: {e}\n")
+            log.warning(f"[MemoryManager] Failed to append short-term memory: {e}")
 
     def snapshot_and_clear_short_term(self):
         try:
-            if not os.path.exists(SHORT_TERM_MEMORY_PATH):
-                return
-
-            with open(SHORT_TERM_MEMORY_PATH, "r", encoding="utf-8") as f:
-                content = f.read().strip()
-                memory = json.loads(content) if content else []
+            with self.lock:
+                memory = [record.to_dict() for record in self.buffer]
+                self.buffer.clear()
+                self.by_topic.clear()
 
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             snapshot_path = os.path.join(SNAPSHOT_DIR, f"short_term_snapshot_{timestamp}.json")
             with open(snapshot_path, "w", encoding="utf-8") as f:
                 json.dump(memory, f, indent=2)
 
-            for msg in memory:
-                if msg["role"] == "user":
-                    add_to_vector_store(msg["message"], {"source": "short_term", "timestamp": timestamp})
+            user_messages = [msg["message"] for msg in memory if msg["role"] == "user"]
+            add_many(user_messages, [{"source": "short_term", "timestamp": timestamp}] * len(user_messages))
 
-            with open(SHORT_TERM_MEMORY_PATH, "w", encoding="utf-8") as f:
-                json.dump([], f)
-            print(f"[MemoryManager] Snapshot saved to {snapshot_path}")
-            with open("logs/sanya.log", "a", encoding="utf-8") as log_file:
-                log_file.write(f"[MemoryManager] Snapshot saved to {snapshot_path}\n")
+            self._schedule_persist()
+            self.flush()
+            log.info(f"[MemoryManager] Snapshot saved to {snapshot_path}")
 
         except Exception as e:
-            print(f"[MemoryManager] Failed to snapshot/clear short-term memory: {e}")
-            with open("logs/sanya.log", "a", encoding="utf-8") as log_file:
-                log_file.write(f"[MemoryManager] Failed to snapshot/clear short-term memory: {e}\n")
\ No newline at end of file
+            log.warning(f"[MemoryManager] Failed to snapshot/clear short-term memory: {e}")
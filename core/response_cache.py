@@ -0,0 +1,136 @@
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+
+# Seconds a response may be reused, by task type. Natural-language replies are keyed
+# under "reply". Anything missing or 0 is never cached.
+RESPONSE_CACHE_TTLS = {
+    "get_system_info": 24 * 3600,  # the task object is reused; the command still runs each time
+    "open_app": 7 * 24 * 3600,
+    "execute_command": 0,  # replaying a shell command the user did not ask for is never safe
+    "web_search": 24 * 3600,
+    "search_files": 3600,
+    "read_file": 3600,
+    "reply": 0,  # conversational replies depend on memory context
+    "code_project": 0,
+    "edit_file": 0,
+    "create_file": 0,
+    "delete_file": 0,
+}
+# Tasks whose replies carry an argument taken from the prompt (an app name, a query, a
+# path). "open notepad" and "open paint" embed almost identically, so these are only
+# reused on an exact prompt match, never a semantic one.
+EXACT_ONLY_TASKS = {"open_app", "web_search", "search_files", "read_file"}
+RESPONSE_CACHE_MAX_BYTES = 2 * 1024 * 1024
+# Cosine similarity a new prompt needs with a cached one to reuse its response.
+SEMANTIC_THRESHOLD = 0.97
+# Prompts or responses mentioning these are never cached.
+TIME_SENSITIVE = re.compile(
+    r"\b(time|date|today|tonight|tomorrow|yesterday|now|current|latest|day|week|month|year|clock|weather)\b",
+    re.IGNORECASE,
+)
+
+class ResponseCache:
+    """
+    LRU cache of ask_llm results keyed by a hash of the normalised prompt, with an
+    optional semantic near-match over prompt embeddings for tasks that take no
+    argument from the prompt. Bounded by total size in bytes.
+    """
+
+    def __init__(self, embed=None, max_bytes: int = RESPONSE_CACHE_MAX_BYTES,
+                 ttls: dict = None, semantic_threshold: float = SEMANTIC_THRESHOLD):
+        self.embed = embed
+        self.max_bytes = max_bytes
+        self.ttls = RESPONSE_CACHE_TTLS if ttls is None else ttls
+        self.semantic_threshold = semantic_threshold
+        self.entries = OrderedDict()  # key -> (response json, expires_at, size, unit vector)
+        self.bytes = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _normalize(prompt: str) -> str:
+        return " ".join(prompt.lower().split()).rstrip(" .!?")
+
+    def _key(self, prompt: str) -> str:
+        return hashlib.sha256(self._normalize(prompt).encode("utf-8")).hexdigest()
+
+    def _vector(self, prompt: str):
+        if self.embed is None:
+            return None
+        vector = np.asarray(self.embed([self._normalize(prompt)])[0], dtype="float32")
+        return vector / max(np.linalg.norm(vector), 1e-12)
+
+    def _drop(self, key):
+        _, _, size, _ = self.entries.pop(key)
+        self.bytes -= size
+
+    def get(self, prompt: str):
+        """Returns a fresh copy of the cached response, or None."""
+        key = self._key(prompt)
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[1] < now:
+                self._drop(key)
+                entry = None
+            if entry is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return json.loads(entry[0])
+            has_vectors = any(e[3] is not None for e in self.entries.values())
+
+        vector = self._vector(prompt) if has_vectors else None
+        with self.lock:
+            if vector is not None:
+                live = [(k, e) for k, e in self.entries.items() if e[3] is not None and e[1] >= now]
+                if live:
+                    scores = np.vstack([e[3] for _, e in live]) @ vector
+                    best = int(np.argmax(scores))
+                    if scores[best] >= self.semantic_threshold:
+                        best_key, entry = live[best]
+                        self.entries.move_to_end(best_key)
+                        self.hits += 1
+                        self.semantic_hits += 1
+                        return json.loads(entry[0])
+            self.misses += 1
+        return None
+
+    def put(self, prompt: str, response: dict):
+        kind = response.get("task", "reply") if isinstance(response, dict) else "reply"
+        ttl = self.ttls.get(kind, 0)
+        if ttl <= 0 or "error" in response:
+            return
+        serialized = json.dumps(response)
+        if TIME_SENSITIVE.search(prompt) or TIME_SENSITIVE.search(serialized):
+            return
+        vector = None if kind in EXACT_ONLY_TASKS else self._vector(prompt)
+        size = len(serialized) + len(prompt) + (vector.nbytes if vector is not None else 0)
+        if size > self.max_bytes:
+            return
+        key = self._key(prompt)
+        with self.lock:
+            if key in self.entries:
+                self._drop(key)
+            self.entries[key] = (serialized, time.time() + ttl, size, vector)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                self._drop(next(iter(self.entries)))
+
+    def stats(self) -> dict:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self.entries),
+                "bytes": self.bytes,
+            }
@@ -0,0 +1,107 @@
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+# Maximum number of code_project steps talking to the LLM at once.
+STEP_PARALLELISM = int(os.getenv("SANYA_STEP_PARALLELISM", "3"))
+FILENAME = re.compile(r"[\w./-]+\.(?:py|html?|css|js|json|txt|md)\b", re.IGNORECASE)
+
+def step_files(step, known_files) -> set:
+    """
+    Files a step declares ("files") or names in its description, as lower-case base
+    names. None means the step could touch anything.
+    """
+    text = step.get("step", "") if isinstance(step, dict) else str(step)
+    names = {os.path.basename(name).lower() for name in FILENAME.findall(text)}
+    names |= {os.path.basename(name).lower() for name in known_files if os.path.basename(name).lower() in text.lower()}
+    if isinstance(step, dict):
+        names |= {os.path.basename(name).lower() for name in step.get("files", []) if isinstance(name, str)}
+    return names or None
+
+def build_step_graph(steps: list, known_files) -> list:
+    """
+    Returns, for each step, the set of earlier step indices it must wait for: steps
+    it declares in "depends_on" (1-based) plus the last earlier step touching any of
+    its files. A step whose files are unknown waits for everything before it and
+    everything after it waits for it.
+    """
+    deps = []
+    last_writer = {}
+    last_barrier = None
+    for i, step in enumerate(steps):
+        declared = step.get("depends_on", []) if isinstance(step, dict) else []
+        needs = {int(d) - 1 for d in declared if str(d).isdigit() and 0 < int(d) <= i}
+        files = step_files(step, known_files)
+        if files is None:
+            needs |= set(range(last_barrier if last_barrier is not None else 0, i))
+            last_barrier = i
+        else:
+            needs |= {last_writer[name] for name in files if name in last_writer}
+            if last_barrier is not None:
+                needs.add(last_barrier)
+            for name in files:
+                last_writer[name] = i
+        deps.append(needs)
+    return deps
+
+def run_steps(deps: list, snapshot, run_step, commit, parallelism: int = STEP_PARALLELISM) -> list:
+    """
+    Runs run_step(i, snapshot()) for every step as soon as the steps it depends on are
+    committed, at most `parallelism` at a time. Results are committed with commit(i,
+    result) strictly in step order, whatever order they finish in, so the file writes
+    always merge the same way. Returns each step's wall time in seconds.
+    """
+    parallelism = max(parallelism, 1)  # 0 or less would never admit a step
+    count = len(deps)
+    durations = [0.0] * count
+    results = {}
+    committed = set()
+    pending = list(range(count))
+    running = {}
+
+    def timed(i, files):
+        start = time.perf_counter()
+        try:
+            return run_step(i, files)
+        finally:
+            durations[i] = time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=parallelism, thread_name_prefix="step") as pool:
+        next_commit = 0
+        while next_commit < count:
+            for i in list(pending):
+                if len(running) >= parallelism:
+                    break
+                if deps[i] <= committed:
+                    pending.remove(i)
+                    running[pool.submit(timed, i, snapshot())] = i
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                i = running.pop(future)
+                try:
+                    results[i] = future.result()
+                except Exception as e:
+                    results[i] = e
+            while next_commit in results:
+                commit(next_commit, results.pop(next_commit))
+                committed.add(next_commit)
+                next_commit += 1
+    return durations
+
+def critical_path(deps: list, durations: list):
+    """Returns (step indices, seconds) of the longest dependency chain."""
+    finish, previous = [], []
+    for i, needs in enumerate(deps):
+        before = max(needs, key=lambda d: finish[d], default=None)
+        finish.append(durations[i] + (finish[before] if before is not None else 0.0))
+        previous.append(before)
+    if not finish:
+        return [], 0.0
+    step = max(range(len(finish)), key=lambda i: finish[i])
+    total = finish[step]
+    path = []
+    while step is not None:
+        path.append(step)
+        step = previous[step]
+    return path[::-1], total
@@ -1,70 +1,124 @@
-from core.llm import ask_llm
+from core.llm import ask_llm, ask_llm_stream, is_json_reply, decode_task, JSON_FENCE
 from modules.file_control import create_file, edit_file, read_file, batch_create_files, search_files, delete_file, copy_file
 from modules.system_control import execute_command, get_system_info, automate_process
-from modules.code_executor import run_python_script, test_python_script, serve_web_app
+from modules.code_executor import run_python_script, test_python_script, serve_web_app, list_web_servers, stop_web_server
 from modules.app_launcher import open_app
+from modules.voice_interface import iter_sentences
+from core.context_budget import ContextBudgeter
+from core.step_scheduler import build_step_graph, run_steps, critical_path
+from modules.project_workspace import ProjectWorkspace, apply_patch, looks_like_patch
 import os
 import subprocess
-import json
+import itertools
 import time
 from duckduckgo_search import DDGS
+from modules.logger import log
+from modules.tracing import tracer
 
 def route_command(command: str) -> str:
-    response = ask_llm(command)
-    
+    with tracer.span("route_command"):
+        return dispatch_response(command, ask_llm(command))
+
+
+def route_command_stream(command: str, say) -> tuple:
+    """
+    Streams the LLM reply for a spoken command. Natural-language replies are handed to
+    `say` one sentence at a time while the rest is still being generated; replies that
+    open like JSON are collected whole and routed as tasks without being spoken.
+    Returns (response text, spoken).
+    """
+    try:
+        chunks = ask_llm_stream(command)
+        head = ""
+        for chunk in chunks:
+            head += chunk
+            # Read on while the reply could still be opening a ```json fence
+            start = head.lstrip()
+            if start and (len(start) >= len(JSON_FENCE) or not JSON_FENCE.startswith(start)):
+                break
+
+        if is_json_reply(head):
+            # ask_llm_stream remembers the turn itself once the stream is drained
+            reply = head + "".join(chunks)
+            task = decode_task(reply)
+            return dispatch_response(command, task if task is not None else {"reply": reply.strip()}), False
+
+        sentences = []
+        for sentence in iter_sentences(itertools.chain([head], chunks)):
+            say(sentence)
+            sentences.append(sentence)
+        return " ".join(sentences), True
+    except Exception as e:
+        log.error(f"[TaskManager] Streaming error: {str(e)}")
+        return f"Error: {str(e)}", False
+
+
+def dispatch_response(command: str, response: dict) -> str:
     if isinstance(response, dict) and "error" in response:
         return f"Error: {response['error']}"
 
     if isinstance(response, dict) and "task" in response:
-        task = response["task"]
-        if task == "create_file":
-            return create_file(response.get("filename"), response.get("content", ""))
-        elif task == "edit_file":
-            return edit_file(response.get("filename"), response.get("content"), response.get("append", False))
-        elif task == "read_file":
-            return read_file(response.get("filename"))
-        elif task == "batch_create_files":
-            return batch_create_files(response.get("files", []))
-        elif task == "search_files":
-            return "\n".join(search_files(response.get("pattern", "*"), response.get("directory", ".")))
-        elif task == "delete_file":
-            return delete_file(response.get("filename"))
-        elif task == "copy_file":
-            return copy_file(response.get("src"), response.get("dst"))
-        elif task == "execute_command":
-            return execute_command(response.get("command"))
-        elif task == "get_system_info":
-            return get_system_info(response.get("info_type"))
-        elif task == "automate_process":
-            return automate_process(response.get("process"))
-        elif task == "open_app":
-            return open_app(command)
-        elif task == "code_project":
-            return handle_code_project(response)
-        elif task == "web_search":
-            query = response.get("query")
-            if not query:
-                return "Please provide a search query."
-            try:
-                with DDGS() as ddgs:
-                    results = [r for r in ddgs.text(query, max_results=3)]
-                if not results:
-                    return "No results found."
-                summary = "\n".join([f"- {r['title']}: {r['body']}" for r in results])
-                print(f"[TaskManager] Web search results for '{query}':\n{summary}")
-                with open("logs/sanya.log", "a", encoding="utf-8") as log_file:
-                    log_file.write(f"[TaskManager] Web search results for '{query}':\n{summary}\n")
-                return f"Search results for '{query}':\n{summary}"
-            except Exception as e:
-                print(f"[TaskManager] Web search error: {str(e)}")
-                with open("logs/sanya.log", "a", encoding="utf-8") as log_file:
-                    log_file.write(f"[TaskManager] Web search error: {str(e)}\n")
-                return f"Error searching the web: {str(e)}"
-        else:
-            return "Unknown task."
+        task = str(response["task"])
+        with tracer.span(f"tool.{task}" if task.isidentifier() else "tool.unknown"):
+            return run_task(command, response)
     return response.get("reply", "I couldn't process that command.")
 
 
+def run_task(command: str, response: dict) -> str:
+    task = response["task"]
+    if task == "create_file":
+        return create_file(response.get("filename"), response.get("content", ""))
+    elif task == "edit_file":
+        return edit_file(response.get("filename"), response.get("content"), response.get("append", False))
+    elif task == "read_file":
+        return read_file(response.get("filename"))
+    elif task == "batch_create_files":
+        return batch_create_files(response.get("files", []))
+    elif task == "search_files":
+        return "\n".join(search_files(response.get("pattern", "*"), response.get("directory", ".")))
+    elif task == "delete_file":
+        return delete_file(response.get("filename"))
+    elif task == "copy_file":
+        return copy_file(response.get("src"), response.get("dst"))
+    elif task == "execute_command":
+        return execute_command(response.get("command"))
+    elif task == "get_system_info":
+        return get_system_info(response.get("info_type"))
+    elif task == "automate_process":
+        return automate_process(response.get("process"))
+    elif task == "open_app":
+        return open_app(command)
+    elif task == "code_project":
+        return handle_code_project(response)
+    elif task == "list_web_servers":
+        servers = list_web_servers()
+        if not servers:
+            return "No web apps are running."
+        return "\n".join(f"- {s['url']} serving {s['directory']} ({s['requests']} requests, idle {s['idle']:.0f}s)" for s in servers)
+    elif task == "stop_web_server":
+        target = response.get("port") or response.get("directory")
+        if target is None:
+            return "Please say which web app to stop."
+        return f"Stopped the web app on {target}." if stop_web_server(target) else f"No web app is running on {target}."
+    elif task == "web_search":
+        query = response.get("query")
+        if not query:
+            return "Please provide a search query."
+        try:
+            with DDGS() as ddgs:
+                results = [r for r in ddgs.text(query, max_results=3)]
+            if not results:
+                return "No results found."
+            summary = "\n".join([f"- {r['title']}: {r['body']}" for r in results])
+            log.debug(f"[TaskManager] Web search results for '{query}':\n{summary}")
+            return f"Search results for '{query}':\n{summary}"
+        except Exception as e:
+            log.error(f"[TaskManager] Web search error: {str(e)}")
+            return f"Error searching the web: {str(e)}"
+    else:
+        return "Unknown task."
+
+
 def handle_code_project(response: dict) -> str:
     try:
         language = response.get("language", "python")
@@ -72,66 +126,88 @@ def handle_code_project(response: dict) -> str:
         files = response.get("files", [])
         run = response.get("run", False)
         test = response.get("test", False)
+        # Cases come with the project: [{"input": ..., "expected": ...}, ...]
+        test_cases = response.get("tests") or response.get("test_cases") or []
 
         # Create a project directory
         project_name = "project_" + str(int(time.time()))
         project_dir = os.path.join("projects", project_name)
         os.makedirs(project_dir, exist_ok=True)
-        print(f"[TaskManager] Created project directory: {project_dir}")
-        with open("logs/sanya.log", "a", encoding="utf-8") as log_file:
-            log_file.write(f"[TaskManager] Created project directory: {project_dir}\n")
+        log.info(f"[TaskManager] Created project directory: {project_dir}")
 
-        # Initial file creation
-        initial_files = {}
+        # Initial file creation; files live in the workspace and reach disk on flush
+        workspace = ProjectWorkspace(project_dir)
         for file in files:
-            filename = file.get("filename")
-            content = file.get("content", "")
-            full_path = os.path.join(project_dir, os.path.normpath(filename))  # Normalize path
-            create_file(full_path, content)
-            initial_files[filename] = full_path
+            workspace.write(file.get("filename"), file.get("content", ""))
+        workspace.flush()
 
         result = f"Project '{project_name}' created.\n"
 
-        # Iterate over steps
-        for i, step in enumerate(steps, 1):
+        # Steps form a DAG over the files they touch; independent ones run concurrently
+        # and their writes are committed in step order.
+        budgeter = ContextBudgeter()
+        outcomes = {}
+        deps = build_step_graph(steps, workspace.files())
+
+        def snapshot():
+            # Contents plus what the last committed step changed, without touching disk
+            return workspace.snapshot(), workspace.changed_files(since=workspace.version - 1)
+
+        def run_step(index, state):
+            file_contents, changed = state
+            i = index + 1
+            step = steps[index]
             step_desc = step["step"] if isinstance(step, dict) else step
             step_output = step.get("output", "Generate relevant code") if isinstance(step, dict) else "Generate relevant code"
-            print(f"[TaskManager] Processing step {i}: {step_desc}")
-            with open("logs/sanya.log", "a", encoding="utf-8") as log_file:
-                log_file.write(f"[TaskManager] Processing step {i}: {step_desc}\n")
-
-            existing_files = search_files("*", project_dir)
-            file_contents = {os.path.basename(f): read_file(f) for f in existing_files}
+            log.info(f"[TaskManager] Processing step {i}: {step_desc}")
 
-            step_prompt = f"Complete step {i}: {step_desc}\nExpected output: {step_output}\nExisting files: {json.dumps(file_contents)}\nGenerate the required content and return it in a code_project task. Do not prompt the user."
-            step_response = ask_llm(step_prompt, iteration=i, previous_response=json.dumps(file_contents))
+            # Files travel once, inside the budgeted step prompt; the outcome of the
+            # steps this one depends on is all the model needs beyond that.
+            previous = " ".join(outcomes[d] for d in sorted(deps[index])) or "Initial project files created."
+            step_prompt = budgeter.build_step_prompt(i, step_desc, step_output, file_contents, changed)
+            return ask_llm(step_prompt, iteration=i, previous_response=previous)
 
+        def commit(index, step_response):
+            i = index + 1
+            if isinstance(step_response, Exception):
+                step_response = {"error": str(step_response)}
             if "error" in step_response:
-                result += f"\nStep {i} failed: {step_response['error']}"
-                continue
-
-            if "task" in step_response and step_response["task"] == "code_project":
+                outcomes[index] = f"Step {i} failed: {step_response['error']}"
+            elif "task" in step_response and step_response["task"] == "code_project":
                 new_files = step_response.get("files", [])
+                changes = []
                 for file in new_files:
                     filename = file.get("filename")
-                    content = file.get("content", "")
-                    full_path = os.path.join(project_dir, os.path.normpath(filename))
-                    # Append or replace based on step logic
-                    if os.path.exists(full_path):
-                        existing_content = read_file(full_path)
-                        if content and not content.startswith(existing_content):  # Avoid overwriting unrelated content
-                            content = existing_content + "\n" + content
-                    create_file(full_path, content)
-                result += f"\nStep {i} completed: Updated {len(new_files)} files."
+                    try:
+                        changes.append(f"{filename} ({workspace.apply(filename, file.get('content', ''))})")
+                    except ValueError as e:
+                        changes.append(f"{filename} (not applied: {e})")
+                workspace.flush()
+                outcomes[index] = f"Step {i} completed: Updated {', '.join(changes) or 'no files'}."
             else:
-                result += f"\nStep {i} response: {step_response.get('reply', 'No reply.')}"
+                outcomes[index] = f"Step {i} response: {step_response.get('reply', 'No reply.')}"
+
+        start = time.perf_counter()
+        durations = run_steps(deps, snapshot, run_step, commit)
+        for index in range(len(steps)):
+            after = f" after step {', '.join(str(d + 1) for d in sorted(deps[index]))}" if deps[index] else ""
+            result += f"\n{outcomes[index]} ({durations[index]:.2f}s{after})"
+        if steps:
+            path, path_seconds = critical_path(deps, durations)
+            result += (
+                f"\nSteps took {time.perf_counter() - start:.2f}s wall; critical path "
+                f"{' -> '.join(str(i + 1) for i in path)} ({path_seconds:.2f}s)"
+            )
+
+        if budgeter.sizes:
+            result += f"\nPrompt sizes: {budgeter.report()}"
 
         # Run and test logic remains the same
         if run:
             if language == "python":
-                main_file = next((f for f in search_files("*.py", project_dir)), None)
+                main_file = next(iter(workspace.files(".py")), None)
                 if main_file:
-                    full_path = os.path.join(project_dir, main_file)
+                    full_path = workspace.path(main_file)
                     exec_result = run_python_script(full_path)
                     if exec_result["success"]:
                         result += f"\nExecution Output:\n{exec_result['output']}"
@@ -147,33 +223,38 @@ def handle_code_project(response: dict) -> str:
 
         if test:
             if language == "python" and run:
-                main_file = next((f for f in search_files("*.py", project_dir)), None)
-                if main_file:
-                    full_path = os.path.join(project_dir, main_file)
-                    test_cases = [
-                        {"input": "5", "expected": "120"},
-                        {"input": "0", "expected": "1"}
-                    ]
+                main_file = next(iter(workspace.files(".py")), None)
+                if main_file and not test_cases:
+                    result += "\nTests skipped: no test cases were provided."
+                elif main_file:
+                    full_path = workspace.path(main_file)
                     test_result = test_python_script(full_path, test_cases)
+                    timings = ", ".join(f"{case['seconds']:.2f}s" for case in test_result.get("results", []))
                     if test_result["passed"]:
-                        result += "\nTest Passed: All test cases passed."
+                        result += f"\nTest Passed: All {len(test_cases)} test cases passed ({timings})."
                     else:
                         result += f"\nTest Failed:\n{test_result['feedback']}"
                         fix_response = ask_llm(f"Fix the script based on: {test_result['feedback']}", iteration=len(steps) + 1)
                         if "task" in fix_response and fix_response["task"] == "edit_file":
-                            edit_file(full_path, fix_response["content"])
-                            test_result = test_python_script(full_path, test_cases)
-                            if test_result["passed"]:
-                                result += "\nFixed: All test cases passed."
+                            # The fix is the whole file (or a patch to it), never a fragment to merge
+                            content = fix_response.get("content", "")
+                            try:
+                                fixed = apply_patch(workspace.read(main_file), content) if looks_like_patch(content) else content
+                            except ValueError as e:
+                                result += f"\nFix not applied: {e}"
                             else:
-                                result += f"\nFix Failed:\n{test_result['feedback']}"
+                                workspace.write(main_file, fixed)
+                                workspace.flush()
+                                test_result = test_python_script(full_path, test_cases)
+                                if test_result["passed"]:
+                                    result += "\nFixed: All test cases passed."
+                                else:
+                                    result += f"\nFix Failed:\n{test_result['feedback']}"
             elif language == "web":
                 pass
 
         return result
 
     except Exception as e:
-        print(f"[TaskManager] Error in code project: {str(e)}")
-        with open("logs/sanya.log", "a", encoding="utf-8") as log_file:
-            log_file.write(f"[TaskManager] Error in code project: {str(e)}\n")
+        log.error(f"[TaskManager] Error in code project: {str(e)}")
         return f"Error in code project: {str(e)}"
\ No newline at end of file
@@ -0,0 +1,97 @@
+# modules/audio_input.py
+import threading
+import numpy as np
+import sounddevice as sd
+from modules.logger import log
+
+SAMPLE_RATE = 16000
+FRAME_SAMPLES = 1280  # 80 ms, the frame size openwakeword scores
+RING_SECONDS = 30.0
+
+
+class MicCapture:
+    """
+    Keeps the microphone open for the life of the process. The input callback copies
+    every 80 ms frame into a ring of preallocated int16 frames and advances a frame
+    counter; readers hold their own position into it, so the wake word detector and
+    speech recognition read the same audio, including what was said just before
+    they started reading, without reopening the device.
+    """
+
+    def __init__(self, samplerate: int = SAMPLE_RATE, frame_samples: int = FRAME_SAMPLES, ring_seconds: float = RING_SECONDS):
+        self.samplerate = samplerate
+        self.frame_samples = frame_samples
+        self.slots = int(ring_seconds * samplerate / frame_samples)
+        self.ring = np.zeros((self.slots, frame_samples), dtype=np.int16)
+        self.count = 0  # frames captured so far; written by the callback only
+        self.overflows = 0
+        self.skipped = 0  # frames overwritten before a reader got to them
+        self.stream = None
+        self.cond = threading.Condition()
+        self.lock = threading.Lock()
+
+    @property
+    def position(self) -> int:
+        return self.count
+
+    @property
+    def frame_seconds(self) -> float:
+        return self.frame_samples / self.samplerate
+
+    def start(self):
+        with self.lock:
+            if self.stream is not None:
+                return
+            self.stream = sd.InputStream(
+                samplerate=self.samplerate, channels=1, dtype="int16",
+                blocksize=self.frame_samples, callback=self._callback,
+            )
+            self.stream.start()
+        log.info(f"[Mic] Capturing {self.frame_samples}-sample frames at {self.samplerate} Hz")
+
+    def stop(self):
+        with self.lock:
+            if self.stream is not None:
+                self.stream.close()
+                self.stream = None
+
+    def _callback(self, indata, frames, time_info, status):
+        if status.input_overflow:
+            self.overflows += 1
+        self.ring[self.count % self.slots] = indata[:self.frame_samples, 0]
+        self.count += 1  # publish only after the frame is in place
+        with self.cond:
+            self.cond.notify_all()
+
+    def read(self, position: int, timeout: float = 2.0):
+        """
+        Returns (position, frame) for the frame at `position`, waiting for it to be
+        captured. A position the ring has already overwritten moves up to the oldest
+        frame still held. Returns (position, None) on timeout.
+        """
+        with self.cond:
+            if self.count <= position and not self.cond.wait_for(lambda: self.count > position, timeout):
+                return position, None
+        oldest = self.count - self.slots + 1
+        if position < oldest:
+            self.skipped += oldest - position
+            position = oldest
+        return position, self.ring[position % self.slots].copy()
+
+    def frames(self, start: int, end: int) -> np.ndarray:
+        """Captured samples from frame `start` up to (not including) frame `end`."""
+        start = max(start, self.count - self.slots + 1, 0)
+        end = min(end, self.count)
+        if end <= start:
+            return np.zeros(0, dtype=np.int16)
+        return self.ring[np.arange(start, end) % self.slots].reshape(-1)
+
+    def seconds_to_frames(self, seconds: float) -> int:
+        return max(int(round(seconds / self.frame_seconds)), 0)
+
+
+def rms(frame: np.ndarray) -> float:
+    return float(np.sqrt(np.mean(frame.astype(np.float32) ** 2))) if len(frame) else 0.0
+
+
+microphone = MicCapture()
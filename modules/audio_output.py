@@ -0,0 +1,137 @@
+# modules/audio_output.py
+import threading
+import numpy as np
+import sounddevice as sd
+from modules.logger import log
+
+BLOCK_FRAMES = 512  # ~23 ms at 22.05 kHz; also the worst-case delay of clear()
+RING_SECONDS = 4.0
+
+
+class AudioOutput:
+    """
+    One long-lived OutputStream whose callback pulls from a ring buffer of
+    preallocated float32 frames. There is a single writer (the player thread) and a
+    single reader (the callback); each only advances its own position, so neither
+    takes a lock. Chunks written back to back play without gaps, and clear() makes
+    the callback skip everything queued on its next block.
+    """
+
+    def __init__(self, block_frames: int = BLOCK_FRAMES, ring_seconds: float = RING_SECONDS):
+        self.block_frames = block_frames
+        self.ring_seconds = ring_seconds
+        self.stream = None
+        self.samplerate = None
+        self.buffer = None
+        self.capacity = 0
+        self.write_pos = 0  # advanced by the writer only
+        self.read_pos = 0  # advanced by the callback only
+        self.drop_to = 0  # set by clear(); the callback skips ahead to it
+        self.pending = False  # an utterance is being written, so running dry is an underrun
+        self.underruns = 0
+        self.space = threading.Event()
+        self.drained = threading.Event()
+        self.lock = threading.Lock()  # opening and closing the stream only
+
+    def start(self, samplerate: int):
+        """Opens the stream, or reopens it for a different sample rate."""
+        with self.lock:
+            if self.stream is not None and self.samplerate == samplerate:
+                return
+            if self.stream is not None:
+                self.stream.close()
+            self.samplerate = samplerate
+            self.capacity = int(samplerate * self.ring_seconds)
+            self.buffer = np.zeros(self.capacity, dtype=np.float32)
+            self.write_pos = self.read_pos = self.drop_to = 0
+            self.stream = sd.OutputStream(
+                samplerate=samplerate, channels=1, dtype="float32",
+                blocksize=self.block_frames, latency="low", callback=self._callback,
+            )
+            self.stream.start()
+            log.info(f"[Audio] Output stream open at {samplerate} Hz ({self.block_frames}-frame blocks)")
+
+    def _callback(self, outdata, frames, time_info, status):
+        if status.output_underflow:
+            self.underruns += 1
+        out = outdata[:, 0]
+        read_pos = max(self.read_pos, self.drop_to)
+        count = min(self.write_pos - read_pos, frames)
+        if count > 0:
+            start = read_pos % self.capacity
+            first = min(count, self.capacity - start)
+            out[:first] = self.buffer[start:start + first]
+            out[first:count] = self.buffer[:count - first]
+            read_pos += count
+        else:
+            count = 0
+        out[count:] = 0.0
+        self.read_pos = read_pos
+        if count < frames and self.pending:
+            self.underruns += 1
+        self.space.set()
+        if read_pos >= self.write_pos:
+            self.drained.set()
+
+    def begin(self):
+        """Marks the start of an utterance: running dry from now on counts as an underrun."""
+        self.pending = True
+
+    def end(self):
+        self.pending = False
+
+    def write(self, samples, should_stop=None) -> bool:
+        """
+        Appends samples to the ring, waiting for the callback to make room when it is
+        full. Returns False (having cleared the output) if should_stop() turns true.
+        """
+        samples = np.asarray(samples, dtype=np.float32).ravel()
+        offset = 0
+        while offset < len(samples):
+            if should_stop is not None and should_stop():
+                self.clear()
+                return False
+            free = self.capacity - (self.write_pos - max(self.read_pos, self.drop_to))
+            if free <= 0:
+                self.space.clear()
+                if self.capacity - (self.write_pos - max(self.read_pos, self.drop_to)) <= 0:
+                    self.space.wait(0.1)
+                continue
+            count = min(free, len(samples) - offset)
+            start = self.write_pos % self.capacity
+            first = min(count, self.capacity - start)
+            self.buffer[start:start + first] = samples[offset:offset + first]
+            self.buffer[:count - first] = samples[offset + first:offset + count]
+            self.write_pos += count  # publish only after the frames are in place
+            offset += count
+        return True
+
+    def wait_played(self, should_stop=None) -> bool:
+        """Blocks until everything written has been played; False if should_stop() interrupts."""
+        while True:
+            self.drained.clear()
+            if max(self.read_pos, self.drop_to) >= self.write_pos:
+                return True
+            if should_stop is not None and should_stop():
+                self.clear()
+                return False
+            self.drained.wait(0.1)
+
+    def clear(self):
+        """Drops everything not yet played; the callback goes silent on its next block."""
+        self.pending = False
+        self.drop_to = self.write_pos
+        self.space.set()
+
+    def close(self):
+        with self.lock:
+            if self.stream is not None:
+                self.stream.close()
+                self.stream = None
+
+    def stats(self) -> dict:
+        return {
+            "samplerate": self.samplerate,
+            "buffered_seconds": (self.write_pos - max(self.read_pos, self.drop_to)) / self.samplerate if self.samplerate else 0.0,
+            "underruns": self.underruns,
+        }
@@ -1,124 +1,319 @@
 import subprocess
 import os
 import sys
-import http.server
-import socketserver
 import threading
 import time
-import io
-from contextlib import redirect_stdout, redirect_stderr
+import signal
+from concurrent.futures import ThreadPoolExecutor
+from modules import web_server
+from modules.logger import log
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Limits for generated scripts
+OUTPUT_CAP_BYTES = 64 * 1024  # kept per stream; the middle of longer output is dropped
+OUTPUT_READ_SIZE = 4096
+LOG_PREVIEW_CHARS = 1000
+RUN_MEMORY_LIMIT = 512 * 1024 * 1024  # address space, bytes
+RUN_FILE_SIZE_LIMIT = 16 * 1024 * 1024  # largest file the script may write, bytes
+
+# Generated-script test runs
+TEST_CASE_TIMEOUT = 10
+TEST_WORKERS = min(4, os.cpu_count() or 1)
+# "suffix" lets output end with the expected text after an input() prompt
+NORMALIZE_DEFAULTS = {"collapse_whitespace": True, "ignore_case": False, "match": "suffix"}
+# Characters that end an input() prompt when it has no trailing space ("Number:5")
+PROMPT_ENDINGS = ":?>"
+
+# Applies the limits in the child and then execs the real command. A preexec_fn would
+# do the same, but it can deadlock between fork and exec when the parent has other
+# threads running, which the assistant always does.
+_LIMITS_LAUNCHER = (
+    "import os, resource, sys\n"
+    "cpu, memory, fsize = map(int, sys.argv[1:4])\n"
+    "resource.setrlimit(resource.RLIMIT_CPU, (cpu, cpu + 1))\n"
+    "resource.setrlimit(resource.RLIMIT_AS, (memory, memory))\n"
+    "resource.setrlimit(resource.RLIMIT_FSIZE, (fsize, fsize))\n"
+    "os.execvp(sys.argv[4], sys.argv[4:])\n"
+)
+
+def _with_limits(argv: list, cpu_seconds: int) -> list:
+    """Wraps argv so it runs under CPU, address-space and file-size limits (POSIX only)."""
+    return [sys.executable, "-I", "-S", "-c", _LIMITS_LAUNCHER,
+            str(cpu_seconds), str(RUN_MEMORY_LIMIT), str(RUN_FILE_SIZE_LIMIT), *argv]
+
+class _CappedReader(threading.Thread):
+    """
+    Drains a pipe as the child writes to it, keeping the first and last half of
+    `cap` bytes and counting what is dropped in between, so a chatty script can
+    neither fill memory nor block on a full pipe.
+    """
+
+    def __init__(self, pipe, cap: int):
+        super().__init__(daemon=True)
+        self.pipe = pipe
+        self.half = cap // 2
+        self.head = bytearray()
+        self.tail = bytearray()
+        self.dropped = 0
+
+    def run(self):
+        for chunk in iter(lambda: self.pipe.read1(OUTPUT_READ_SIZE), b""):
+            room = self.half - len(self.head)
+            if room > 0:
+                self.head += chunk[:room]
+                chunk = chunk[room:]
+            self.tail += chunk
+            if len(self.tail) > self.half:
+                self.dropped += len(self.tail) - self.half
+                del self.tail[:len(self.tail) - self.half]
+        self.pipe.close()
+
+    def text(self) -> str:
+        head = self.head.decode("utf-8", errors="replace")
+        tail = self.tail.decode("utf-8", errors="replace")
+        if self.dropped:
+            return f"{head}\n... [output truncated: {self.dropped} bytes omitted] ...\n{tail}"
+        return head + tail
+
+def _execute(argv: list, stdin: str = None, timeout: float = 30, cwd: str = None) -> dict:
+    """
+    Runs a command with capped, streamed output capture. On POSIX the child gets
+    CPU, address-space and file-size limits and its own process group, which is
+    killed as a whole on timeout; peak RSS and CPU time come from wait4().
+    """
+    posix = resource is not None and hasattr(os, "wait4")
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        _with_limits(argv, int(timeout) + 1) if posix else argv,
+        stdin=subprocess.PIPE if stdin is not None else subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        cwd=cwd,
+        start_new_session=posix,
+    )
+    readers = [_CappedReader(process.stdout, OUTPUT_CAP_BYTES), _CappedReader(process.stderr, OUTPUT_CAP_BYTES)]
+    for reader in readers:
+        reader.start()
+    if stdin is not None:
+        def feed():
+            try:
+                process.stdin.write(stdin.encode("utf-8"))
+                process.stdin.close()
+            except (BrokenPipeError, OSError):
+                pass
+        threading.Thread(target=feed, daemon=True).start()
+
+    timed_out = False
+    usage = None
+    if posix:
+        reaped = {}
+
+        def reap():
+            try:
+                reaped.update(zip(("pid", "status", "usage"), os.wait4(process.pid, 0)))
+            except OSError as e:
+                log.warning(f"[CodeExecutor] wait4 failed for pid {process.pid}: {e}")
+
+        waiter = threading.Thread(target=reap, daemon=True)
+        waiter.start()
+        waiter.join(timeout)
+        if waiter.is_alive():
+            timed_out = True
+            try:
+                os.killpg(process.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+            waiter.join()
+        if reaped.get("status") is not None:
+            process.returncode = os.waitstatus_to_exitcode(reaped["status"])
+            usage = reaped.get("usage")
+        else:
+            process.wait()  # wait4 failed (ECHILD, interrupted); no usage figures
+    else:
+        try:
+            process.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            timed_out = True
+            process.kill()
+            process.wait()
+    for reader in readers:
+        reader.join(timeout=1)
+
+    return {
+        "stdout": readers[0].text(),
+        "stderr": readers[1].text(),
+        "returncode": process.returncode,
+        "timed_out": timed_out,
+        "truncated": any(reader.dropped for reader in readers),
+        "wall_seconds": round(time.perf_counter() - start, 3),
+        # ru_maxrss is in kilobytes on Linux and bytes on macOS
+        "peak_rss_kb": (usage.ru_maxrss // (1024 if sys.platform == "darwin" else 1)) if usage else None,
+        "cpu_seconds": round(usage.ru_utime + usage.ru_stime, 3) if usage else None,
+    }
 
 def run_python_script(script_path: str, timeout: int = 30) -> dict:
     """
     Executes a Python script and captures its output and errors.
-    Returns a dict with 'output', 'error', and 'success' keys.
+    Returns a dict with 'output', 'error', and 'success' keys, plus 'truncated',
+    'timed_out', 'wall_seconds', 'peak_rss_kb' and 'cpu_seconds'.
     """
     try:
-        # Redirect stdout and stderr to capture output
-        stdout = io.StringIO()
-        stderr = io.StringIO()
-        with redirect_stdout(stdout), redirect_stderr(stderr):
-            process = subprocess.run(
-                [sys.executable, script_path],
-                capture_output=True,
-                text=True,
-                timeout=timeout
-            )
-        stdout_output = stdout.getvalue() + process.stdout
-        stderr_output = stderr.getvalue() + process.stderr
-        success = process.returncode == 0
+        run = _execute([sys.executable, script_path], timeout=timeout)
+        success = run["returncode"] == 0 and not run["timed_out"]
+        error = run["stderr"].strip() if not success else ""
+        if run["timed_out"]:
+            error = f"Script execution timed out after {timeout} seconds.\n{error}".strip()
         result = {
-            "output": stdout_output.strip(),
-            "error": stderr_output.strip() if not success else "",
-            "success": success
+            "output": run["stdout"].strip(),
+            "error": error,
+            "success": success,
+            "truncated": run["truncated"],
+            "timed_out": run["timed_out"],
+            "wall_seconds": run["wall_seconds"],
+            "peak_rss_kb": run["peak_rss_kb"],
+            "cpu_seconds": run["cpu_seconds"],
         }
-        print(f"[CodeExecutor] Ran Python script: {script_path}\nResult: {result}")
-        with open("logs/sanya.log", "a", encoding="utf-8") as log_file:
-            log_file.write(f"[CodeExecutor] Ran Python script: {script_path}\nResult: {result}\n")
-        return result
-    except subprocess.TimeoutExpired:
-        result = {"output": "", "error": "Script execution timed out after 30 seconds.", "success": False}
-        print(f"[CodeExecutor] Timeout: {script_path}")
-        with open("logs/sanya.log", "a", encoding="utf-8") as log_file:
-            log_file.write(f"[CodeExecutor] Timeout: {script_path}\n")
+        summary = {key: (value[:LOG_PREVIEW_CHARS] if isinstance(value, str) else value) for key, value in result.items()}
+        log.info(f"[CodeExecutor] Ran Python script: {script_path}\nResult: {summary}")
         return result
     except Exception as e:
         result = {"output": "", "error": f"Error running script: {str(e)}", "success": False}
-        print(f"[CodeExecutor] Error: {str(e)}")
-        with open("logs/sanya.log", "a", encoding="utf-8") as log_file:
-            log_file.write(f"[CodeExecutor] Error: {str(e)}\n")
+        log.error(f"[CodeExecutor] Error: {str(e)}")
         return result
 
-def test_python_script(script_path: str, test_cases: list) -> dict:
+def normalize_output(text: str, options: dict = None) -> str:
+    """
+    Normalises program output for comparison. Options (defaults in NORMALIZE_DEFAULTS):
+    collapse_whitespace, ignore_case, and match = "exact" | "suffix" | "last_line" |
+    "contains". "suffix" accepts output that ends with the expected text after
+    whitespace or the end of an input() prompt, so "1" does not match "-1" nor "5"
+    match "2.5"; "last_line" compares only the final non-empty line.
+    """
+    options = {**NORMALIZE_DEFAULTS, **(options or {})}
+    text = str(text).replace("\r\n", "\n").strip()
+    if options["match"] == "last_line":
+        text = next((line for line in reversed(text.splitlines()) if line.strip()), "")
+    if options["collapse_whitespace"]:
+        text = " ".join(text.split())
+    if options["ignore_case"]:
+        text = text.lower()
+    return text
+
+def _run_test_case(script_path: str, test_case: dict, timeout: float, options: dict) -> dict:
+    test_input = test_case.get("input")
+    args = test_case.get("args")
+    if args is None and test_case.get("mode") == "argv":
+        args = str(test_input).split() if test_input is not None else []
+        test_input = None
+    if isinstance(test_input, list):
+        test_input = "\n".join(str(line) for line in test_input)
+    stdin = None if test_input is None else str(test_input) + ("" if str(test_input).endswith("\n") else "\n")
+    expected = test_case.get("expected")
+    options = {**options, **test_case.get("normalize", {})}
+
+    script_path = os.path.abspath(script_path)  # the child runs in the script's directory
+    run = _execute(
+        [sys.executable, script_path, *[str(arg) for arg in args or []]],
+        stdin=stdin or "",
+        timeout=timeout,
+        cwd=os.path.dirname(script_path),
+    )
+    actual, error, timed_out = run["stdout"].strip(), run["stderr"].strip(), run["timed_out"]
+    returncode = None if timed_out else run["returncode"]
+    if timed_out:
+        error = f"Timed out after {timeout}s."
+
+    wanted = normalize_output(expected, {**options, "match": "exact"})
+    got = normalize_output(actual, options)
+    if expected is None:
+        test_passed = True  # nothing to compare; the case only has to run cleanly
+    elif options["match"] == "contains":
+        test_passed = wanted in got
+    elif options["match"] == "suffix":
+        test_passed = _suffix_matches(got, wanted)
+    else:
+        test_passed = got == wanted
+    return {
+        "input": test_case.get("input"),
+        "args": args,
+        "expected": expected,
+        "actual": actual,
+        "passed": test_passed and returncode == 0,
+        "returncode": returncode,
+        "timed_out": timed_out,
+        "error": error[-500:],
+        "seconds": run["wall_seconds"],
+        "peak_rss_kb": run["peak_rss_kb"],
+        "cpu_seconds": run["cpu_seconds"],
+    }
+
+def _suffix_matches(got: str, wanted: str) -> bool:
+    if not wanted or got == wanted:
+        return got == wanted
+    if not got.endswith(wanted):
+        return False
+    before = got[-len(wanted) - 1]
+    return before.isspace() or before in PROMPT_ENDINGS
+
+def test_python_script(script_path: str, test_cases: list, timeout: float = TEST_CASE_TIMEOUT,
+                       normalize: dict = None, max_workers: int = TEST_WORKERS) -> dict:
     """
-    Tests a Python script with provided test cases.
-    Test cases should be a list of dicts: [{"input": ..., "expected": ...}]
-    Returns a dict with 'results', 'passed', and 'feedback' keys.
+    Tests a Python script with provided test cases, running them concurrently in
+    separate interpreters (at most max_workers at a time), each with its own timeout.
+    Test cases are dicts: {"input": ..., "expected": ...} plus optionally "args" (argv
+    list), "mode": "argv" to pass "input" as arguments instead of stdin, and
+    "normalize" to override the comparison options for that case. A case without
+    "expected" passes if the script exits cleanly.
+    Returns a dict with 'results', 'passed', 'feedback' and 'seconds' keys.
     """
     try:
-        # For simplicity, we'll modify the script to accept input and compare output
-        # In a real scenario, we'd use unit tests or a testing framework
-        results = []
-        passed = True
-        feedback = []
+        start = time.perf_counter()
+        if not test_cases:
+            return {"results": [], "passed": False, "feedback": "No test cases provided.", "seconds": 0.0}
+        options = {**NORMALIZE_DEFAULTS, **(normalize or {})}
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(test_cases))), thread_name_prefix="test") as pool:
+            results = list(pool.map(lambda case: _run_test_case(script_path, case, timeout, options), test_cases))
 
-        # Read the script content to check for a main function
-        with open(script_path, "r", encoding="utf-8") as f:
-            script_content = f.read()
-
-        # For this example, we'll assume the script has a function we can call
-        # In a more advanced setup, we can use `unittest` or `pytest`
-        for test_case in test_cases:
-            test_input = test_case.get("input")
-            expected = test_case.get("expected")
-
-            # Execute the script with input (simplified for demonstration)
-            # In practice, we'd modify the script to accept input or use a testing framework
-            result = run_python_script(script_path)
-            actual_output = result["output"]
-
-            test_passed = str(actual_output) == str(expected)
-            results.append({
-                "input": test_input,
-                "expected": expected,
-                "actual": actual_output,
-                "passed": test_passed
-            })
-            if not test_passed:
-                passed = False
-                feedback.append(f"Test failed for input {test_input}: expected {expected}, got {actual_output}")
+        feedback = []
+        for case in results:
+            if case["passed"]:
+                continue
+            if case["timed_out"]:
+                feedback.append(f"Test timed out for input {case['input']!r} after {timeout}s")
+            elif case["returncode"] != 0:
+                feedback.append(f"Test crashed for input {case['input']!r} (exit {case['returncode']}): {case['error']}")
+            else:
+                feedback.append(f"Test failed for input {case['input']!r}: expected {case['expected']!r}, got {case['actual']!r}")
 
         test_result = {
             "results": results,
-            "passed": passed,
-            "feedback": "\n".join(feedback) if feedback else "All tests passed."
+            "passed": not feedback,
+            "feedback": "\n".join(feedback) if feedback else "All tests passed.",
+            "seconds": round(time.perf_counter() - start, 3),
         }
-        print(f"[CodeExecutor] Test results for {script_path}: {test_result}")
-        with open("logs/sanya.log", "a", encoding="utf-8") as log_file:
-            log_file.write(f"[CodeExecutor] Test results for {script_path}: {test_result}\n")
+        log.debug(f"[CodeExecutor] Test results for {script_path}: {test_result}")
         return test_result
     except Exception as e:
         result = {"results": [], "passed": False, "feedback": f"Error testing script: {str(e)}"}
-        print(f"[CodeExecutor] Test error: {str(e)}")
-        with open("logs/sanya.log", "a", encoding="utf-8") as log_file:
-            log_file.write(f"[CodeExecutor] Test error: {str(e)}\n")
+        log.error(f"[CodeExecutor] Test error: {str(e)}")
         return result
 
-def serve_web_app(project_dir: str, port: int = 8000) -> dict:
+def serve_web_app(project_dir: str, port: int = None) -> dict:
     """
     Serves a web app from the project directory and validates its structure.
-    Returns a dict with 'url', 'success', and 'validation' keys.
+    Each project gets its own threaded server from the registry in modules/web_server;
+    serving the same directory again reuses its server.
+    Returns a dict with 'url', 'port', 'success', and 'validation' keys.
     """
     try:
-        # Change to project directory
-        original_dir = os.getcwd()
-        os.chdir(project_dir)
-
         # Check for index.html
-        index_file = "index.html"
+        index_file = os.path.join(project_dir, "index.html")
         if not os.path.exists(index_file):
-            os.chdir(original_dir)
-            return {"url": "", "success": False, "validation": "index.html not found."}
+            return {"url": "", "port": None, "success": False, "validation": "index.html not found."}
 
         # Validate HTML structure
         with open(index_file, "r", encoding="utf-8") as f:
@@ -131,43 +326,23 @@ def serve_web_app(project_dir: str, port: int = 8000) -> dict:
         if "<body>" not in content or "</body>" not in content:
             validation.append("Missing <body> tags.")
 
-        # Start a simple HTTP server
-        Handler = http.server.SimpleHTTPRequestHandler
-        httpd = socketserver.TCPServer(("", port), Handler)
-        
-        def serve():
-            print(f"[CodeExecutor] Serving web app at http://localhost:{port}")
-            with open("logs/sanya.log", "a", encoding="utf-8") as log_file:
-                log_file.write(f"[CodeExecutor] Serving web app at http://localhost:{port}\n")
-            httpd.serve_forever()
-
-        server_thread = threading.Thread(target=serve, daemon=True)
-        server_thread.start()
-
-        # Wait briefly to ensure the server starts
-        time.sleep(1)
-
-        os.chdir(original_dir)
+        server = web_server.registry.start(project_dir, port)
         return {
-            "url": f"http://localhost:{port}",
+            "url": f"http://localhost:{server.port}",
+            "port": server.port,
             "success": True,
             "validation": "\n".join(validation) if validation else "Web app structure looks valid."
         }
     except Exception as e:
-        os.chdir(original_dir)
-        result = {"url": "", "success": False, "validation": f"Error serving web app: {str(e)}"}
-        print(f"[CodeExecutor] Serve error: {str(e)}")
-        with open("logs/sanya.log", "a", encoding="utf-8") as log_file:
-            log_file.write(f"[CodeExecutor] Serve error: {str(e)}\n")
+        result = {"url": "", "port": None, "success": False, "validation": f"Error serving web app: {str(e)}"}
+        log.error(f"[CodeExecutor] Serve error: {str(e)}")
         return result
 
-def stop_web_server(httpd):
+def list_web_servers() -> list:
+    return web_server.registry.list()
+
+def stop_web_server(target) -> bool:
     """
-    Stops the web server.
+    Stops the web server given by port, project directory or server object.
     """
-    if httpd:
-        httpd.shutdown()
-        httpd.server_close()
-        print("[CodeExecutor] Web server stopped.")
-        with open("logs/sanya.log", "a", encoding="utf-8") as log_file:
-            log_file.write("[CodeExecutor] Web server stopped.\n")
\ No newline at end of file
+    return web_server.registry.stop(target)
@@ -0,0 +1,137 @@
+# modules/embedding_cache.py
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+import numpy as np
+from modules.logger import log
+
+CACHE_DIR = "memory/embeddings"
+
+class EmbeddingCache:
+    """
+    Content-addressed cache in front of a SentenceTransformer.
+    Keys are sha1(model name + text). Hot entries live in an in-memory LRU; every
+    vector is also persisted to a memory-mapped float32 file so restarts start warm.
+    """
+
+    _DIGEST = 20
+
+    def __init__(self, model, model_name: str, dimension: int = 384, directory: str = CACHE_DIR,
+                 max_entries: int = 4096, grow_rows: int = 1024):
+        self.model = model
+        self.model_name = model_name
+        self.dimension = dimension
+        self.max_entries = max_entries
+        self.grow_rows = grow_rows
+        self.lru = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        os.makedirs(directory, exist_ok=True)
+        slug = hashlib.sha1(model_name.encode("utf-8")).hexdigest()[:12]
+        self.keys_path = os.path.join(directory, f"{slug}.keys")
+        self.vectors_path = os.path.join(directory, f"{slug}.f32")
+        self._load()
+
+    def _load(self):
+        keys = b""
+        if os.path.exists(self.keys_path):
+            with open(self.keys_path, "rb") as f:
+                keys = f.read()
+        row_bytes = self.dimension * 4
+        capacity = os.path.getsize(self.vectors_path) // row_bytes if os.path.exists(self.vectors_path) else 0
+
+        # Keys are appended only after their vector is flushed, so any key beyond the
+        # vector file's capacity comes from a torn write and is dropped.
+        self.count = min(len(keys) // self._DIGEST, capacity)
+        self.rows = {keys[i * self._DIGEST:(i + 1) * self._DIGEST]: i for i in range(self.count)}
+        if len(keys) != self.count * self._DIGEST:
+            with open(self.keys_path, "ab") as f:
+                f.truncate(self.count * self._DIGEST)
+        self.keys_file = open(self.keys_path, "ab")
+        self.vectors = None
+        self._resize(max(capacity, self.grow_rows))
+        log.info(f"[EmbeddingCache] Loaded {self.count} cached embeddings for {self.model_name}")
+
+    def _resize(self, capacity):
+        if self.vectors is not None:
+            self.vectors.flush()
+            del self.vectors
+        with open(self.vectors_path, "ab") as f:
+            f.truncate(capacity * self.dimension * 4)
+        self.capacity = capacity
+        self.vectors = np.memmap(self.vectors_path, dtype="float32", mode="r+", shape=(capacity, self.dimension))
+
+    def _key(self, text):
+        return hashlib.sha1(f"{self.model_name}\0{text}".encode("utf-8")).digest()
+
+    def _remember(self, key, vector):
+        self.lru[key] = vector
+        self.lru.move_to_end(key)
+        while len(self.lru) > self.max_entries:
+            self.lru.popitem(last=False)
+
+    def _persist(self, keys, vectors):
+        if self.count + len(keys) > self.capacity:
+            self._resize(self.count + len(keys) + self.grow_rows)
+        self.vectors[self.count:self.count + len(keys)] = vectors
+        self.vectors.flush()
+        for key in keys:
+            self.rows[key] = self.count
+            self.count += 1
+        self.keys_file.write(b"".join(keys))
+        self.keys_file.flush()
+
+    def encode(self, texts: list) -> np.ndarray:
+        """Returns a (len(texts), dimension) float32 array, encoding only uncached texts."""
+        texts = [" ".join(text.split()) for text in texts]
+        keys = [self._key(text) for text in texts]
+        out = np.empty((len(texts), self.dimension), dtype="float32")
+        missing = OrderedDict()
+
+        with self.lock:
+            for i, key in enumerate(keys):
+                vector = self.lru.get(key)
+                if vector is not None:
+                    self.lru.move_to_end(key)
+                    self.hits += 1
+                elif key in self.rows:
+                    vector = np.array(self.vectors[self.rows[key]])
+                    self._remember(key, vector)
+                    self.hits += 1
+                    self.disk_hits += 1
+                elif key in missing:
+                    missing[key].append(i)
+                    continue
+                else:
+                    missing[key] = [i]
+                    continue
+                out[i] = vector
+
+        if missing:
+            fresh = np.asarray(self.model.encode([texts[pos[0]] for pos in missing.values()]), dtype="float32")
+            with self.lock:
+                self.misses += len(missing)
+                # Another thread may have persisted the same text while we were encoding
+                new = [(key, vector) for key, vector in zip(missing, fresh) if key not in self.rows]
+                if new:
+                    self._persist([key for key, _ in new], np.array([vector for _, vector in new]))
+                for vector, (key, positions) in zip(fresh, missing.items()):
+                    self._remember(key, vector)
+                    out[positions] = vector
+        return out
+
+    def stats(self) -> dict:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "memory_entries": len(self.lru),
+                "disk_entries": self.count,
+            }
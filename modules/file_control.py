@@ -3,6 +3,8 @@ import glob
 import shutil
 import time
 from typing import List, Tuple
+from modules.logger import log
+from modules.tracing import tracer
 
 def create_file(filename: str, content: str = "") -> str:
     try:
@@ -12,14 +14,11 @@ def create_file(filename: str, content: str = "") -> str:
         with open(filename, 'w', encoding="utf-8") as f:
             f.write(content)
         elapsed_time = time.time() - start_time
-        print(f"[FileControl] Created file: {filename} in {elapsed_time:.3f}s")
-        with open("logs/sanya.log", "a", encoding="utf-8") as log_file:
-            log_file.write(f"[FileControl] Created file: {filename} in {elapsed_time:.3f}s\n")
+        log.info(f"[FileControl] Created file: {filename} in {elapsed_time:.3f}s")
+        tracer.record("file.create", elapsed_time)
         return f"File '{filename}' created successfully."
     except Exception as e:
-        print(f"[FileControl] Error creating file: {e}")
-        with open("logs/sanya.log", "a", encoding="utf-8") as log_file:
-            log_file.write(f"[FileControl] Error creating file: {e}\n")
+        log.error(f"[FileControl] Error creating file: {e}")
         return f"Error creating file: {e}"
 
 def batch_create_files(files: List[Tuple[str, str]]) -> str:
@@ -30,14 +29,11 @@ def batch_create_files(files: List[Tuple[str, str]]) -> str:
             result = create_file(filename, content)
             results.append(result)
         elapsed_time = time.time() - start_time
-        print(f"[FileControl] Batch created {len(files)} files in {elapsed_time:.3f}s")
-        with open("logs/sanya.log", "a", encoding="utf-8") as log_file:
-            log_file.write(f"[FileControl] Batch created {len(files)} files in {elapsed_time:.3f}s\n")
+        log.info(f"[FileControl] Batch created {len(files)} files in {elapsed_time:.3f}s")
+        tracer.record("file.batch_create", elapsed_time)
         return "\n".join(results)
     except Exception as e:
-        print(f"[FileControl] Error in batch create: {e}")
-        with open("logs/sanya.log", "a", encoding="utf-8") as log_file:
-            log_file.write(f"[FileControl] Error in batch create: {e}\n")
+        log.error(f"[FileControl] Error in batch create: {e}")
         return f"Error in batch create: {e}"
 
 def edit_file(filename: str, content: str, append: bool = False) -> str:
@@ -48,14 +44,11 @@ def edit_file(filename: str, content: str, append: bool = False) -> str:
             f.write(content)
         action = "appended to" if append else "edited"
         elapsed_time = time.time() - start_time
-        print(f"[FileControl] {action.capitalize()} file: {filename} in {elapsed_time:.3f}s")
-        with open("logs/sanya.log", "a", encoding="utf-8") as log_file:
-            log_file.write(f"[FileControl] {action.capitalize()} file: {filename} in {elapsed_time:.3f}s\n")
+        log.info(f"[FileControl] {action.capitalize()} file: {filename} in {elapsed_time:.3f}s")
+        tracer.record("file.edit", elapsed_time)
         return f"File '{filename}' {action} successfully."
     except Exception as e:
-        print(f"[FileControl] Error editing file: {e}")
-        with open("logs/sanya.log", "a", encoding="utf-8") as log_file:
-            log_file.write(f"[FileControl] Error editing file: {e}\n")
+        log.error(f"[FileControl] Error editing file: {e}")
         return f"Error editing file: {e}"
 
 def read_file(filename: str) -> str:
@@ -64,14 +57,11 @@ def read_file(filename: str) -> str:
         with open(filename, 'r', encoding="utf-8") as f:
             content = f.read()
         elapsed_time = time.time() - start_time
-        print(f"[FileControl] Read file: {filename} in {elapsed_time:.3f}s")
-        with open("logs/sanya.log", "a", encoding="utf-8") as log_file:
-            log_file.write(f"[FileControl] Read file: {filename} in {elapsed_time:.3f}s\n")
+        log.info(f"[FileControl] Read file: {filename} in {elapsed_time:.3f}s")
+        tracer.record("file.read", elapsed_time)
         return content
     except Exception as e:
-        print(f"[FileControl] Error reading file: {e}")
-        with open("logs/sanya.log", "a", encoding="utf-8") as log_file:
-            log_file.write(f"[FileControl] Error reading file: {e}\n")
+        log.error(f"[FileControl] Error reading file: {e}")
         return f"Error reading file: {e}"
 
 def search_files(pattern: str, directory: str = ".") -> List[str]:
@@ -79,14 +69,11 @@ def search_files(pattern: str, directory: str = ".") -> List[str]:
         start_time = time.time()
         files = glob.glob(os.path.join(directory, pattern), recursive=True)
         elapsed_time = time.time() - start_time
-        print(f"[FileControl] Found {len(files)} files matching '{pattern}' in {elapsed_time:.3f}s")
-        with open("logs/sanya.log", "a", encoding="utf-8") as log_file:
-            log_file.write(f"[FileControl] Found {len(files)} files matching '{pattern}' in {elapsed_time:.3f}s\n")
+        log.info(f"[FileControl] Found {len(files)} files matching '{pattern}' in {elapsed_time:.3f}s")
+        tracer.record("file.search", elapsed_time)
         return files
     except Exception as e:
-        print(f"[FileControl] Error searching files: {e}")
-        with open("logs/sanya.log", "a", encoding="utf-8") as log_file:
-            log_file.write(f"[FileControl] Error searching files: {e}\n")
+        log.error(f"[FileControl] Error searching files: {e}")
         return []
 
 def delete_file(filename: str) -> str:
@@ -94,14 +81,11 @@ def delete_file(filename: str) -> str:
         start_time = time.time()
         os.remove(filename)
         elapsed_time = time.time() - start_time
-        print(f"[FileControl] Deleted file: {filename} in {elapsed_time:.3f}s")
-        with open("logs/sanya.log", "a", encoding="utf-8") as log_file:
-            log_file.write(f"[FileControl] Deleted file: {filename} in {elapsed_time:.3f}s\n")
+        log.info(f"[FileControl] Deleted file: {filename} in {elapsed_time:.3f}s")
+        tracer.record("file.delete", elapsed_time)
         return f"File '{filename}' deleted successfully."
     except Exception as e:
-        print(f"[FileControl] Error deleting file: {e}")
-        with open("logs/sanya.log", "a", encoding="utf-8") as log_file:
-            log_file.write(f"[FileControl] Error deleting file: {e}\n")
+        log.error(f"[FileControl] Error deleting file: {e}")
         return f"Error deleting file: {e}"
 
 def copy_file(src: str, dst: str) -> str:
@@ -109,12 +93,9 @@ def copy_file(src: str, dst: str) -> str:
         start_time = time.time()
         shutil.copy2(src, dst)
         elapsed_time = time.time() - start_time
-        print(f"[FileControl] Copied file from {src} to {dst} in {elapsed_time:.3f}s")
-        with open("logs/sanya.log", "a", encoding="utf-8") as log_file:
-            log_file.write(f"[FileControl] Copied file from {src} to {dst} in {elapsed_time:.3f}s\n")
+        log.info(f"[FileControl] Copied file from {src} to {dst} in {elapsed_time:.3f}s")
+        tracer.record("file.copy", elapsed_time)
         return f"File copied from '{src}' to '{dst}' successfully."
     except Exception as e:
-        print(f"[FileControl] Error copying file: {e}")
-        with open("logs/sanya.log", "a", encoding="utf-8") as log_file:
-            log_file.write(f"[FileControl] Error copying file: {e}\n")
+        log.error(f"[FileControl] Error copying file: {e}")
         return f"Error copying file: {e}"
\ No newline at end of file
@@ -0,0 +1,227 @@
+# modules/index_manager.py
+import math
+import threading
+import time
+import faiss
+import numpy as np
+from modules.logger import log
+
+# (minimum ntotal, faiss index factory string). The last tier whose threshold is reached
+# is built in the background; below the first threshold only exact search is used.
+INDEX_TIERS = [
+    (20000, "HNSW32"),
+    (250000, "IVF{nlist},Flat"),
+]
+HNSW_EF_SEARCH = 64
+IVF_NPROBE = 16
+# Filtered searches over at most this many candidates go to the exact index, where
+# the id selector is cheap and recall is guaranteed.
+FILTERED_EXACT_LIMIT = 20000
+# Rebuild the approximate index once this fraction of it is tombstoned deletions.
+TOMBSTONE_REBUILD_RATIO = 0.1
+
+class IndexManager:
+    """
+    Owns the long-term FAISS indexes.
+    An exact IndexIDMap(IndexFlatIP) over L2-normalised vectors is the source of truth (and
+    what gets persisted), so scores are cosine similarities and ids are stable memory ids.
+    Once ntotal crosses a tier threshold an approximate index is trained on a background
+    thread and swapped in atomically; vectors added while it trains are caught up before
+    the swap. Deletions are applied in place; indexes that cannot remove ids (HNSW) keep
+    tombstones that are filtered at search time until the next rebuild.
+    """
+
+    def __init__(self, base_index, tiers=None):
+        self.lock = threading.RLock()
+        self.tiers = INDEX_TIERS if tiers is None else tiers
+        self.exact = self._as_exact(base_index)
+        self.ann = None
+        self.ann_spec = None
+        self.ann_tier = None
+        self.tombstones = set()
+        self.building = False
+        self.last_report = None
+        self._maybe_rebuild()
+
+    @staticmethod
+    def _as_exact(base_index):
+        if isinstance(base_index, faiss.IndexIDMap) and isinstance(faiss.downcast_index(base_index.index), faiss.IndexFlatIP):
+            return base_index
+        exact = faiss.IndexIDMap(faiss.IndexFlatIP(base_index.d))
+        if base_index.ntotal:
+            # Older stores used a bare IndexFlatL2 on raw vectors, linked to metadata by
+            # row position: migrate to cosine/inner product with ids = row + 1.
+            vectors = base_index.reconstruct_n(0, base_index.ntotal)
+            faiss.normalize_L2(vectors)
+            exact.add_with_ids(vectors, np.arange(1, base_index.ntotal + 1, dtype="int64"))
+            log.info(f"[IndexManager] Migrated {base_index.ntotal} vectors to id-mapped inner product.")
+        return exact
+
+    @property
+    def ntotal(self):
+        return self.exact.ntotal
+
+    @property
+    def d(self):
+        return self.exact.d
+
+    def ids(self) -> np.ndarray:
+        with self.lock:
+            return faiss.vector_to_array(self.exact.id_map).copy()
+
+    def add(self, vectors, ids):
+        vectors = np.array(vectors, dtype="float32", copy=True).reshape(-1, self.d)
+        ids = np.asarray(ids, dtype="int64")
+        faiss.normalize_L2(vectors)
+        with self.lock:
+            self.exact.add_with_ids(vectors, ids)
+            if self.ann is not None:
+                self.ann.add_with_ids(vectors, ids)
+        self._maybe_rebuild()
+
+    def remove(self, ids) -> int:
+        ids = np.asarray(list(ids), dtype="int64")
+        if not len(ids):
+            return 0
+        with self.lock:
+            removed = self.exact.remove_ids(ids)
+            if self.ann is not None:
+                try:
+                    self.ann.remove_ids(ids)
+                except RuntimeError:
+                    self.tombstones.update(ids.tolist())
+                    if len(self.tombstones) > TOMBSTONE_REBUILD_RATIO * max(1, self.ann.ntotal):
+                        self.ann_tier = None  # force a rebuild without the deleted vectors
+        self._maybe_rebuild()
+        return removed
+
+    def search(self, queries, k, allowed_ids=None):
+        """
+        Returns (similarities, ids) from the active index, -1 ids padding missing hits.
+        allowed_ids restricts the search to those ids.
+        """
+        queries = np.array(queries, dtype="float32", copy=True).reshape(-1, self.d)
+        faiss.normalize_L2(queries)
+        keep = []  # selectors must outlive the search call
+        with self.lock:
+            use_exact = self.ann is None or (allowed_ids is not None and len(allowed_ids) <= FILTERED_EXACT_LIMIT)
+            active = self.exact if use_exact else self.ann
+
+            selector = None
+            if allowed_ids is not None:
+                selector = faiss.IDSelectorBatch(np.asarray(allowed_ids, dtype="int64"))
+                keep.append(selector)
+            if not use_exact and self.tombstones:
+                excluded = faiss.IDSelectorBatch(np.fromiter(self.tombstones, dtype="int64"))
+                not_deleted = faiss.IDSelectorNot(excluded)
+                keep += [excluded, not_deleted]
+                selector = not_deleted if selector is None else faiss.IDSelectorAnd(selector, not_deleted)
+                keep.append(selector)
+
+            if selector is None:
+                return active.search(queries, k)
+            if not use_exact and self.ann_spec.startswith("IVF"):
+                params = faiss.SearchParametersIVF(sel=selector, nprobe=faiss.extract_index_ivf(self.ann).nprobe)
+            else:
+                params = faiss.SearchParameters(sel=selector)
+            return active.search(queries, k, params=params)
+
+    def serialize(self):
+        with self.lock:
+            return faiss.serialize_index(self.exact)
+
+    def _target_tier(self, ntotal):
+        tier = None
+        for i, (threshold, _) in enumerate(self.tiers):
+            if ntotal >= threshold:
+                tier = i
+        return tier
+
+    def _maybe_rebuild(self):
+        with self.lock:
+            tier = self._target_tier(self.exact.ntotal)
+            if tier is None:
+                self.ann = self.ann_spec = self.ann_tier = None
+                self.tombstones.clear()
+                return
+            if tier == self.ann_tier or self.building:
+                return
+            self.building = True
+            spec = self.tiers[tier][1].format(nlist=max(1, int(4 * math.sqrt(self.exact.ntotal))))
+        threading.Thread(target=self._build, args=(tier, spec), daemon=True).start()
+
+    def _snapshot(self):
+        vectors = faiss.downcast_index(self.exact.index).reconstruct_n(0, self.exact.ntotal)
+        return vectors, faiss.vector_to_array(self.exact.id_map).copy()
+
+    def _build(self, tier, spec):
+        try:
+            start = time.time()
+            with self.lock:
+                vectors, ids = self._snapshot()
+            ann = faiss.IndexIDMap(faiss.index_factory(self.d, spec, faiss.METRIC_INNER_PRODUCT))
+            if not ann.is_trained:
+                ann.train(vectors)
+            ann.add_with_ids(vectors, ids)
+            self._tune(ann)
+            with self.lock:
+                # Catch up with inserts and deletions that happened while training
+                current_vectors, current_ids = self._snapshot()
+                added = ~np.isin(current_ids, ids)
+                if added.any():
+                    ann.add_with_ids(current_vectors[added], current_ids[added])
+                self.tombstones = set(ids[~np.isin(ids, current_ids)].tolist())
+                if self.tombstones:
+                    try:
+                        ann.remove_ids(np.fromiter(self.tombstones, dtype="int64"))
+                        self.tombstones.clear()
+                    except RuntimeError:
+                        pass
+                self.ann = ann
+                self.ann_spec = spec
+                self.ann_tier = tier
+            log.info(f"[IndexManager] Swapped in {spec} over {ann.ntotal} vectors in {time.time() - start:.2f}s")
+            self.last_report = self.benchmark()
+            log.info(f"[IndexManager] {self.last_report}")
+        except Exception as e:
+            log.warning(f"[IndexManager] Failed to build {spec}, staying on exact search: {e}")
+        finally:
+            with self.lock:
+                self.building = False
+
+    @staticmethod
+    def _tune(ann):
+        inner = faiss.downcast_index(ann.index)
+        if isinstance(inner, faiss.IndexHNSW):
+            inner.hnsw.efSearch = HNSW_EF_SEARCH
+        else:
+            ivf = faiss.extract_index_ivf(inner)
+            ivf.nprobe = min(IVF_NPROBE, ivf.nlist)
+
+    def benchmark(self, n_queries=100, k=10) -> dict:
+        """Recall@k and mean per-query latency of the active index against exact search."""
+        with self.lock:
+            ntotal = self.exact.ntotal
+            if ntotal == 0:
+                return {}
+            flat = faiss.downcast_index(self.exact.index)
+            rows = np.random.default_rng(0).choice(ntotal, size=min(n_queries, ntotal), replace=False)
+            queries = np.vstack([flat.reconstruct(int(r)) for r in rows])
+            k = min(k, ntotal)
+
+            start = time.perf_counter()
+            _, exact_ids = self.exact.search(queries, k)
+            exact_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+            report = {"index": self.ann_spec or "Flat", "ntotal": ntotal, "k": k, "exact_ms": round(exact_ms, 4)}
+            if self.ann is None:
+                report.update({"ann_ms": report["exact_ms"], "recall": 1.0})
+                return report
+
+        start = time.perf_counter()
+        _, ann_ids = self.search(queries, k)
+        ann_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+        hits = sum(len(set(a) & set(e)) for a, e in zip(ann_ids.tolist(), exact_ids.tolist()))
+        report.update({"ann_ms": round(ann_ms, 4), "recall": hits / (len(queries) * k)})
+        return report
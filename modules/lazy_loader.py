@@ -0,0 +1,94 @@
+# modules/lazy_loader.py
+import importlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from modules.logger import log
+
+PROCESS_START = time.perf_counter()
+REGISTRY = {}
+WARMUP_WORKERS = 2
+
+class LazyModel:
+    """
+    Handle for a heavy model that is imported and constructed on first use.
+    Attribute access and calls are forwarded to the loaded object, so a handle can
+    stand in for the model itself (`tts.tts(...)`, `sentiment_analyzer(text)`).
+    Import and construction times are recorded separately for the startup report.
+    """
+
+    def __init__(self, name: str, factory, import_name: str = None):
+        self._name = name
+        self._factory = factory
+        self._import_name = import_name
+        self._lock = threading.Lock()
+        self._value = None
+        self._loaded = False
+        self.import_seconds = None
+        self.load_seconds = None
+        self.ready_at = None
+        REGISTRY[name] = self
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def get(self):
+        if self._loaded:
+            return self._value
+        # A warm-up already in progress holds the lock, so this waits for it
+        with self._lock:
+            if self._loaded:
+                return self._value
+            start = time.perf_counter()
+            module = importlib.import_module(self._import_name) if self._import_name else None
+            self.import_seconds = time.perf_counter() - start
+
+            start = time.perf_counter()
+            self._value = self._factory(module) if self._import_name else self._factory()
+            self.load_seconds = time.perf_counter() - start
+            self.ready_at = time.perf_counter() - PROCESS_START
+            self._loaded = True
+        log.info(f"[Startup] Loaded {self._name} (import {self.import_seconds:.2f}s, load {self.load_seconds:.2f}s)")
+        return self._value
+
+    def __getattr__(self, attr):
+        if attr.startswith("_"):
+            raise AttributeError(attr)
+        return getattr(self.get(), attr)
+
+    def __call__(self, *args, **kwargs):
+        return self.get()(*args, **kwargs)
+
+
+def warm_up(names: list = None) -> list:
+    """
+    Loads the named models (all registered ones by default) on a background pool, in
+    the given order, and logs the startup report once they are all ready.
+    """
+    names = names or list(REGISTRY)
+    executor = ThreadPoolExecutor(max_workers=WARMUP_WORKERS, thread_name_prefix="warmup")
+    futures = [executor.submit(REGISTRY[name].get) for name in names if name in REGISTRY]
+    executor.shutdown(wait=False)
+
+    def report_when_ready():
+        wait(futures)
+        for future in futures:
+            if future.exception():
+                log.error(f"[Startup] Warm-up error: {future.exception()}")
+        report = startup_report()
+        log.info(report)
+
+    threading.Thread(target=report_when_ready, daemon=True).start()
+    return futures
+
+def startup_report() -> str:
+    lines = [f"[Startup] Model timings ({time.perf_counter() - PROCESS_START:.2f}s since start):"]
+    for name, model in REGISTRY.items():
+        if model.loaded:
+            lines.append(
+                f"  {name:<22} import {model.import_seconds:6.2f}s  load {model.load_seconds:6.2f}s  ready at {model.ready_at:6.2f}s"
+            )
+        else:
+            lines.append(f"  {name:<22} not loaded")
+    return "\n".join(lines)
@@ -0,0 +1,159 @@
+# modules/logger.py
+import os
+import sys
+import time
+import queue
+import atexit
+import threading
+from datetime import datetime
+
+LOG_PATH = os.getenv("SANYA_LOG_FILE", "logs/sanya.log")
+LEVELS = {"DEBUG": 10, "INFO": 20, "WARNING": 30, "ERROR": 40}
+# Separate thresholds for the log file and the console; DEBUG carries the large
+# dumps (memory context, raw LLM output, full test results).
+LOG_LEVEL = os.getenv("SANYA_LOG_LEVEL", "INFO").upper()
+CONSOLE_LEVEL = os.getenv("SANYA_CONSOLE_LEVEL", "INFO").upper()
+LOG_MAX_BYTES = 5 * 1024 * 1024
+LOG_ROTATE_SECONDS = 24 * 3600
+LOG_BACKUPS = 5
+FLUSH_INTERVAL = 0.5  # seconds a line may wait before the batch is written
+BATCH_SIZE = 512
+
+
+def _started_at(path: str) -> float:
+    """When a log file was started: the timestamp of its first line, else its mtime."""
+    try:
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            first = f.readline()
+        modified = os.path.getmtime(path)
+    except OSError:
+        return time.time()
+    try:
+        return float(first.split("\t", 1)[0])  # trace lines start with epoch seconds
+    except ValueError:
+        pass
+    try:
+        return datetime.strptime(first[:19], "%Y-%m-%d %H:%M:%S").timestamp()
+    except ValueError:
+        return modified
+
+
+class AsyncLog:
+    """
+    One writer thread owns the log file. Callers only format and enqueue, so logging
+    never blocks on disk; lines are written and flushed in batches, and the file is
+    rotated by size or age into LOG_BACKUPS numbered copies.
+    """
+
+    def __init__(self, path: str = LOG_PATH, level: str = LOG_LEVEL, console_level: str = CONSOLE_LEVEL):
+        self.path = path
+        self.level = LEVELS.get(level, 20)
+        self.console_level = LEVELS.get(console_level, 20)
+        self.queue = queue.SimpleQueue()
+        self.file = None
+        self.opened_at = None
+        self.lines = 0
+        self.lock = threading.Lock()
+        self.thread = None
+        atexit.register(self.close)
+
+    def _start(self):
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, daemon=True, name="log-writer")
+                self.thread.start()
+
+    def write(self, level: str, message: str, echo: bool = True):
+        number = LEVELS[level]
+        if echo and number >= self.console_level:
+            print(message)
+        if number >= self.level:
+            if self.thread is None:
+                self._start()
+            self.queue.put(f"{datetime.now():%Y-%m-%d %H:%M:%S} {level:<7} {message}\n")
+
+    def debug(self, message: str, echo: bool = True):
+        self.write("DEBUG", message, echo)
+
+    def info(self, message: str, echo: bool = True):
+        self.write("INFO", message, echo)
+
+    def warning(self, message: str, echo: bool = True):
+        self.write("WARNING", message, echo)
+
+    def error(self, message: str, echo: bool = True):
+        self.write("ERROR", message, echo)
+
+    def append(self, line: str):
+        """Queues a preformatted line as-is: no timestamp, level or console echo."""
+        if self.thread is None:
+            self._start()
+        self.queue.put(line)
+
+    def flush(self, timeout: float = 2.0):
+        """Blocks until everything logged so far is on disk."""
+        if self.thread is None:
+            return
+        done = threading.Event()
+        self.queue.put(done)
+        done.wait(timeout)
+
+    def close(self):
+        if self.thread is not None and self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join(timeout=2.0)
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self.file = open(self.path, "a", encoding="utf-8")
+        # Age counts from when the file was started, not from this process opening it,
+        # so time-based rotation still happens when the assistant restarts often
+        self.opened_at = _started_at(self.path) if self.file.tell() else time.time()
+
+    def _rotate(self):
+        self.file.close()
+        for n in range(LOG_BACKUPS - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{n}"):
+                os.replace(f"{self.path}.{n}", f"{self.path}.{n + 1}")
+        os.replace(self.path, f"{self.path}.1")
+        self._open()
+
+    def _write_batch(self, batch: list):
+        if not batch:
+            return
+        try:
+            if self.file is None:
+                self._open()
+            if self.file.tell() >= LOG_MAX_BYTES or time.time() - self.opened_at >= LOG_ROTATE_SECONDS:
+                self._rotate()
+            self.file.write("".join(batch))
+            self.file.flush()
+            self.lines += len(batch)
+        except OSError as e:
+            print(f"[Log] Could not write {self.path}: {e}", file=sys.stderr)
+        batch.clear()
+
+    def _run(self):
+        batch, last_flush = [], time.monotonic()
+        while True:
+            try:
+                item = self.queue.get(timeout=FLUSH_INTERVAL)
+            except queue.Empty:
+                item = ""
+            if item is None or isinstance(item, threading.Event):
+                self._write_batch(batch)
+                last_flush = time.monotonic()
+                if item is None:
+                    if self.file is not None:
+                        self.file.close()
+                    return
+                item.set()
+                continue
+            if item:
+                batch.append(item)
+            if batch and (len(batch) >= BATCH_SIZE or time.monotonic() - last_flush >= FLUSH_INTERVAL):
+                self._write_batch(batch)
+                last_flush = time.monotonic()
+
+
+log = AsyncLog()
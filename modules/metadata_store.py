@@ -0,0 +1,141 @@
+# modules/metadata_store.py
+import json
+import sqlite3
+import threading
+import time
+
+class MetadataStore:
+    """
+    SQLite table of long-term memories keyed by a stable id that doubles as the
+    FAISS id. Known fields get their own indexed columns; anything else in the
+    metadata dict is kept as JSON in `extra`.
+    """
+
+    COLUMNS = ("topic", "source", "important", "created_at")
+
+    def __init__(self, path: str):
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        with self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS memories (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    text TEXT NOT NULL,
+                    topic TEXT,
+                    source TEXT,
+                    important INTEGER NOT NULL DEFAULT 0,
+                    created_at REAL NOT NULL,
+                    extra TEXT NOT NULL DEFAULT '{}'
+                )
+            """)
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_memories_topic ON memories(topic)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_memories_source ON memories(source)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_memories_age ON memories(important, created_at)")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value TEXT)")
+
+    def _row_values(self, text, meta):
+        extra = {k: v for k, v in meta.items() if k not in self.COLUMNS and k not in ("id", "text")}
+        return (
+            text,
+            meta.get("topic"),
+            meta.get("source"),
+            int(bool(meta.get("important", False))),
+            float(meta.get("created_at", time.time())),
+            json.dumps(extra),
+        )
+
+    def insert_many(self, texts, metas, ids=None) -> list:
+        """Inserts rows in one transaction and returns their ids."""
+        with self.lock, self.conn:
+            new_ids = []
+            for i, (text, meta) in enumerate(zip(texts, metas)):
+                values = self._row_values(text, meta)
+                if ids is None:
+                    cur = self.conn.execute(
+                        "INSERT INTO memories (text, topic, source, important, created_at, extra) VALUES (?, ?, ?, ?, ?, ?)",
+                        values,
+                    )
+                    new_ids.append(cur.lastrowid)
+                else:
+                    self.conn.execute(
+                        "INSERT OR REPLACE INTO memories (id, text, topic, source, important, created_at, extra) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        (int(ids[i]),) + values,
+                    )
+                    new_ids.append(int(ids[i]))
+            return new_ids
+
+    def delete(self, ids) -> int:
+        with self.lock, self.conn:
+            cur = self.conn.executemany("DELETE FROM memories WHERE id = ?", [(int(i),) for i in ids])
+            return cur.rowcount
+
+    def get(self, ids) -> dict:
+        """Returns {id: metadata dict} for the ids that still exist."""
+        ids = [int(i) for i in ids]
+        if not ids:
+            return {}
+        placeholders = ",".join("?" * len(ids))
+        with self.lock:
+            rows = self.conn.execute(f"SELECT * FROM memories WHERE id IN ({placeholders})", ids).fetchall()
+        return {row["id"]: self._to_dict(row) for row in rows}
+
+    @staticmethod
+    def _to_dict(row):
+        entry = json.loads(row["extra"])
+        entry.update({
+            "id": row["id"],
+            "text": row["text"],
+            "topic": row["topic"],
+            "source": row["source"],
+            "important": bool(row["important"]),
+            "created_at": row["created_at"],
+        })
+        return {k: v for k, v in entry.items() if v is not None}
+
+    def ids(self, topic=None, source=None) -> list:
+        clauses, params = [], []
+        if topic is not None:
+            clauses.append("topic = ?")
+            params.append(topic)
+        if source is not None:
+            clauses.append("source = ?")
+            params.append(source)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self.lock:
+            return [row[0] for row in self.conn.execute(f"SELECT id FROM memories{where}", params)]
+
+    def count(self) -> int:
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM memories").fetchone()[0]
+
+    def texts(self, ids) -> dict:
+        return {i: entry["text"] for i, entry in self.get(ids).items()}
+
+    def expired_ids(self, max_age_seconds, keep_important=True) -> list:
+        """Ids older than max_age_seconds, optionally sparing important memories."""
+        cutoff = time.time() - max_age_seconds
+        query = "SELECT id FROM memories WHERE created_at < ?" + (" AND important = 0" if keep_important else "")
+        with self.lock:
+            return [row[0] for row in self.conn.execute(query, (cutoff,))]
+
+    def overflow_ids(self, max_rows) -> list:
+        """Ids to drop to get back under max_rows: unimportant first, then oldest."""
+        with self.lock:
+            excess = self.count() - max_rows
+            if excess <= 0:
+                return []
+            return [row[0] for row in self.conn.execute(
+                "SELECT id FROM memories ORDER BY important ASC, created_at ASC LIMIT ?", (excess,)
+            )]
+
+    def get_state(self, key, default=None):
+        with self.lock:
+            row = self.conn.execute("SELECT value FROM state WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set_state(self, key, value):
+        with self.lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO state (key, value) VALUES (?, ?)", (key, json.dumps(value)))
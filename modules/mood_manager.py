@@ -1,13 +1,16 @@
-from core.memory_manager import MemoryManager
-from transformers import pipeline
+from modules.lazy_loader import LazyModel
 from typing import Dict, List
+from modules.logger import log
 
 class MoodManager:
     def __init__(self):
-        self.memory = MemoryManager()
         self.current_mood = "neutral"
         self.mood_history: List[Dict] = []
-        self.sentiment_analyzer = pipeline("sentiment-analysis", model="distilbert-base-uncased-finetuned-sst-2-english")
+        self.sentiment_analyzer = LazyModel(
+            "sentiment",
+            lambda transformers: transformers.pipeline("sentiment-analysis", model="distilbert-base-uncased-finetuned-sst-2-english"),
+            "transformers",
+        )
         self.mood_transitions = {
             "positive": {"happy": 0.7, "neutral": 0.2, "sad": 0.1},
             "negative": {"sad": 0.6, "neutral": 0.3, "angry": 0.1},
@@ -40,14 +43,10 @@ class MoodManager:
                     mood_scores[mood] += prob * entry["score"]
 
             self.current_mood = max(mood_scores, key=mood_scores.get)
-            print(f"[MoodManager] Detected mood: {self.current_mood} (Scores: {mood_scores})")
-            with open("logs/sanya.log", "a", encoding="utf-8") as log_file:
-                log_file.write(f"[MoodManager] Detected mood: {self.current_mood} (Scores: {mood_scores})\n")
+            log.info(f"[MoodManager] Detected mood: {self.current_mood} (Scores: {mood_scores})")
             return self.current_mood
         except Exception as e:
-            print(f"[MoodManager] Error detecting mood: {e}")
-            with open("logs/sanya.log", "a", encoding="utf-8") as log_file:
-                log_file.write(f"[MoodManager] Error detecting mood: {e}\n")
+            log.error(f"[MoodManager] Error detecting mood: {e}")
             self.current_mood = "neutral"
             return self.current_mood
 
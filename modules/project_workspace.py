@@ -0,0 +1,241 @@
+import os
+import re
+import threading
+import time
+from modules.logger import log
+
+SKIP_DIRS = {"__pycache__", ".git", "node_modules"}
+# Share of an existing file's lines a new version must keep to count as a rewrite of
+# it rather than a fragment to merge in.
+REWRITE_OVERLAP = 0.5
+
+HUNK_HEADER = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+TOP_LEVEL = re.compile(
+    r"^(?:async\s+)?(?:def|class|function)\s+([A-Za-z_$][\w$]*)"
+    r"|^(?:export\s+)?(?:const|let|var)\s+([A-Za-z_$][\w$]*)\s*="
+)
+MERGEABLE = (".py", ".js")
+
+
+def looks_like_patch(content: str) -> bool:
+    return bool(re.search(r"^@@ -\d+", content, re.MULTILINE)) and content.lstrip().startswith(("---", "@@", "diff "))
+
+def apply_patch(existing: str, patch: str) -> str:
+    """
+    Applies a unified diff. Each hunk is placed at its stated line if the context
+    matches there, otherwise at the first place it does; raises ValueError if a hunk
+    matches nowhere.
+    """
+    lines = existing.splitlines()
+    hunks, current = [], None
+    for line in patch.splitlines():
+        header = HUNK_HEADER.match(line)
+        if header:
+            current = (int(header.group(1)), [])
+            hunks.append(current)
+        elif current is not None and line[:1] in (" ", "-", "+", ""):
+            if line.startswith(("---", "+++")) and not current[1]:
+                continue
+            current[1].append(line or " ")
+
+    offset = 0
+    for start, body in hunks:
+        old = [line[1:] for line in body if line[0] in " -"]
+        new = [line[1:] for line in body if line[0] in " +"]
+        position = max(start - 1 + offset, 0)
+        if lines[position:position + len(old)] != old:
+            position = next(
+                (p for p in range(len(lines) - len(old) + 1) if lines[p:p + len(old)] == old), None
+            )
+            if position is None:
+                raise ValueError(f"patch hunk at line {start} does not match")
+        lines[position:position + len(old)] = new
+        offset += len(new) - len(old)
+    return "\n".join(lines) + ("\n" if existing.endswith("\n") or not existing else "")
+
+def _blocks(content: str) -> list:
+    """
+    Splits Python or JavaScript source into top-level blocks: [name, lines] where name
+    is the defined function/class/variable, "__main__" for the main guard, or None
+    for other top-level statements. Decorators stay with what they decorate.
+    """
+    blocks, decorators = [], []
+    for line in content.splitlines():
+        match = TOP_LEVEL.match(line)
+        if match:
+            blocks.append([match.group(1) or match.group(2), decorators + [line]])
+            decorators = []
+        elif line.startswith("@"):
+            decorators.append(line)
+        elif line and not line[0].isspace() and line[0] not in "})]":
+            name = "__main__" if line.startswith("if __name__") else None
+            blocks.append([name, decorators + [line]])
+            decorators = []
+        elif blocks:
+            blocks[-1][1].append(line)
+        else:
+            blocks.append([None, [line]])
+    if decorators:
+        blocks.append([None, decorators])
+    return blocks
+
+def merge_definitions(existing: str, fragment: str) -> str:
+    """
+    Merges a fragment into a module definition by definition: definitions with an
+    existing name replace it in place, new ones go before the main guard (or at the
+    end), and new top-level statements such as imports go after the existing ones.
+    """
+    blocks = _blocks(existing)
+    names = {name: i for i, (name, _) in enumerate(blocks) if name}
+    present = {"\n".join(lines).strip() for _, lines in blocks}
+    head, tail = [], []
+    for name, lines in _blocks(fragment):
+        text = "\n".join(lines).strip()
+        if not text or text in present:
+            continue
+        if name in names:
+            blocks[names[name]][1] = lines
+        elif name is None and re.match(r"(import|from)\s", text):
+            head.append([None, lines])
+        else:
+            tail.append([name, lines])
+
+    statements = [i for i, (name, lines) in enumerate(blocks) if name is None and re.match(r"(import|from)\s", "\n".join(lines).strip())]
+    insert_at = statements[-1] + 1 if statements else 0
+    blocks[insert_at:insert_at] = head
+    main = next((i for i, (name, _) in enumerate(blocks) if name == "__main__"), len(blocks))
+    blocks[main:main] = tail
+
+    # Re-space: one-line statements (imports) stay together, everything else is
+    # separated by a blank line
+    parts, previous_simple = [], None
+    for name, lines in blocks:
+        text = "\n".join(lines).strip("\n")
+        if not text.strip():
+            continue
+        simple = name is None and "\n" not in text
+        if parts:
+            parts.append("\n" if simple and previous_simple else "\n\n")
+        parts.append(text)
+        previous_simple = simple
+    return "".join(parts) + "\n"
+
+def merge_content(filename: str, existing: str, incoming: str):
+    """Returns (merged content, how) for a generated file written over an existing one."""
+    if existing == incoming:
+        return existing, "unchanged"
+    if not existing.strip():
+        return incoming, "replaced"
+    if looks_like_patch(incoming):
+        return apply_patch(existing, incoming), "patched"
+    existing_lines = {line.strip() for line in existing.splitlines() if line.strip()}
+    incoming_lines = {line.strip() for line in incoming.splitlines() if line.strip()}
+    if existing_lines and len(existing_lines & incoming_lines) / len(existing_lines) >= REWRITE_OVERLAP:
+        return incoming, "replaced"
+    if filename.endswith(MERGEABLE):
+        return merge_definitions(existing, incoming), "merged"
+    if incoming.strip() in existing:
+        return existing, "unchanged"
+    if filename.endswith((".html", ".htm")):
+        # Markup fragments belong inside the document, not after it
+        close = re.search(r"</body\s*>|</html\s*>", existing, re.IGNORECASE)
+        if close:
+            return existing[:close.start()] + incoming.rstrip("\n") + "\n" + existing[close.start():], "inserted"
+    return existing.rstrip("\n") + "\n" + incoming, "appended"
+
+
+class ProjectWorkspace:
+    """
+    In-memory view of a generated project. Files are read from disk once; writes
+    update memory, are merged with what is already there, and are flushed to disk in
+    a batch at step boundaries. Every flush starts a new version, and
+    changed_files() lists what changed since a given version without touching disk.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self.contents = {}
+        self.modified_at = {}  # name -> version in which it last changed
+        self.dirty = set()
+        self.version = 0
+        self.lock = threading.RLock()
+        os.makedirs(root, exist_ok=True)
+        for directory, subdirs, filenames in os.walk(root):
+            subdirs[:] = [d for d in subdirs if d not in SKIP_DIRS]
+            for filename in filenames:
+                path = os.path.join(directory, filename)
+                try:
+                    with open(path, "r", encoding="utf-8") as f:
+                        self.contents[os.path.relpath(path, root)] = f.read()
+                except (UnicodeDecodeError, OSError):
+                    continue
+                self.modified_at[os.path.relpath(path, root)] = 0
+
+    @staticmethod
+    def normalize(name: str) -> str:
+        name = os.path.normpath(name).lstrip(os.sep)
+        if name.startswith(".."):
+            raise ValueError(f"'{name}' is outside the project")
+        return name
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.root, self.normalize(name))
+
+    def files(self, suffix: str = "") -> list:
+        with self.lock:
+            return sorted(name for name in self.contents if name.endswith(suffix))
+
+    def read(self, name: str) -> str:
+        with self.lock:
+            return self.contents.get(self.normalize(name), "")
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return dict(self.contents)
+
+    def write(self, name: str, content: str) -> bool:
+        """Replaces a file's contents; returns whether anything changed."""
+        name = self.normalize(name)
+        with self.lock:
+            if self.contents.get(name) == content:
+                return False
+            self.contents[name] = content
+            self.modified_at[name] = self.version
+            self.dirty.add(name)
+            return True
+
+    def apply(self, name: str, content: str) -> str:
+        """Writes generated content, merging it with the current file. Returns how."""
+        name = self.normalize(name)
+        with self.lock:
+            if name not in self.contents:
+                self.write(name, content)
+                return "created"
+            merged, how = merge_content(name, self.contents[name], content)
+            self.write(name, merged)
+            return how
+
+    def changed_files(self, since: int = None) -> list:
+        """Files changed in or after version `since` (default: the current, unflushed one)."""
+        since = self.version if since is None else since
+        with self.lock:
+            return sorted(name for name, version in self.modified_at.items() if version >= since)
+
+    def flush(self) -> list:
+        """Writes dirty files to disk and starts a new version."""
+        start_time = time.time()
+        with self.lock:
+            flushed = sorted(self.dirty)
+            for name in flushed:
+                path = self.path(name)
+                os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+                tmp_path = path + ".tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    f.write(self.contents[name])
+                os.replace(tmp_path, path)
+            self.dirty.clear()
+            self.version += 1
+        if flushed:
+            elapsed_time = time.time() - start_time
+            log.info(f"[Workspace] Flushed {len(flushed)} files to {self.root} in {elapsed_time:.3f}s: {flushed}")
+        return flushed
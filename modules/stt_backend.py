@@ -0,0 +1,384 @@
+# modules/stt_backend.py
+import os
+import json
+import time
+import wave
+import threading
+from collections import deque
+import numpy as np
+from modules.logger import log
+from modules.tracing import tracer
+from modules.lazy_loader import LazyModel
+from modules.audio_input import microphone, rms
+
+try:
+    import webrtcvad
+except ImportError:
+    webrtcvad = None
+    log.info("[STT] webrtcvad not installed; using energy-based voice detection")
+
+# Backend selection and endpointing; all overridable from the environment.
+STT_BACKEND = os.getenv("SANYA_STT_BACKEND", "google")
+VOSK_MODEL_PATH = os.getenv("SANYA_VOSK_MODEL", os.path.join("models", "vosk-model-small-en-us-0.15"))
+STT_FIXTURES = os.getenv("SANYA_STT_FIXTURES", os.path.join("fixtures", "speech"))
+VAD_AGGRESSIVENESS = int(os.getenv("SANYA_VAD_AGGRESSIVENESS", "2"))  # webrtcvad 0-3
+VAD_SILENCE = float(os.getenv("SANYA_VAD_SILENCE", "0.5"))  # trailing silence that ends a phrase
+PREROLL_SECONDS = float(os.getenv("SANYA_PREROLL", "0.3"))
+LISTEN_TIMEOUT = 8.0  # seconds to wait for speech to start
+PHRASE_LIMIT = 15.0
+# Energy fallback, with the same noise-floor tracking as speech_recognition
+ENERGY_THRESHOLD = 300.0
+ENERGY_DAMPING = 0.15
+ENERGY_RATIO = 1.5
+
+vosk_model = LazyModel("vosk", lambda vosk: vosk.Model(VOSK_MODEL_PATH), "vosk")
+
+
+class STTError(Exception):
+    pass
+
+class UnrecognizedSpeech(STTError):
+    pass
+
+class STTUnavailable(STTError):
+    pass
+
+
+class VoiceActivityDetector:
+    """
+    Classifies 80 ms frames as speech or not. Uses webrtcvad (majority vote over its
+    20 ms sub-frames) when it is installed, otherwise an energy threshold that
+    follows the noise floor while nobody is speaking.
+    """
+
+    def __init__(self, samplerate: int, aggressiveness: int = VAD_AGGRESSIVENESS):
+        self.samplerate = samplerate
+        self.energy_threshold = ENERGY_THRESHOLD
+        self.vad = webrtcvad.Vad(aggressiveness) if webrtcvad is not None else None
+
+    def is_speech(self, frame: np.ndarray, frame_seconds: float) -> bool:
+        if self.vad is not None:
+            step = self.samplerate // 50
+            votes = [self.vad.is_speech(frame[i:i + step].tobytes(), self.samplerate) for i in range(0, len(frame) - step + 1, step)]
+            return sum(votes) * 2 >= len(votes)
+        energy = rms(frame)
+        if energy > self.energy_threshold:
+            return True
+        self._track(energy, frame_seconds)
+        return False
+
+    def calibrate(self, frames, frame_seconds: float):
+        """
+        Seeds the energy threshold from audio known to hold no command, as
+        speech_recognition's adjust_for_ambient_noise does. webrtcvad needs none.
+        """
+        if self.vad is None:
+            for frame in frames:
+                self._track(rms(frame), frame_seconds)
+
+    def _track(self, energy: float, frame_seconds: float):
+        damping = ENERGY_DAMPING ** frame_seconds
+        self.energy_threshold = self.energy_threshold * damping + energy * ENERGY_RATIO * (1 - damping)
+
+
+class Endpointer:
+    """
+    Finds one phrase in a frame source: waits for speech, then yields frames (starting
+    with up to PREROLL_SECONDS from before the onset) until VAD_SILENCE of trailing
+    silence or PHRASE_LIMIT. Afterwards `endpoint_latency` holds the seconds from the
+    end of speech to the endpoint decision, including how far reading lagged capture.
+    """
+
+    def __init__(self, source, vad: VoiceActivityDetector, silence: float = VAD_SILENCE):
+        self.source = source
+        self.vad = vad
+        self.silence = silence
+        self.heard = False
+        self.endpoint_latency = None
+
+    def frames(self, since: int):
+        frame_seconds = self.source.frame_seconds
+        preroll = deque(maxlen=self.source.seconds_to_frames(PREROLL_SECONDS) + 1)
+        silence_frames = max(self.source.seconds_to_frames(self.silence), 1)
+        position, onset, last_speech = since, None, None
+        while True:
+            position, frame = self.source.read(position)
+            if frame is None:
+                break  # source ended or stalled
+            position += 1
+            speech = self.vad.is_speech(frame, frame_seconds)
+            if onset is None:
+                if not speech:
+                    preroll.append(frame)
+                    if (position - since) * frame_seconds > LISTEN_TIMEOUT:
+                        return
+                    continue
+                onset = last_speech = position
+                self.heard = True
+                yield from preroll
+                yield frame
+                continue
+            yield frame
+            if speech:
+                last_speech = position
+            elif position - last_speech >= silence_frames:
+                break
+            if (position - onset) * frame_seconds >= PHRASE_LIMIT:
+                break
+        if last_speech is not None:
+            lag = max(self.source.position - position, 0)
+            self.endpoint_latency = (position - last_speech + lag) * frame_seconds
+
+
+class STTBackend:
+    """
+    Minimal interface every backend implements: begin() an utterance, accept() its
+    audio frame by frame (returning a partial transcript when the engine has one),
+    and end() it to get the final transcript. Audio comes from the shared
+    microphone unless the backend brings its own source. Processing time is
+    accumulated per utterance so stats() can report the real-time factor.
+    """
+    name = "base"
+
+    def __init__(self):
+        self.audio_seconds = 0.0
+        self.process_seconds = 0.0
+        self.utterances = 0
+        self.endpoint_latencies = []
+        self.detectors = {}  # samplerate -> VoiceActivityDetector, kept so its noise floor carries over
+        self.lock = threading.Lock()
+
+    def open_source(self, since: int = None):
+        """Returns (frame source, start position) for the next utterance."""
+        microphone.start()
+        return microphone, microphone.position if since is None else since
+
+    def detector(self, samplerate: int) -> VoiceActivityDetector:
+        with self.lock:
+            if samplerate not in self.detectors:
+                self.detectors[samplerate] = VoiceActivityDetector(samplerate)
+            return self.detectors[samplerate]
+
+    def begin(self, samplerate: int):
+        self.samplerate = samplerate
+
+    def accept(self, samples: np.ndarray):
+        return None
+
+    def end(self) -> str:
+        raise NotImplementedError
+
+    def record(self, audio_seconds: float, process_seconds: float, endpoint_latency: float):
+        with self.lock:
+            self.utterances += 1
+            self.audio_seconds += audio_seconds
+            self.process_seconds += process_seconds
+            if endpoint_latency is not None:
+                self.endpoint_latencies.append(endpoint_latency)
+
+    def stats(self) -> dict:
+        with self.lock:
+            latencies = sorted(self.endpoint_latencies)
+            return {
+                "backend": self.name,
+                "utterances": self.utterances,
+                "audio_seconds": round(self.audio_seconds, 2),
+                "real_time_factor": round(self.process_seconds / self.audio_seconds, 3) if self.audio_seconds else None,
+                "endpoint_latency_p50": round(latencies[len(latencies) // 2], 3) if latencies else None,
+            }
+
+
+class GoogleBackend(STTBackend):
+    """speech_recognition's Google Web Speech call on the whole phrase; no partials."""
+    name = "google"
+
+    def __init__(self):
+        super().__init__()
+        import speech_recognition as sr
+        self.sr = sr
+        self.recognizer = sr.Recognizer()
+        self.chunks = []
+
+    def begin(self, samplerate: int):
+        super().begin(samplerate)
+        self.chunks = []
+
+    def accept(self, samples):
+        self.chunks.append(samples)
+        return None
+
+    def end(self) -> str:
+        audio = self.sr.AudioData(b"".join(chunk.tobytes() for chunk in self.chunks), self.samplerate, 2)
+        try:
+            return self.recognizer.recognize_google(audio)
+        except self.sr.UnknownValueError:
+            raise UnrecognizedSpeech("no speech recognised")
+        except self.sr.RequestError as e:
+            raise STTUnavailable(str(e))
+
+
+class VoskBackend(STTBackend):
+    """
+    Offline recognition with Vosk (Kaldi). Audio is decoded as it arrives, so the
+    final result is ready almost as soon as the phrase ends, and partial transcripts
+    are available while the user is still speaking.
+    """
+    name = "vosk"
+
+    def __init__(self):
+        super().__init__()
+        self.recognizer = None
+        self.final_text = ""
+
+    def begin(self, samplerate: int):
+        super().begin(samplerate)
+        import vosk
+        self.recognizer = vosk.KaldiRecognizer(vosk_model.get(), samplerate)
+        self.final_text = ""
+
+    def accept(self, samples):
+        if self.recognizer.AcceptWaveform(samples.tobytes()):
+            text = json.loads(self.recognizer.Result()).get("text", "")
+            self.final_text = f"{self.final_text} {text}".strip() if text else self.final_text
+            return self.final_text or None
+        partial = json.loads(self.recognizer.PartialResult()).get("partial", "")
+        return f"{self.final_text} {partial}".strip() or None
+
+    def end(self) -> str:
+        text = json.loads(self.recognizer.FinalResult()).get("text", "")
+        transcript = f"{self.final_text} {text}".strip()
+        if not transcript:
+            raise UnrecognizedSpeech("no speech recognised")
+        return transcript
+
+
+class WavSource:
+    """
+    Frame source over one WAV file (16-bit mono), shaped like MicCapture for the
+    Endpointer. Frames count as captured the moment they are read, as if the file
+    were arriving live without lag; reads past the end return None.
+    """
+
+    def __init__(self, path: str, frame_samples: int = microphone.frame_samples):
+        with wave.open(path, "rb") as f:
+            if f.getsampwidth() != 2 or f.getnchannels() != 1:
+                raise ValueError(f"{path}: fixtures must be 16-bit mono WAV")
+            self.samplerate = f.getframerate()
+            samples = np.frombuffer(f.readframes(f.getnframes()), dtype=np.int16)
+        self.frame_samples = frame_samples
+        padded = np.zeros(-(-len(samples) // frame_samples) * frame_samples, dtype=np.int16)
+        padded[:len(samples)] = samples
+        self.data = padded.reshape(-1, frame_samples)
+        self.position = 0
+
+    @property
+    def frame_seconds(self) -> float:
+        return self.frame_samples / self.samplerate
+
+    def seconds_to_frames(self, seconds: float) -> int:
+        return max(int(round(seconds / self.frame_seconds)), 0)
+
+    def read(self, position: int, timeout: float = None):
+        if position >= len(self.data):
+            return position, None
+        self.position = max(self.position, position + 1)
+        return position, self.data[position]
+
+
+class FixtureBackend(STTBackend):
+    """
+    Test stand-in: each listen() plays the next WAV file in the fixture directory
+    (in name order, cycling) through the real endpointer, and "recognises" the text
+    in the .txt file of the same name. Partials reveal the words in proportion to
+    the audio fed so far, so streaming consumers see realistic growth.
+    """
+    name = "fixture"
+
+    def __init__(self, directory: str = STT_FIXTURES):
+        super().__init__()
+        self.directory = directory
+        self.files = sorted(name for name in os.listdir(directory) if name.endswith(".wav")) if os.path.isdir(directory) else []
+        if not self.files:
+            raise STTUnavailable(f"No WAV fixtures in {directory}")
+        self.index = 0
+        self.source = None
+        self.words = []
+        self.fed = 0
+
+    def open_source(self, since: int = None):
+        name = self.files[self.index % len(self.files)]
+        self.index += 1
+        transcript_path = os.path.join(self.directory, name[:-4] + ".txt")
+        text = ""
+        if os.path.exists(transcript_path):
+            with open(transcript_path, "r", encoding="utf-8") as f:
+                text = f.read().strip()
+        self.words = text.split()
+        self.source = WavSource(os.path.join(self.directory, name))
+        return self.source, 0
+
+    def begin(self, samplerate: int):
+        super().begin(samplerate)
+        self.fed = 0
+
+    def accept(self, samples):
+        self.fed += 1
+        shown = min(len(self.words), self.fed * len(self.words) // max(len(self.source.data), 1) + 1)
+        return " ".join(self.words[:shown]) or None
+
+    def end(self) -> str:
+        if not self.words:
+            raise UnrecognizedSpeech("fixture has no transcript")
+        return " ".join(self.words)
+
+
+BACKENDS = {"google": GoogleBackend, "vosk": VoskBackend, "fixture": FixtureBackend}
+
+def create_stt(name: str = None, **backend_options) -> STTBackend:
+    """
+    Builds the backend named by `name` or SANYA_STT_BACKEND. Two optional packages
+    are not in requirements.txt: `vosk` (plus a model at SANYA_VOSK_MODEL) for the
+    vosk backend, and `webrtcvad`, without which endpointing uses the energy detector.
+    """
+    name = name or STT_BACKEND
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown STT backend '{name}'. Choose from: {', '.join(BACKENDS)}")
+    return BACKENDS[name](**backend_options)
+
+def transcribe(backend: STTBackend, since: int = None, on_partial=None) -> str:
+    """
+    Endpoints and transcribes one phrase with `backend`, from capture position
+    `since` (default: now) of the microphone, or from the backend's own source.
+    Partial transcripts go to on_partial(text) as they change. Raises STTError.
+    """
+    source, since = backend.open_source(since)
+    endpointer = Endpointer(source, backend.detector(source.samplerate))
+    backend.begin(source.samplerate)
+
+    process_seconds, fed, last_partial = 0.0, 0, None
+    with tracer.span("listen.capture"):
+        for frame in endpointer.frames(since):
+            start = time.perf_counter()
+            partial = backend.accept(frame)
+            process_seconds += time.perf_counter() - start
+            fed += 1
+            if partial and partial != last_partial and on_partial is not None:
+                last_partial = partial
+                on_partial(partial)
+    if not endpointer.heard:
+        raise UnrecognizedSpeech("no speech before the listen timeout")
+    if endpointer.endpoint_latency is not None:
+        tracer.record("listen.endpoint", endpointer.endpoint_latency)
+
+    start = time.perf_counter()
+    try:
+        with tracer.span("listen.recognize"):
+            return backend.end()
+    finally:
+        process_seconds += time.perf_counter() - start
+        audio_seconds = fed * source.frame_seconds
+        backend.record(audio_seconds, process_seconds, endpointer.endpoint_latency)
+        log.info(
+            f"[STT] {backend.name}: {audio_seconds:.2f}s audio, RTF {process_seconds / max(audio_seconds, 1e-9):.3f}, "
+            f"endpoint {(endpointer.endpoint_latency or 0) * 1000:.0f}ms"
+        )
@@ -2,6 +2,8 @@ import subprocess
 import platform
 import psutil
 import time
+from modules.logger import log
+from modules.tracing import tracer
 
 def execute_command(command: str) -> str:
     try:
@@ -9,19 +11,14 @@ def execute_command(command: str) -> str:
         result = subprocess.run(command, shell=True, capture_output=True, text=True, timeout=30)
         output = result.stdout if result.stdout else result.stderr
         elapsed_time = time.time() - start_time
-        print(f"[SystemControl] Executed command: {command}, Output: {output.strip()}, Time: {elapsed_time:.3f}s")
-        with open("logs/sanya.log", "a", encoding="utf-8") as log_file:
-            log_file.write(f"[SystemControl] Executed command: {command}, Output: {output.strip()}, Time: {elapsed_time:.3f}s\n")
+        log.info(f"[SystemControl] Executed command: {command}, Output: {output.strip()}, Time: {elapsed_time:.3f}s")
+        tracer.record("system.command", elapsed_time)
         return output.strip()
     except subprocess.TimeoutExpired:
-        print(f"[SystemControl] Command timed out: {command}")
-        with open("logs/sanya.log", "a", encoding="utf-8") as log_file:
-            log_file.write(f"[SystemControl] Command timed out: {command}\n")
+        log.warning(f"[SystemControl] Command timed out: {command}")
         return "Error: Command timed out after 30 seconds."
     except Exception as e:
-        print(f"[SystemControl] Error executing command: {e}")
-        with open("logs/sanya.log", "a", encoding="utf-8") as log_file:
-            log_file.write(f"[SystemControl] Error executing command: {e}\n")
+        log.error(f"[SystemControl] Error executing command: {e}")
         return f"Error: {e}"
 
 def get_system_info(task: str) -> str:
@@ -40,14 +37,10 @@ def get_system_info(task: str) -> str:
                 return execute_command("tasklist")
             elif system in ["Linux", "Darwin"]:
                 return execute_command("ps aux")
-        print(f"[SystemControl] Unsupported task: {task}")
-        with open("logs/sanya.log", "a", encoding="utf-8") as log_file:
-            log_file.write(f"[SystemControl] Unsupported task: {task}\n")
+        log.info(f"[SystemControl] Unsupported task: {task}")
         return "Unsupported task"
     except Exception as e:
-        print(f"[SystemControl] Error in system info: {e}")
-        with open("logs/sanya.log", "a", encoding="utf-8") as log_file:
-            log_file.write(f"[SystemControl] Error in system info: {e}\n")
+        log.error(f"[SystemControl] Error in system info: {e}")
         return f"Error: {e}"
 
 def automate_process(task: str) -> str:
@@ -57,12 +50,8 @@ def automate_process(task: str) -> str:
             backup_dir = f"backups/backup_{timestamp}"
             execute_command(f"mkdir {backup_dir}")
             return execute_command(f"cp -r ./data/* {backup_dir}")
-        print(f"[SystemControl] Unsupported automation task: {task}")
-        with open("logs/sanya.log", "a", encoding="utf-8") as log_file:
-            log_file.write(f"[SystemControl] Unsupported automation task: {task}\n")
+        log.info(f"[SystemControl] Unsupported automation task: {task}")
         return "Unsupported automation task"
     except Exception as e:
-        print(f"[SystemControl] Error in automation: {e}")
-        with open("logs/sanya.log", "a", encoding="utf-8") as log_file:
-            log_file.write(f"[SystemControl] Error in automation: {e}\n")
+        log.error(f"[SystemControl] Error in automation: {e}")
         return f"Error: {e}"
\ No newline at end of file
@@ -0,0 +1,57 @@
+# modules/topic_classifier.py
+import threading
+import numpy as np
+from modules.vector_store import EMBEDDINGS
+
+# Topics from the classifier prompt in core/llm, each described by a few exemplar
+# messages. A topic's prototype is the normalised mean of its exemplar embeddings.
+TOPIC_EXEMPLARS = {
+    "time": ["What's the time?", "What time is it now?", "Tell me the current time."],
+    "date": ["What's the date today?", "Which day is it today?", "What is today's date?"],
+    "personal information": ["My name is John.", "I live in Mumbai.", "My birthday is on March 3rd.", "I work as an engineer."],
+    "positive feedback": ["Well done, that was great.", "Thank you, you're very helpful.", "Good job Sanya!"],
+    "behavior instruction": ["Always answer briefly.", "Don't call me sir.", "From now on speak more slowly.", "Remember to remind me every hour."],
+    "personal preference": ["I like dark mode.", "My favourite colour is blue.", "I prefer Python over Java.", "I love listening to jazz."],
+    "coding": ["Write a Python script to calculate factorial.", "Fix the bug in my function.", "Edit the script to add error handling.", "Run the test script."],
+    "web development": ["Create a web app for a todo list.", "Build an HTML page with CSS styling.", "Make a JavaScript website with a form."],
+    "system control": ["Check CPU usage.", "Open Chrome.", "Execute command dir.", "Create a file called notes.txt.", "Show memory usage."],
+}
+IMPORTANT_TOPICS = {
+    "personal information", "positive feedback", "behavior instruction",
+    "personal preference", "coding", "web development",
+}
+# Minimum cosine similarity to the best prototype before trusting the local result.
+CONFIDENCE_THRESHOLD = 0.45
+
+class TopicClassifier:
+    def __init__(self, exemplars: dict = None, threshold: float = CONFIDENCE_THRESHOLD):
+        self.exemplars = exemplars or TOPIC_EXEMPLARS
+        self.threshold = threshold
+        self.topics = list(self.exemplars)
+        self.prototypes = None
+        self.lock = threading.Lock()
+
+    def _build_prototypes(self):
+        with self.lock:
+            if self.prototypes is not None:
+                return
+            prototypes = []
+            for topic in self.topics:
+                vectors = EMBEDDINGS.encode(self.exemplars[topic])
+                vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+                mean = vectors.mean(axis=0)
+                prototypes.append(mean / np.linalg.norm(mean))
+            self.prototypes = np.vstack(prototypes)
+
+    def classify(self, text: str):
+        """Returns (topic, important, confidence); topic is None below the threshold."""
+        self._build_prototypes()
+        vector = EMBEDDINGS.encode([text])[0]
+        vector /= max(np.linalg.norm(vector), 1e-12)
+        scores = self.prototypes @ vector
+        best = int(np.argmax(scores))
+        confidence = float(scores[best])
+        if confidence < self.threshold:
+            return None, False, confidence
+        topic = self.topics[best]
+        return topic, topic in IMPORTANT_TOPICS, confidence
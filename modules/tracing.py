@@ -0,0 +1,113 @@
+# modules/tracing.py
+import os
+import time
+import argparse
+import threading
+from contextlib import contextmanager
+from modules.logger import AsyncLog, LOG_BACKUPS
+
+TRACE_PATH = os.getenv("SANYA_TRACE_FILE", "logs/trace.tsv")
+TRACE_ENABLED = os.getenv("SANYA_TRACE", "1") == "1"
+
+
+class Tracer:
+    """
+    Records how long each stage of a turn takes. Every span is one tab-separated line
+    in the trace file: start time (epoch seconds), turn number, stage and duration in
+    milliseconds. Lines are written by a background AsyncLog writer, so recording a
+    span costs a clock read and a queue put.
+    """
+
+    def __init__(self, path: str = TRACE_PATH, enabled: bool = TRACE_ENABLED):
+        self.enabled = enabled
+        self.writer = AsyncLog(path) if enabled else None
+        self.turn = 0
+        self.marks = {}  # name -> perf_counter value, consumed by since()
+        self.lock = threading.Lock()
+
+    def begin_turn(self) -> int:
+        with self.lock:
+            self.turn += 1
+            self.marks.clear()
+            return self.turn
+
+    def record(self, stage: str, seconds: float, started: float = None):
+        """Records a span measured by the caller; `started` is its epoch start time."""
+        if not self.enabled:
+            return
+        started = time.time() - seconds if started is None else started
+        self.writer.append(f"{started:.3f}\t{self.turn}\t{stage}\t{seconds * 1000:.1f}\n")
+
+    @contextmanager
+    def span(self, stage: str):
+        started, start = time.time(), time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start, started)
+
+    def mark(self, name: str, at: float = None):
+        """Remembers a point in the turn (a perf_counter value) for a later since()."""
+        with self.lock:
+            self.marks[name] = time.perf_counter() if at is None else at
+
+    def since(self, name: str, stage: str):
+        """Records the time since mark `name` as `stage`, once per mark."""
+        with self.lock:
+            start = self.marks.pop(name, None)
+        if start is not None:
+            self.record(stage, time.perf_counter() - start)
+
+    def flush(self):
+        if self.writer is not None:
+            self.writer.flush()
+
+
+def _percentile(values: list, q: float) -> float:
+    return values[min(int(q * len(values)), len(values) - 1)]
+
+def load_spans(path: str = TRACE_PATH, since: float = None) -> dict:
+    """Returns {stage: [milliseconds, ...]} from the trace file and its rotated copies."""
+    stages = {}
+    for name in [f"{path}.{n}" for n in range(LOG_BACKUPS, 0, -1)] + [path]:
+        if not os.path.exists(name):
+            continue
+        with open(name, "r", encoding="utf-8") as f:
+            for line in f:
+                fields = line.rstrip("\n").split("\t")
+                if len(fields) != 4:
+                    continue
+                try:
+                    started, ms = float(fields[0]), float(fields[3])
+                except ValueError:
+                    continue
+                if since is None or started >= since:
+                    stages.setdefault(fields[2], []).append(ms)
+    return stages
+
+def report(path: str = TRACE_PATH, since: float = None, prefix: str = "") -> str:
+    """Per-stage count and p50/p95/p99/max latency in milliseconds, as a table."""
+    stages = {stage: sorted(values) for stage, values in load_spans(path, since).items() if stage.startswith(prefix)}
+    if not stages:
+        return f"No spans in {path}."
+    width = max(len(stage) for stage in stages)
+    lines = [f"{'stage':<{width}}  {'count':>6}  {'p50':>9}  {'p95':>9}  {'p99':>9}  {'max':>9}"]
+    for stage in sorted(stages):
+        values = stages[stage]
+        lines.append(
+            f"{stage:<{width}}  {len(values):>6}  {_percentile(values, 0.50):>9.1f}"
+            f"  {_percentile(values, 0.95):>9.1f}  {_percentile(values, 0.99):>9.1f}  {values[-1]:>9.1f}"
+        )
+    return "\n".join(lines)
+
+
+tracer = Tracer()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-stage latency percentiles (ms) from the Sanya trace file.")
+    parser.add_argument("path", nargs="?", default=TRACE_PATH)
+    parser.add_argument("--hours", type=float, help="only spans from the last N hours")
+    parser.add_argument("--stage", default="", help="only stages starting with this prefix, e.g. llm.")
+    args = parser.parse_args()
+    since = time.time() - args.hours * 3600 if args.hours else None
+    print(report(args.path, since, args.stage))
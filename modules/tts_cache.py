@@ -0,0 +1,127 @@
+# modules/tts_cache.py
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+from modules.logger import log
+
+CACHE_DIR = "memory/tts"
+CACHE_BUDGET_BYTES = int(float(os.getenv("SANYA_TTS_CACHE_MB", "256")) * 1024 * 1024)
+
+def normalize_sentence(text: str) -> str:
+    return " ".join(text.split())
+
+
+class AudioCache:
+    """
+    Content-addressed cache of synthesised speech. Keys are sha1(voice model + mood +
+    normalised sentence); each clip is a float32 .npy file that is memory-mapped when
+    read, so hits cost neither synthesis nor a copy into memory. Files are evicted
+    least recently used first once they exceed the byte budget; a hit bumps the file's
+    mtime so the order survives restarts.
+    """
+
+    def __init__(self, voice: str, directory: str = CACHE_DIR, budget_bytes: int = CACHE_BUDGET_BYTES):
+        self.voice = voice
+        self.directory = directory
+        self.budget_bytes = budget_bytes
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+        entries = []
+        for name in os.listdir(directory):
+            path = os.path.join(directory, name)
+            if name.endswith(".tmp"):
+                os.remove(path)  # torn write from an earlier run
+            elif name.endswith(".npy"):
+                stat = os.stat(path)
+                entries.append((stat.st_mtime, name[:-4], stat.st_size))
+        self.entries = OrderedDict((key, size) for _, key, size in sorted(entries))  # oldest first
+        self.total_bytes = sum(self.entries.values())
+        log.info(f"[TTSCache] {len(self.entries)} cached clips ({self.total_bytes / 1e6:.1f} MB) in {directory}")
+
+    def _key(self, text: str, mood: str) -> str:
+        return hashlib.sha1(f"{self.voice}\0{mood}\0{normalize_sentence(text)}".encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.npy")
+
+    def get(self, text: str, mood: str = "neutral"):
+        """Returns the cached clip as a read-only memory-mapped float32 array, or None."""
+        key = self._key(text, mood)
+        with self.lock:
+            if key not in self.entries:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+        path = self._path(key)
+        try:
+            wav = np.load(path, mmap_mode="r")
+            os.utime(path)
+            return wav
+        except (OSError, ValueError) as e:
+            log.warning(f"[TTSCache] Dropping unreadable clip {key}: {e}")
+            with self.lock:
+                self.total_bytes -= self.entries.pop(key, 0)
+            return None
+
+    def put(self, text: str, mood: str, wav) -> np.ndarray:
+        key = self._key(text, mood)
+        wav = np.asarray(wav, dtype="float32")
+        path = self._path(key)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, wav)
+        os.replace(tmp_path, path)
+        size = os.path.getsize(path)
+        with self.lock:
+            self.total_bytes += size - self.entries.pop(key, 0)
+            self.entries[key] = size
+            self._evict()
+        return wav
+
+    def _evict(self):
+        for key in list(self.entries):
+            if self.total_bytes <= self.budget_bytes or len(self.entries) <= 1:
+                break
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+            except OSError:
+                continue  # still mapped by a player on Windows; try again next time
+            self.total_bytes -= self.entries.pop(key)
+
+    def synthesize(self, text: str, mood: str, synth):
+        """Returns the cached clip for `text`, calling synth(text) and storing the result on a miss."""
+        wav = self.get(text, mood)
+        if wav is None:
+            wav = self.put(text, mood, synth(normalize_sentence(text)))
+        return wav
+
+    def warm(self, sentences: list, mood: str, synth) -> int:
+        """Synthesises whichever sentences are not cached yet; returns how many were."""
+        start = time.perf_counter()
+        with self.lock:
+            missing = [s for s in dict.fromkeys(sentences) if self._key(s, mood) not in self.entries]
+        for sentence in missing:
+            self.put(sentence, mood, synth(normalize_sentence(sentence)))
+        if missing:
+            log.info(f"[TTSCache] Pre-warmed {len(missing)} phrases in {time.perf_counter() - start:.2f}s")
+        return len(missing)
+
+    def stats(self) -> dict:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self.entries),
+                "bytes": self.total_bytes,
+            }
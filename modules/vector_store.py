@@ -1,13 +1,48 @@
 # modules/vector_store.py
 import faiss
 import os
+import atexit
 import json
-from sentence_transformers import SentenceTransformer
+import struct
+import threading
+import zlib
 import numpy as np
+from modules.embedding_cache import EmbeddingCache
+from modules.index_manager import IndexManager
+from modules.metadata_store import MetadataStore
+from modules.lazy_loader import LazyModel
+from modules.logger import log
 
-MODEL = SentenceTransformer("all-MiniLM-L6-v2")
+MODEL_NAME = "all-MiniLM-L6-v2"
+MODEL = LazyModel("sentence_transformer", lambda st: st.SentenceTransformer(MODEL_NAME), "sentence_transformers")
+EMBEDDINGS = EmbeddingCache(MODEL, MODEL_NAME, dimension=384)
 INDEX_PATH = "memory/long_term/index.faiss"
-METADATA_PATH = "memory/long_term/store.json"
+DB_PATH = "memory/long_term/store.db"
+METADATA_PATH = "memory/long_term/store.json"  # pre-SQLite metadata, migrated on first load
+WAL_PATH = "memory/long_term/store.wal"
+# Cosine similarity above which a memory counts as a duplicate. Equivalent to the old
+# `1 - squared L2 > 0.9` rule for unit vectors.
+DUPLICATE_THRESHOLD = 0.95
+
+# Inserts are appended to WAL_PATH and folded into the index file in the background
+# once the log grows past WAL_COMPACT_BYTES or WAL_COMPACT_INTERVAL elapses.
+WAL_COMPACT_BYTES = 4 * 1024 * 1024
+WAL_COMPACT_INTERVAL = 300  # seconds
+WAL_FSYNC = True
+
+# Background eviction: unimportant memories older than MEMORY_TTL are dropped, and past
+# MAX_MEMORIES the least important, oldest memories go first.
+MEMORY_TTL = 90 * 24 * 3600  # seconds
+MAX_MEMORIES = 50000
+
+_WAL_HEADER = struct.Struct("<II")  # payload length, crc32 of payload
+_WAL_RECORD = struct.Struct("<QI")  # sequence number, vector dimension
+
+_store_lock = threading.RLock()
+_compact_lock = threading.Lock()
+_compact_event = threading.Event()
+
+os.makedirs(os.path.dirname(INDEX_PATH), exist_ok=True)
 
 def safe_load_faiss_index(index_path, dimension=384):
     if os.path.exists(index_path):
@@ -15,65 +50,342 @@ def safe_load_faiss_index(index_path, dimension=384):
             index = faiss.read_index(index_path)
             return index
         except Exception as e:
-            print(f"[FAISS] Corrupt index file. Recreating. Reason: {e}")
+            log.warning(f"[FAISS] Corrupt index file. Recreating. Reason: {e}")
     else:
-        print("[FAISS] No existing index found. Creating new one.")
-    
-    index = faiss.IndexFlatL2(dimension)
+        log.info("[FAISS] No existing index found. Creating new one.")
+
+    index = faiss.IndexIDMap(faiss.IndexFlatIP(dimension))
     faiss.write_index(index, index_path)
     return index
 
-# Usage:
-index = safe_load_faiss_index(INDEX_PATH, 384)
-
-# Load metadata safely
-if os.path.exists(METADATA_PATH):
+def _read_metadata(path):
+    """Returns {"items", "last_seq"} from a pre-SQLite metadata file, or None if unreadable."""
     try:
-        with open(METADATA_PATH, "r") as f:
+        with open(path, "r") as f:
             content = f.read().strip()
-            metadata = json.loads(content) if content else []
+        data = json.loads(content) if content else []
     except Exception as e:
-        print(f"[METADATA] Corrupt JSON. Recreating. Reason: {e}")
-        metadata = []
-        with open(METADATA_PATH, "w") as f:
-            json.dump(metadata, f)
-else:
-    metadata = []
-    with open(METADATA_PATH, "w") as f:
-        json.dump(metadata, f)
+        log.warning(f"[METADATA] Corrupt JSON in {path}. Reason: {e}")
+        return None
+    if isinstance(data, list):  # oldest format: bare list of entries
+        return {"items": data, "last_seq": 0}
+    return {"items": data.get("items", []), "last_seq": data.get("last_seq", 0)}
+
+def _write_durable(path, write):
+    with open(path, "wb") as f:
+        write(f)
+        f.flush()
+        os.fsync(f.fileno())
+
+def _fsync_dir(path):
+    if os.name == "nt":
+        return
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+def _wal_segments():
+    """Sealed segments (oldest first) followed by the active log."""
+    directory, base = os.path.split(WAL_PATH)
+    sealed = sorted(f for f in os.listdir(directory) if f.startswith(base + "."))
+    return [os.path.join(directory, f) for f in sealed] + [WAL_PATH]
 
+def _read_wal(path):
+    """
+    Parses (seq, vector, meta) records from a log segment.
+    Stops at the first torn or corrupt record and returns the offset of the valid prefix.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    records = []
+    offset = 0
+    while offset + _WAL_HEADER.size <= len(data):
+        length, crc = _WAL_HEADER.unpack_from(data, offset)
+        start = offset + _WAL_HEADER.size
+        end = start + length
+        if length < _WAL_RECORD.size or end > len(data) or zlib.crc32(data[start:end]) != crc:
+            break
+        seq, dim = _WAL_RECORD.unpack_from(data, start)
+        vec_start = start + _WAL_RECORD.size
+        vector = np.frombuffer(data, dtype="float32", count=dim, offset=vec_start)
+        meta = json.loads(data[vec_start + dim * 4:end].decode("utf-8"))
+        records.append((seq, vector, meta))
+        offset = end
+    return records, offset
+
+def _wal_records():
+    records = []
+    for path in _wal_segments():
+        if not os.path.exists(path):
+            continue
+        segment, valid = _read_wal(path)
+        if valid < os.path.getsize(path):
+            log.warning(f"[WAL] Discarding torn tail of {path} at byte {valid}.")
+            with open(path, "r+b") as f:
+                f.truncate(valid)
+        records += segment
+    return records
+
+
+# Usage:
+index = IndexManager(safe_load_faiss_index(INDEX_PATH, 384))
+store = MetadataStore(DB_PATH)
+if os.path.exists(INDEX_PATH + ".tmp"):
+    os.remove(INDEX_PATH + ".tmp")
+
+_last_compacted_seq = store.get_state("last_seq", 0)
+_next_seq = _last_compacted_seq + 1
+_deletions_pending = False
+
+def _migrate_legacy_metadata(records):
+    """
+    Imports store.json (and log records written against it, which carry their metadata
+    inline) into SQLite. Legacy rows were linked to FAISS by position, and IndexManager
+    maps row i to id i + 1 during its own migration, so rows keep that id here.
+    """
+    if store.count() == 0:
+        legacy = _read_metadata(METADATA_PATH) or {"items": [], "last_seq": 0}
+        pending = _read_metadata(METADATA_PATH + ".tmp") if os.path.exists(METADATA_PATH + ".tmp") else None
+        if pending and len(pending["items"]) == index.ntotal and pending["last_seq"] > legacy["last_seq"]:
+            legacy = pending  # compaction crashed between replacing the index and the metadata
+        items = legacy["items"][:index.ntotal]
+        tail = [(vector, meta) for seq, vector, meta in records if "id" not in meta and seq > legacy["last_seq"]]
+        store.insert_many([item.get("text", "") for item in items], items, ids=range(1, len(items) + 1))
+        if tail:
+            ids = store.insert_many([meta.get("text", "") for _, meta in tail], [meta for _, meta in tail],
+                                    ids=range(len(items) + 1, len(items) + len(tail) + 1))
+            index.add(np.vstack([vector for vector, _ in tail]), ids)
+        log.info(f"[METADATA] Migrated {len(items) + len(tail)} memories from {METADATA_PATH} to {DB_PATH}")
+
+def _replay_wal(records):
+    global _next_seq
+    db_ids = set(store.ids())
+    index_ids = set(index.ids().tolist())
+    vectors, ids = [], []
+    for seq, vector, meta in records:
+        _next_seq = max(_next_seq, seq + 1)
+        if seq <= _last_compacted_seq or "id" not in meta:
+            continue
+        # Rows deleted since the record was written are not resurrected
+        if meta["id"] in db_ids and meta["id"] not in index_ids:
+            vectors.append(vector)
+            ids.append(meta["id"])
+            index_ids.add(meta["id"])
+    if ids:
+        index.add(np.vstack(vectors), ids)
+        log.info(f"[WAL] Replayed {len(ids)} uncompacted memories.")
+
+def _reconcile():
+    """SQLite is authoritative: drop vectors of deleted rows and re-embed rows without one."""
+    global _deletions_pending
+    db_ids = set(store.ids())
+    index_ids = set(index.ids().tolist())
+    stale = index_ids - db_ids
+    if stale:
+        index.remove(stale)
+        _deletions_pending = True
+        log.info(f"[FAISS] Removed {len(stale)} vectors of deleted memories.")
+    orphans = sorted(db_ids - index_ids)
+    if orphans:
+        texts = store.texts(orphans)
+        vectors = EMBEDDINGS.encode([texts[i] for i in orphans])
+        with _store_lock:
+            _append_wal(vectors, [{"id": i} for i in orphans])
+            index.add(vectors, orphans)
+        log.info(f"[FAISS] Re-embedded {len(orphans)} memories missing from the index.")
+
+
+def _append_wal(vectors, metas):
+    """Appends one record per (vector, meta) pair. Caller holds _store_lock."""
+    global _next_seq
+    buf = bytearray()
+    for vector, meta in zip(vectors, metas):
+        vector = np.ascontiguousarray(vector, dtype="float32")
+        payload = (
+            _WAL_RECORD.pack(_next_seq, vector.shape[0])
+            + vector.tobytes()
+            + json.dumps(meta).encode("utf-8")
+        )
+        buf += _WAL_HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+        _next_seq += 1
+    _wal_file.write(buf)
+    _wal_file.flush()
+    if WAL_FSYNC:
+        os.fsync(_wal_file.fileno())
+    if _wal_file.tell() >= WAL_COMPACT_BYTES:
+        _compact_event.set()
+
+def _has_uncompacted():
+    with _store_lock:
+        return _deletions_pending or _next_seq - 1 > _last_compacted_seq or len(_wal_segments()) > 1
+
+def compact_vector_store():
+    """
+    Folds the write-ahead log into INDEX_PATH.
+    The active log is sealed first so inserts continue while the snapshot is written.
+    The index is written to a temp file and fsynced before it replaces INDEX_PATH, and
+    sealed segments are only deleted after the new checkpoint is recorded. Replay skips
+    ids already in the index, so a crash at any point is safe.
+    """
+    global _wal_file, _last_compacted_seq, _deletions_pending
+    with _compact_lock:
+        with _store_lock:
+            last_seq = _next_seq - 1
+            if _wal_file.tell() > 0:
+                _wal_file.close()
+                os.replace(WAL_PATH, f"{WAL_PATH}.{last_seq:012d}")
+                _wal_file = open(WAL_PATH, "ab")
+            sealed = _wal_segments()[:-1]
+            index_bytes = index.serialize()
+            ntotal = index.ntotal
+            _deletions_pending = False
+
+        _write_durable(INDEX_PATH + ".tmp", lambda f: f.write(index_bytes.tobytes()))
+        os.replace(INDEX_PATH + ".tmp", INDEX_PATH)
+        try:
+            _fsync_dir(os.path.dirname(INDEX_PATH))
+        except OSError:
+            pass
+        store.set_state("last_seq", last_seq)
+
+        for path in sealed:
+            os.remove(path)
+        with _store_lock:
+            _last_compacted_seq = last_seq
+        log.info(f"[WAL] Compacted {ntotal} vectors up to seq {last_seq}.")
 
 def save_vector_store():
-    faiss.write_index(index, INDEX_PATH)
-    with open(METADATA_PATH, "w") as f:
-        json.dump(metadata, f, indent=2)
+    """Forces a synchronous compaction of the write-ahead log."""
+    compact_vector_store()
+
+
+_records = _wal_records()
+if os.path.exists(METADATA_PATH):
+    _migrate_legacy_metadata(_records)
+_replay_wal(_records)
+del _records
+_wal_file = open(WAL_PATH, "ab")
+_reconcile()
+if os.path.exists(METADATA_PATH):
+    compact_vector_store()  # persist the id-mapped index before retiring the legacy files
+    os.replace(METADATA_PATH, METADATA_PATH + ".migrated")
+    if os.path.exists(METADATA_PATH + ".tmp"):
+        os.remove(METADATA_PATH + ".tmp")
+
+
+def delete_from_vector_store(ids) -> int:
+    """Deletes memories by id. Returns the number of rows removed."""
+    global _deletions_pending
+    ids = [int(i) for i in ids]
+    with _store_lock:
+        removed = store.delete(ids)
+        index.remove(ids)
+        _deletions_pending = True
+    return removed
+
+def evict_memories(max_age=MEMORY_TTL, max_rows=MAX_MEMORIES) -> int:
+    """Drops expired unimportant memories, then the least important ones beyond max_rows."""
+    removed = delete_from_vector_store(store.expired_ids(max_age))
+    removed += delete_from_vector_store(store.overflow_ids(max_rows))
+    if removed:
+        log.info(f"[METADATA] Evicted {removed} long-term memories.")
+    return removed
+
+_reported_stats = None
+
+def report_embedding_stats():
+    """Logs the embedding cache's hit/miss counts if they changed since the last report."""
+    global _reported_stats
+    stats = EMBEDDINGS.stats()
+    if stats["hits"] + stats["misses"] and stats != _reported_stats:
+        log.info(f"[EmbeddingCache] {stats}")
+        _reported_stats = stats
+
+def _maintenance_worker():
+    while True:
+        _compact_event.wait(timeout=WAL_COMPACT_INTERVAL)
+        _compact_event.clear()
+        report_embedding_stats()
+        try:
+            evict_memories()
+        except Exception as e:
+            log.warning(f"[METADATA] Eviction failed: {e}")
+        try:
+            if _has_uncompacted():
+                compact_vector_store()
+        except Exception as e:
+            log.warning(f"[WAL] Compaction failed, log retained: {e}")
+
+threading.Thread(target=_maintenance_worker, daemon=True).start()
+atexit.register(report_embedding_stats)  # runs before the log writer closes
+
+def _filter_duplicates(vectors, threshold):
+    """
+    Returns a keep-mask for a batch of vectors: one matrix search against the index,
+    plus a pairwise check so near-identical texts within the batch are only added once.
+    """
+    keep = np.ones(len(vectors), dtype=bool)
+    if index.ntotal > 0:
+        D, _ = index.search(vectors, 1)
+        keep &= D[:, 0] <= threshold
+
+    unit = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    similarity = unit @ unit.T
+    for i in range(1, len(vectors)):
+        if keep[i] and np.any(keep[:i] & (similarity[i, :i] > threshold)):
+            keep[i] = False
+    return keep
+
+def add_many(texts: list, metas: list, threshold=DUPLICATE_THRESHOLD) -> list:
+    """
+    Encodes texts in a single batch, drops duplicates and stores the rest with one
+    SQLite transaction and one log write. Returns the ids of the memories added.
+    """
+    if not texts:
+        return []
+    vectors = EMBEDDINGS.encode(list(texts))
+    # The duplicate check and the insert share the lock, so two concurrent batches
+    # carrying the same text cannot both pass the check
+    with _store_lock:
+        keep = _filter_duplicates(vectors, threshold)
+        if not keep.any():
+            return []
+        vectors = vectors[keep]
+        kept_texts = [text for text, k in zip(texts, keep) if k]
+        kept_metas = [meta for meta, k in zip(metas, keep) if k]
+        ids = store.insert_many(kept_texts, kept_metas)
+        _append_wal(vectors, [{"id": i} for i in ids])
+        index.add(vectors, ids)
+    return ids
 
 def add_to_vector_store(text: str, meta: dict):
-    if is_duplicate(text):
-        return  # Skip duplicate
-    
-    vector = MODEL.encode([text])
-    index.add(np.array(vector, dtype="float32"))
-    metadata.append({**meta, "text": text})
-    save_vector_store()
-
-def search_vector_store(query: str, top_k=3):
+    ids = add_many([text], [meta])
+    return ids[0] if ids else None
+
+def search_vector_store(query: str, top_k=3, topic: str = None, source: str = None):
     if index.ntotal == 0:
         return []
 
-    query_vec = MODEL.encode([query])
-    D, I = index.search(np.array(query_vec, dtype="float32"), top_k)
+    allowed = store.ids(topic=topic, source=source) if topic is not None or source is not None else None
+    if allowed is not None and not allowed:
+        return []
+
+    query_vec = EMBEDDINGS.encode([query])
+    D, I = index.search(query_vec, top_k, allowed_ids=allowed)
+    hits = [(int(i), float(score)) for i, score in zip(I[0], D[0]) if i >= 0]
+    rows = store.get([i for i, _ in hits])
 
     results = []
-    for idx, dist in zip(I[0], D[0]):
-        if idx < len(metadata):
-            result = metadata[idx].copy()
-            result["score"] = float(1.0 - dist)  # or just use `-dist` to make it similarity-like
+    for i, score in hits:
+        if i in rows:
+            result = rows[i]
+            result["score"] = score  # cosine similarity
             results.append(result)
     return results
 
 
-def is_duplicate(text: str, threshold=0.9) -> bool:
+def is_duplicate(text: str, threshold=DUPLICATE_THRESHOLD) -> bool:
     results = search_vector_store(text, top_k=1)
     return results and results[0]['score'] > threshold
-
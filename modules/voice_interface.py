@@ -1,63 +1,148 @@
 # modules/voice_interface.py
-import speech_recognition as sr
-from TTS.api import TTS
-import sounddevice as sd
-import numpy as np
 import threading
 import queue
 import re
 import uuid
+import time
+import os
+from concurrent.futures import ThreadPoolExecutor, wait, TimeoutError as FuturesTimeoutError
 from modules.mood_manager import MoodManager
-
-recognizer = sr.Recognizer()
-tts = TTS(model_name="tts_models/en/jenny/jenny")
-default_wav_greet = tts.tts("Yes sir.")
-default_wav_goodbye = tts.tts("Goodbye Sir. Have a great day.")
-
-# Shared components
-speak_queue = queue.Queue()
+from modules.lazy_loader import LazyModel
+from modules.logger import log
+from modules.tracing import tracer
+from modules.tts_cache import AudioCache
+from modules.audio_output import AudioOutput
+from modules.audio_input import microphone
+from modules.stt_backend import create_stt, transcribe, UnrecognizedSpeech, STTUnavailable
+
+TTS_MODEL = "tts_models/en/jenny/jenny"
+GREETING = "Hello Sir. I am Sanya, Your Systematic Artificial Neural Yielded Assistant. How can I help you today?"
+GOODBYE = "Goodbye Sir. Have a great day."
+# Synthesised into the cache at startup so they are never waited for
+COMMON_PHRASES = [
+    "Yes sir.", GREETING, GOODBYE,
+    "Sorry, I didn't catch that.", "Speech service is down.",
+    "I couldn't process that command.", "Unknown task.",
+]
+SENTENCE_BREAK = re.compile(r'(?<=[.!?])\s+')
+# Sentences synthesised in parallel, and how many may be synthesised ahead of playback
+TTS_WORKERS = int(os.getenv("SANYA_TTS_WORKERS", "2"))
+TTS_LOOKAHEAD = int(os.getenv("SANYA_TTS_LOOKAHEAD", "3"))
+# How soon after the wake word speech counts as part of the same utterance
+CONTINUATION_SECONDS = 0.4
+# Speech that must run this long, uninterrupted, to count as a continuation; the wake
+# word's own tail and clicks are shorter. The noise floor is seeded from the audio
+# before the wake word, skipping WAKE_WORD_SECONDS for the word itself.
+CONTINUATION_SPEECH = 0.24
+NOISE_SAMPLE_SECONDS = 1.0
+WAKE_WORD_SECONDS = 1.0
+
+stt = create_stt()
+tts = LazyModel("tts", lambda api: api.TTS(model_name=TTS_MODEL), "TTS.api")
+audio_cache = AudioCache(TTS_MODEL)
+
+
+def _synthesize(sentence):
+    with tracer.span("tts.synth"):
+        return tts.tts(sentence)
+
+
+def synthesize(sentence, mood="neutral"):
+    """Audio for one sentence, from the cache when it has been spoken before in this mood."""
+    return audio_cache.synthesize(sentence, mood, _synthesize)
+
+
+common_phrases = LazyModel("tts_phrases", lambda: audio_cache.warm(
+    [sentence for phrase in COMMON_PHRASES for sentence in SENTENCE_BREAK.split(phrase)], "neutral", _synthesize,
+))
+
+# Shared components. The speak queue carries synthesis futures in sentence order, so
+# its size is the look-ahead window.
+synth_pool = ThreadPoolExecutor(max_workers=TTS_WORKERS, thread_name_prefix="tts")
+speak_queue = queue.Queue(maxsize=TTS_LOOKAHEAD)
 queue_condition = threading.Condition()
 speak_interrupt = threading.Event()
-audio_lock = threading.Lock()
+output = AudioOutput()
 play_token = None
 producer_thread = None
 consumer_thread = None
 
 
-def _play_queue(token):
+def _interrupted(token) -> bool:
+    return speak_interrupt.is_set() or token != play_token
+
+
+def _put_chunk(item, token) -> bool:
+    """Queues a synthesis future (or the end marker), waiting while the window is full."""
+    while not _interrupted(token):
+        try:
+            speak_queue.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _drain_queue():
+    """Empties the speak queue, cancelling syntheses that have not started."""
     while True:
         try:
-            wav_chunk = speak_queue.get(timeout=0.1)
+            item = speak_queue.get_nowait()
         except queue.Empty:
-            if speak_interrupt.is_set() or token != play_token:
+            return
+        if item is not None:
+            item.cancel()
+
+
+def _play_queue(token, started=None):
+    """Plays queued chunks until the end marker; `started` is when the speech was requested."""
+    first_chunk = True
+    underruns = output.underruns
+    while True:
+        try:
+            item = speak_queue.get(timeout=0.1)
+        except queue.Empty:
+            if _interrupted(token):
                 break
             continue
 
-        if speak_interrupt.is_set() or token != play_token:
+        if _interrupted(token):
             break
-        if wav_chunk is None:
+        if item is None:
+            output.end()
+            if output.wait_played(lambda: _interrupted(token)) and started is not None:
+                tracer.record("tts.total", time.perf_counter() - started)
             break
 
-        with audio_lock:
-            sd.play(np.array(wav_chunk), samplerate=tts.synthesizer.output_sample_rate)
-
-        duration = len(wav_chunk) / tts.synthesizer.output_sample_rate
-        waited = 0
-        while waited < duration:
-            if speak_interrupt.is_set() or token != play_token:
-                with audio_lock:
-                    sd.stop()
+        wav_chunk = None
+        while wav_chunk is None and not _interrupted(token):
+            try:
+                wav_chunk = item.result(timeout=0.1)
+            except FuturesTimeoutError:
+                continue
+            except Exception as e:
+                log.error(f"[Audio] TTS error: {e}")
                 break
-            sd.sleep(50)
-            waited += 0.05
-
-        if speak_interrupt.is_set() or token != play_token:
+        if wav_chunk is None:
+            continue  # interrupted (checked at the top) or this sentence failed
+
+        if first_chunk:
+            output.start(tts.synthesizer.output_sample_rate)
+            output.begin()
+            if started is not None:
+                tracer.record("tts.first_chunk", time.perf_counter() - started)
+                tracer.since("heard", "turn.first_audio")
+            first_chunk = False
+        # Returns once the chunk is buffered, so the next one follows without a gap
+        if not output.write(wav_chunk, lambda: _interrupted(token)):
             break
 
-    with audio_lock:
-        sd.stop()
-    with speak_queue.mutex:
-        speak_queue.queue.clear()
+    output.end()
+    if _interrupted(token):
+        output.clear()
+    if output.underruns != underruns:
+        log.debug(f"[Audio] {output.underruns - underruns} output underruns during playback")
+    _drain_queue()
     speak_interrupt.clear()
 
 
@@ -68,7 +153,11 @@ def reset_audio_state():
     stop_all_audio()
 
     with queue_condition:
-        speak_queue.put(None)
+        _drain_queue()
+        try:
+            speak_queue.put_nowait(None)
+        except queue.Full:
+            pass  # the player is woken by the interrupt flag either way
         queue_condition.notify_all()
 
     if producer_thread and producer_thread.is_alive():
@@ -76,115 +165,188 @@ def reset_audio_state():
     if consumer_thread and consumer_thread.is_alive():
         consumer_thread.join(timeout=0.2)
 
-    with speak_queue.mutex:
-        speak_queue.queue.clear()
+    _drain_queue()
 
     speak_interrupt.clear()
 
 mood_manager = MoodManager()
 
-def speak(text, flag=0):
-    global producer_thread, consumer_thread, play_token
+class SpeechStream:
+    """
+    An utterance whose text arrives over time. Sentences passed to say() are
+    synthesised and played in order while later ones are still being written;
+    close() marks the end of the utterance.
+    """
 
-    # Adjust text based on mood
-    text = mood_manager.adjust_response(text)
-    mood = mood_manager.current_mood
+    def __init__(self):
+        self.sentences = queue.Queue()
+
+    def say(self, text: str):
+        for sentence in SENTENCE_BREAK.split(text.strip()):
+            if sentence:
+                self.sentences.put(sentence)
+
+    def close(self):
+        self.sentences.put(None)
+
+
+def iter_sentences(chunks):
+    """Regroups streamed text chunks into complete sentences as soon as each one ends."""
+    pending = ""
+    for chunk in chunks:
+        pending += chunk
+        *complete, pending = SENTENCE_BREAK.split(pending)
+        for sentence in complete:
+            if sentence.strip():
+                yield sentence.strip()
+    if pending.strip():
+        yield pending.strip()
 
-    print(f"[Audio] Speaking: {text} (flag={flag}, mood={mood})")
-    with open("logs/sanya.log", "a", encoding="utf-8") as log_file:
-        log_file.write(f"[Audio] Speaking: {text} (flag={flag}, mood={mood})\n")
+
+def _start_speech(mood) -> SpeechStream:
+    global producer_thread, consumer_thread, play_token
 
     reset_audio_state()
 
+    started = time.perf_counter()
     new_token = uuid.uuid4()
     play_token = new_token
     this_token = play_token
-
-    if flag != 0:
-        default_greet(flag)
-        return
-
-    sentences = re.split(r'(?<=[.!?]) +', text)
+    stream = SpeechStream()
 
     def enqueue_sentences():
-        print("[Audio] Starting enqueue_sentences thread")
-        with open("logs/sanya.log", "a", encoding="utf-8") as log_file:
-            log_file.write("[Audio] Starting enqueue_sentences thread\n")
-        for sentence in sentences:
-            if speak_interrupt.is_set() or play_token != this_token:
-                print("[Audio] Enqueue interrupted or token mismatch, exiting")
-                with open("logs/sanya.log", "a", encoding="utf-8") as log_file:
-                    log_file.write("[Audio] Enqueue interrupted or token mismatch, exiting\n")
+        """
+        Hands each sentence to the synthesis pool and queues its future in sentence
+        order; the player waits on them in turn. The first sentence is synthesised
+        alone so it is not slowed down by the ones behind it.
+        """
+        log.debug("[Audio] Starting enqueue_sentences thread")
+        first = None
+        while True:
+            if _interrupted(this_token):
+                log.debug("[Audio] Enqueue interrupted or token mismatch, exiting")
                 return
             try:
-                # Simulate emotion by adjusting TTS parameters (placeholder)
-                wav_chunk = tts.tts(sentence)
-                print(f"[Audio] Generated TTS for: {sentence} (mood={mood})")
-                with open("logs/sanya.log", "a", encoding="utf-8") as log_file:
-                    log_file.write(f"[Audio] Generated TTS for: {sentence} (mood={mood})\n")
-            except Exception as e:
-                print(f"[Audio] TTS error: {e}")
-                with open("logs/sanya.log", "a", encoding="utf-8") as log_file:
-                    log_file.write(f"[Audio] TTS error: {e}\n")
-                return
-            if speak_interrupt.is_set() or play_token != this_token:
-                print("[Audio] Enqueue interrupted or token mismatch after TTS, exiting")
-                with open("logs/sanya.log", "a", encoding="utf-8") as log_file:
-                    log_file.write("[Audio] Enqueue interrupted or token mismatch after TTS, exiting\n")
+                sentence = stream.sentences.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if sentence is None:
+                break
+            while first is not None and not first.done():
+                if _interrupted(this_token):
+                    return
+                wait([first], timeout=0.1)
+            # Simulate emotion by adjusting TTS parameters (placeholder)
+            future = synth_pool.submit(synthesize, sentence, mood)
+            first = first or future
+            if not _put_chunk(future, this_token):
+                future.cancel()
+                log.debug("[Audio] Enqueue interrupted or token mismatch, exiting")
                 return
-            with queue_condition:
-                speak_queue.put(wav_chunk)
-                print(f"[Audio] Queued sentence: {sentence}")
-                with open("logs/sanya.log", "a", encoding="utf-8") as log_file:
-                    log_file.write(f"[Audio] Queued sentence: {sentence}\n")
-
-        with queue_condition:
-            speak_queue.put(None)
-            print("[Audio] Enqueue complete, added None to queue")
-            with open("logs/sanya.log", "a", encoding="utf-8") as log_file:
-                log_file.write("[Audio] Enqueue complete, added None to queue\n")
+            log.debug(f"[Audio] Queued sentence: {sentence} (mood={mood})")
+
+        if _put_chunk(None, this_token):
+            log.debug("[Audio] Enqueue complete, added None to queue")
 
     producer_thread = threading.Thread(target=enqueue_sentences, daemon=True)
-    consumer_thread = threading.Thread(target=_play_queue, args=(this_token,), daemon=True)
+    consumer_thread = threading.Thread(target=_play_queue, args=(this_token, started), daemon=True)
 
     producer_thread.start()
     consumer_thread.start()
+    return stream
+
+
+def speak(text, flag=0):
+    global play_token
+
+    # Adjust text based on mood
+    text = mood_manager.adjust_response(text)
+    mood = mood_manager.current_mood
+
+    log.info(f"[Audio] Speaking: {text} (flag={flag}, mood={mood})")
+
+    if flag != 0:
+        reset_audio_state()
+        play_token = uuid.uuid4()
+        default_greet(flag)
+        return
+
+    stream = _start_speech(mood)
+    stream.say(text)
+    stream.close()
+
+
+def speak_stream() -> SpeechStream:
+    """
+    Starts an utterance whose sentences are supplied as they become available, e.g.
+    from iter_sentences over a streamed LLM reply. The mood prefix speak() would add
+    is spoken first. The caller must close() the returned stream.
+    """
+    prefix = mood_manager.adjust_response("").strip()
+    mood = mood_manager.current_mood
+    log.info(f"[Audio] Speaking streamed reply (mood={mood})")
+
+    stream = _start_speech(mood)
+    if prefix:
+        stream.say(prefix)
+    return stream
 
 
 def default_greet(flag):
-    wav_np = np.array(default_wav_greet if flag == 1 else default_wav_goodbye)
-    with audio_lock:
-        sd.play(wav_np, samplerate=tts.synthesizer.output_sample_rate)
-        sd.wait()
-
-
-def listen():
-    with sr.Microphone() as source:
-        print("🎤 Listening...")
-        with open("logs/sanya.log", "a", encoding="utf-8") as log_file:
-            log_file.write("🎤 Listening...\n")
-        audio = recognizer.listen(source)
-        try:
-            transcript = recognizer.recognize_google(audio)
-            print(f"Transcript: {transcript}")
-            with open("logs/sanya.log", "a", encoding="utf-8") as log_file:
-                log_file.write(f"Transcript: {transcript}\n")
-            return transcript
-        except sr.UnknownValueError:
-            error_msg = "Sorry, I didn't catch that."
-            print(error_msg)
-            with open("logs/sanya.log", "a", encoding="utf-8") as log_file:
-                log_file.write(f"{error_msg}\n")
-            return error_msg
-        except sr.RequestError:
-            error_msg = "Speech service is down."
-            print(error_msg)
-            with open("logs/sanya.log", "a", encoding="utf-8") as log_file:
-                log_file.write(f"{error_msg}\n")
-            return error_msg
+    phrase = "Yes sir." if flag == 1 else GOODBYE
+    output.start(tts.synthesizer.output_sample_rate)
+    for sentence in SENTENCE_BREAK.split(phrase):
+        output.write(synthesize(sentence))
+    output.wait_played()
+
+
+def speech_started(since: int, seconds: float = CONTINUATION_SECONDS) -> bool:
+    """
+    Whether the microphone picks up sustained speech within `seconds` after capture
+    position `since`, judged by the STT backend's calibrated voice detector.
+    """
+    microphone.start()
+    vad = stt.detector(microphone.samplerate)
+    noise_end = since - microphone.seconds_to_frames(WAKE_WORD_SECONDS)
+    noise = microphone.frames(noise_end - microphone.seconds_to_frames(NOISE_SAMPLE_SECONDS), noise_end)
+    vad.calibrate(noise.reshape(-1, microphone.frame_samples), microphone.frame_seconds)
+
+    needed = max(microphone.seconds_to_frames(CONTINUATION_SPEECH), 2)
+    end = since + microphone.seconds_to_frames(seconds)
+    position, streak = since, 0
+    while position < end:
+        position, frame = microphone.read(position)
+        if frame is None:
+            return False
+        streak = streak + 1 if vad.is_speech(frame, microphone.frame_seconds) else 0
+        if streak >= needed:
+            return True
+        position += 1
+    return False
+
+
+def listen(since: int = None, on_partial=None):
+    """
+    Transcribes the next spoken phrase with the configured STT backend. `since` is a
+    capture position to start from, e.g. the one wait_for_wake_word() returned when
+    the command follows the wake word without a pause; by default listening starts
+    now. Backends that decode while audio arrives pass partial transcripts to
+    on_partial(text).
+    """
+    log.info("🎤 Listening...")
+    try:
+        transcript = transcribe(stt, since, on_partial)
+        log.info(f"Transcript: {transcript}")
+        return transcript
+    except UnrecognizedSpeech:
+        error_msg = "Sorry, I didn't catch that."
+        log.warning(error_msg)
+        return error_msg
+    except STTUnavailable:
+        error_msg = "Speech service is down."
+        log.warning(error_msg)
+        return error_msg
 
 
 def stop_all_audio():
-    with audio_lock:
-        sd.stop()
-        sd.sleep(100)
+    output.clear()
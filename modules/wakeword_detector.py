@@ -1,31 +1,47 @@
-import sounddevice as sd
-import numpy as np
-from openwakeword.model import Model
 import os
+import time
+from modules.lazy_loader import LazyModel
+from modules.logger import log
+from modules.tracing import tracer
+from modules.audio_input import microphone
 
-wake_model = Model(
-    wakeword_models=[os.path.join("custom_wake_word", "sanya", "sanya.onnx")]
+wake_model = LazyModel(
+    "wake_word",
+    lambda oww: oww.Model(wakeword_models=[os.path.join("custom_wake_word", "sanya", "sanya.onnx")]),
+    "openwakeword.model",
 )
 
-samplerate = 16000
-frame_duration = 1.0  # in seconds
-frame_length = int(samplerate * frame_duration)
+WAKE_THRESHOLD = float(os.getenv("SANYA_WAKE_THRESHOLD", "0.4"))
+# Consecutive 80 ms frames that must score above the threshold, and seconds after a
+# detection during which the wake word is ignored (the model still hears its tail)
+WAKE_PATIENCE = int(os.getenv("SANYA_WAKE_PATIENCE", "1"))
+WAKE_DEBOUNCE = float(os.getenv("SANYA_WAKE_DEBOUNCE", "1.5"))
+last_detection = 0.0
 
-def wait_for_wake_word():
-    print("🟢 Wake word listener active...")
-    with open("logs/sanya.log", "a", encoding="utf-8") as log_file:
-        log_file.write("🟢 Wake word listener active...\n")
-    with sd.InputStream(channels=1, samplerate=samplerate, dtype='int16', blocksize=frame_length) as stream:
-        while True:
-            audio_data, _ = stream.read(frame_length)
-            audio = np.squeeze(audio_data)
+def wait_for_wake_word() -> int:
+    """
+    Scores the shared microphone stream frame by frame from now on and returns the
+    capture position just after the frame that completed the wake word.
+    """
+    global last_detection
+    log.info("🟢 Wake word listener active...")
+    microphone.start()
+    position = microphone.position
+    streak = 0
+    while True:
+        position, frame = microphone.read(position)
+        if frame is None:
+            continue
+        position += 1
 
-            prediction = wake_model.predict(audio)
-            print(prediction)
-            with open("logs/sanya.log", "a", encoding="utf-8") as log_file:
-                log_file.write(f"{prediction}\n")
-            if prediction.get("sanya", 0) > 0.4:
-                print("🔊 Wake word 'Sanya' detected!")
-                with open("logs/sanya.log", "a", encoding="utf-8") as log_file:
-                    log_file.write("🔊 Wake word 'Sanya' detected!\n")
-                return
\ No newline at end of file
+        start = time.perf_counter()
+        prediction = wake_model.predict(frame)
+        log.debug(f"{prediction}")
+        streak = streak + 1 if prediction.get("sanya", 0) > WAKE_THRESHOLD else 0
+        if streak >= WAKE_PATIENCE and time.monotonic() - last_detection >= WAKE_DEBOUNCE:
+            tracer.record("wake.detect", time.perf_counter() - start)
+            tracer.mark("wake")
+            last_detection = time.monotonic()
+            wake_model.reset()
+            log.info("🔊 Wake word 'Sanya' detected!")
+            return position
@@ -0,0 +1,252 @@
+import os
+import io
+import gzip
+import time
+import atexit
+import threading
+import http.client
+import email.utils
+from functools import partial
+from collections import OrderedDict
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+from modules.logger import log
+
+WEB_PORT_BASE = int(os.getenv("SANYA_WEB_PORT", "8000"))
+PORT_POOL = range(WEB_PORT_BASE, WEB_PORT_BASE + 50)
+IDLE_TIMEOUT = 30 * 60  # seconds without a request before a server is stopped
+REAP_INTERVAL = 60
+GZIP_MIN_BYTES = 512
+GZIP_TYPES = ("text/", "application/javascript", "application/json", "image/svg+xml")
+# Per-server body cache, least recently used first out; larger files are read each time
+BODY_CACHE_BYTES = 32 * 1024 * 1024
+BODY_CACHE_MAX_FILE = 2 * 1024 * 1024
+
+
+class StaticHandler(SimpleHTTPRequestHandler):
+    """
+    Static file handler serving from its server's directory with keep-alive, strong
+    ETags (answering If-None-Match with 304) and gzip for text types. Bodies are
+    cached per file version, within the server's BODY_CACHE_BYTES budget.
+    """
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; without TCP_NODELAY keep-alive
+    # requests stall on delayed ACKs
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass  # per-request lines would flood the console; the registry keeps counts
+
+    def send_head(self):
+        self.server.touch()
+        path = self.translate_path(self.path)
+        if os.path.isdir(path) and self.path.split("?", 1)[0].endswith("/"):
+            path = os.path.join(path, "index.html")
+        if not os.path.isfile(path):
+            return super().send_head()  # directory redirects, listings and 404s
+
+        stat = os.stat(path)
+        etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+        ctype = self.guess_type(path)
+        wants_gzip = (
+            "gzip" in self.headers.get("Accept-Encoding", "")
+            and ctype.startswith(GZIP_TYPES)
+            and stat.st_size >= GZIP_MIN_BYTES
+        )
+        if etag in (tag.strip() for tag in self.headers.get("If-None-Match", "").split(",")):
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return None
+
+        body = self.server.body(path, etag, wants_gzip)
+        self.send_response(200)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", email.utils.formatdate(stat.st_mtime, usegmt=True))
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Vary", "Accept-Encoding")
+        if wants_gzip:
+            self.send_header("Content-Encoding", "gzip")
+        self.end_headers()
+        return io.BytesIO(body)
+
+
+class SiteServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, directory: str, port: int):
+        self.directory = os.path.abspath(directory)
+        super().__init__(("", port), partial(StaticHandler, directory=self.directory))
+        self.port = port
+        self.started_at = time.time()
+        self.last_request = self.started_at
+        self.requests = 0
+        self.cache = OrderedDict()  # (path, etag, gzip) -> body, least recently used first
+        self.cache_bytes = 0
+        self.lock = threading.Lock()
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True, name=f"web-{port}")
+
+    def touch(self):
+        with self.lock:
+            self.last_request = time.time()
+            self.requests += 1
+
+    def body(self, path: str, etag: str, compressed: bool) -> bytes:
+        key = (path, etag, compressed)
+        with self.lock:
+            cached = self.cache.get(key)
+            if cached is not None:
+                self.cache.move_to_end(key)
+        if cached is None:
+            with open(path, "rb") as f:
+                cached = f.read()
+            if compressed:
+                cached = gzip.compress(cached, compresslevel=6)
+            if len(cached) > BODY_CACHE_MAX_FILE:
+                return cached
+            with self.lock:
+                # Drop older versions of the same file, then the least recently used
+                for old in [k for k in self.cache if k[0] == path and k[1] != etag]:
+                    self.cache_bytes -= len(self.cache.pop(old))
+                self.cache_bytes += len(cached) - len(self.cache.pop(key, b""))
+                self.cache[key] = cached
+                while self.cache_bytes > BODY_CACHE_BYTES:
+                    self.cache_bytes -= len(self.cache.popitem(last=False)[1])
+        return cached
+
+    def info(self) -> dict:
+        return {
+            "url": f"http://localhost:{self.port}",
+            "port": self.port,
+            "directory": self.directory,
+            "requests": self.requests,
+            "uptime": round(time.time() - self.started_at, 1),
+            "idle": round(time.time() - self.last_request, 1),
+        }
+
+
+class ServerRegistry:
+    """
+    Tracks running site servers: one per directory, on ports taken from PORT_POOL.
+    Servers idle for longer than IDLE_TIMEOUT are stopped by a background reaper,
+    and all of them at exit.
+    """
+
+    def __init__(self, ports=PORT_POOL, idle_timeout: float = IDLE_TIMEOUT):
+        self.ports = ports
+        self.idle_timeout = idle_timeout
+        self.servers = {}  # port -> SiteServer
+        self.lock = threading.Lock()
+        self.reaper = None
+        atexit.register(self.stop_all)
+
+    def start(self, directory: str, port: int = None) -> SiteServer:
+        directory = os.path.abspath(directory)
+        with self.lock:
+            for server in self.servers.values():
+                if server.directory == directory:
+                    return server
+            candidates = [port] if port else [p for p in self.ports if p not in self.servers]
+            for candidate in candidates:
+                try:
+                    server = SiteServer(directory, candidate)
+                    break
+                except OSError:
+                    continue
+            else:
+                raise OSError(f"No free port for {directory} (tried {candidates[0]}-{candidates[-1]})" if candidates else "Port pool exhausted")
+            self.servers[server.port] = server
+            server.thread.start()
+            if self.reaper is None:
+                self.reaper = threading.Thread(target=self._reap, daemon=True, name="web-reaper")
+                self.reaper.start()
+        log.info(f"[WebServer] Serving {directory} at http://localhost:{server.port}")
+        return server
+
+    def find(self, target):
+        """Accepts a port, a directory or a SiteServer."""
+        with self.lock:
+            if isinstance(target, SiteServer):
+                return target if self.servers.get(target.port) is target else None
+            if isinstance(target, int) or str(target).isdigit():
+                return self.servers.get(int(target))
+            directory = os.path.abspath(str(target))
+            return next((s for s in self.servers.values() if s.directory == directory), None)
+
+    def stop(self, target) -> bool:
+        server = self.find(target)
+        if server is None:
+            return False
+        with self.lock:
+            self.servers.pop(server.port, None)
+        server.shutdown()
+        server.server_close()
+        log.info(f"[WebServer] Stopped server on port {server.port} ({server.requests} requests)")
+        return True
+
+    def stop_all(self):
+        for port in list(self.servers):
+            self.stop(port)
+
+    def list(self) -> list:
+        with self.lock:
+            return [server.info() for server in sorted(self.servers.values(), key=lambda s: s.port)]
+
+    def _reap(self):
+        while True:
+            time.sleep(REAP_INTERVAL)
+            now = time.time()
+            with self.lock:
+                idle = [port for port, s in self.servers.items() if now - s.last_request > self.idle_timeout]
+            for port in idle:
+                log.info(f"[WebServer] Stopping idle server on port {port}")
+                self.stop(port)
+
+
+def benchmark(port: int, path: str = "/", requests: int = 500, concurrency: int = 8, gzip_accepted: bool = True) -> dict:
+    """
+    Measures requests per second against a running server using `concurrency`
+    keep-alive connections, and reports latency percentiles in milliseconds.
+    """
+    latencies = []
+    lock = threading.Lock()
+    per_worker = max(requests // concurrency, 1)
+    headers = {"Accept-Encoding": "gzip"} if gzip_accepted else {}
+
+    def worker():
+        connection = http.client.HTTPConnection("localhost", port, timeout=10)
+        local = []
+        for _ in range(per_worker):
+            start = time.perf_counter()
+            connection.request("GET", path, headers=headers)
+            connection.getresponse().read()
+            local.append(time.perf_counter() - start)
+        connection.close()
+        with lock:
+            latencies.extend(local)
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    pick = lambda q: round(latencies[min(int(q * len(latencies)), len(latencies) - 1)] * 1000, 2)
+    result = {
+        "requests": len(latencies),
+        "seconds": round(elapsed, 3),
+        "requests_per_second": round(len(latencies) / elapsed, 1),
+        "p50_ms": pick(0.50),
+        "p95_ms": pick(0.95),
+        "p99_ms": pick(0.99),
+    }
+    log.info(f"[WebServer] Benchmark on port {port}: {result}")
+    return result
+
+
+registry = ServerRegistry()
@@ -0,0 +1,23 @@
+import os
+import sys
+import tempfile
+import types
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Importing the modules under test starts the log writer and the tracer; keep their
+# files out of the working tree. Subprocesses started by tests inherit these too.
+LOG_DIR = tempfile.mkdtemp(prefix="sanya-tests-")
+os.environ.setdefault("SANYA_LOG_FILE", os.path.join(LOG_DIR, "sanya.log"))
+os.environ.setdefault("SANYA_TRACE_FILE", os.path.join(LOG_DIR, "trace.tsv"))
+
+# Audio modules import sounddevice at the top, but no test opens a stream. Machines
+# without it (or without PortAudio) get a stand-in that refuses to.
+try:
+    import sounddevice  # noqa: F401
+except (ImportError, OSError):
+    def _no_device(*args, **kwargs):
+        raise RuntimeError("sounddevice is not available in tests")
+
+    sys.modules["sounddevice"] = types.SimpleNamespace(InputStream=_no_device, OutputStream=_no_device)
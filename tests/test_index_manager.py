@@ -0,0 +1,78 @@
+import time
+import numpy as np
+import pytest
+
+faiss = pytest.importorskip("faiss")
+
+from modules.index_manager import IndexManager
+
+DIM = 32
+THRESHOLD = 300  # small stand-in for the 20000-vector HNSW tier
+
+
+def make_manager() -> IndexManager:
+    return IndexManager(faiss.IndexIDMap(faiss.IndexFlatIP(DIM)), tiers=[(THRESHOLD, "HNSW32")])
+
+
+def vectors(count: int, seed: int = 0) -> np.ndarray:
+    return np.random.default_rng(seed).standard_normal((count, DIM)).astype("float32")
+
+
+def wait_for_ann(manager: IndexManager, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with manager.lock:
+            if manager.ann is not None and not manager.building:
+                return
+        time.sleep(0.01)
+    raise AssertionError("approximate index was never swapped in")
+
+
+def test_tier_swap_keeps_ids():
+    manager = make_manager()
+    data = vectors(THRESHOLD - 1)
+    ids = np.arange(1, THRESHOLD, dtype="int64") * 10  # ids are not row numbers
+    manager.add(data, ids)
+    assert manager.ann is None
+
+    manager.add(vectors(1, seed=1), [THRESHOLD * 10])
+    wait_for_ann(manager)
+    assert manager.ann_spec == "HNSW32"
+    assert manager.ann.ntotal == manager.ntotal == THRESHOLD
+
+    _, found = manager.search(data[:50], 1)
+    assert found[:, 0].tolist() == ids[:50].tolist()
+
+
+def test_deleted_ids_never_come_back():
+    manager = make_manager()
+    data = vectors(THRESHOLD + 100)
+    ids = np.arange(1, len(data) + 1, dtype="int64")
+    manager.add(data, ids)
+    wait_for_ann(manager)
+
+    # Few enough deletions to stay below the rebuild ratio: HNSW keeps them as tombstones
+    deleted = ids[:20]
+    manager.remove(deleted)
+    assert manager.tombstones == set(deleted.tolist())
+
+    k = 10
+    _, found = manager.search(data[:20], k)
+    assert not set(found.ravel().tolist()) & set(deleted.tolist())
+    _, found = manager.search(data[:20], k, allowed_ids=ids[:40])  # filtered, exact path
+    assert not set(found.ravel().tolist()) & set(deleted.tolist())
+    assert set(found.ravel().tolist()) - {-1} <= set(ids[20:40].tolist())
+
+    # Past the ratio the index is rebuilt without them, and they stay gone
+    more = ids[20:80]
+    manager.remove(more)
+    wait_for_ann(manager)
+    assert not manager.tombstones
+    gone = set(deleted.tolist()) | set(more.tolist())
+    _, found = manager.search(data[:80], k)
+    assert not set(found.ravel().tolist()) & gone
+    assert manager.ntotal == len(ids) - len(gone)
+
+    # Dropping back below the threshold returns to exact search
+    manager.remove(ids[80:])
+    assert manager.ann is None and manager.ntotal == 0
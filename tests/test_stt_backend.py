@@ -0,0 +1,61 @@
+import os
+import wave
+import numpy as np
+import pytest
+from modules.stt_backend import (
+    FixtureBackend, WavSource, Endpointer, VoiceActivityDetector, UnrecognizedSpeech,
+    VAD_SILENCE, transcribe,
+)
+
+FIXTURES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "fixtures", "speech")
+
+# open_notepad.wav: 0.5 s of room noise, two voiced bursts (1.22 s with the short gap
+# between them), then 0.8 s of room noise.
+SPEECH_START, SPEECH_END = 0.5, 1.72
+
+
+def energy_backend(directory=FIXTURES):
+    """A fixture backend whose detector is the energy fallback, whatever is installed."""
+    backend = FixtureBackend(directory)
+    backend.detector(16000).vad = None
+    return backend
+
+
+def test_fixture_transcript_and_partials():
+    backend = energy_backend()
+    partials = []
+    assert transcribe(backend, on_partial=partials.append) == "open notepad"
+    assert partials[-1] == "open notepad"
+    assert all(later.startswith(earlier) for earlier, later in zip(partials, partials[1:]))
+
+    stats = backend.stats()
+    assert stats["backend"] == "fixture"
+    assert stats["utterances"] == 1
+    assert stats["real_time_factor"] is not None
+
+
+def test_endpointer_stops_after_trailing_silence():
+    source = WavSource(os.path.join(FIXTURES, "open_notepad.wav"))
+    endpointer = Endpointer(source, VoiceActivityDetector(source.samplerate))
+    endpointer.vad.vad = None
+    frames = list(endpointer.frames(0))
+
+    assert endpointer.heard
+    # The gap between the two bursts is shorter than VAD_SILENCE, so it is one phrase,
+    # ended by the trailing silence well before the file runs out.
+    heard_seconds = len(frames) * source.frame_seconds
+    assert SPEECH_END - SPEECH_START < heard_seconds < len(source.data) * source.frame_seconds
+    silence_frames = source.seconds_to_frames(VAD_SILENCE)
+    assert endpointer.endpoint_latency == pytest.approx(silence_frames * source.frame_seconds)
+
+
+def test_silence_is_unrecognized(tmp_path):
+    with wave.open(str(tmp_path / "silence.wav"), "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(16000)
+        f.writeframes(np.zeros(16000, dtype=np.int16).tobytes())
+    (tmp_path / "silence.txt").write_text("nothing", encoding="utf-8")
+
+    with pytest.raises(UnrecognizedSpeech):
+        transcribe(energy_backend(str(tmp_path)))
@@ -0,0 +1,156 @@
+import json
+import os
+import subprocess
+import sys
+import textwrap
+import pytest
+
+pytest.importorskip("faiss")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Each run is a fresh interpreter in tmp_path, so importing modules.vector_store is a
+# restart, and os._exit() in the middle of an operation is a crash. Embeddings come
+# from a deterministic stand-in so no model is downloaded.
+PRELUDE = textwrap.dedent(f"""
+    import hashlib, json, os, sys, types
+    import numpy as np
+    sys.path.insert(0, {ROOT!r})
+
+    class HashEmbedder:
+        def __init__(self, name):
+            pass
+
+        def encode(self, texts, **kwargs):
+            return np.array([
+                np.random.default_rng(int(hashlib.md5(t.encode()).hexdigest()[:8], 16)).standard_normal(384)
+                for t in texts
+            ], dtype="float32")
+
+    sys.modules["sentence_transformers"] = types.SimpleNamespace(SentenceTransformer=HashEmbedder)
+
+    def report():
+        import modules.vector_store as vs
+        ids = sorted(vs.store.ids())
+        texts = vs.store.texts(ids)
+        top = {{text: [hit["text"] for hit in vs.search_vector_store(text, top_k=len(ids) + 1)] for text in texts.values()}}
+        print(json.dumps({{
+            "rows": {{str(i): texts[i] for i in ids}},
+            "index_ids": sorted(int(i) for i in vs.index.ids()),
+            "top": top,
+        }}))
+""")
+
+TEXTS = ["remember the blue notebook", "my sister lives in Pune", "I prefer green tea"]
+
+
+def run(tmp_path, code: str) -> dict:
+    proc = subprocess.run(
+        [sys.executable, "-c", PRELUDE + textwrap.dedent(code)],
+        cwd=tmp_path, capture_output=True, text=True, timeout=120,
+    )
+    lines = [line for line in proc.stdout.splitlines() if line.startswith("{")]
+    if not lines:
+        raise AssertionError(f"exit {proc.returncode}\n{proc.stdout}\n{proc.stderr}")
+    return json.loads(lines[-1])
+
+
+def crash(tmp_path, code: str, exit_code: int = 1):
+    """Runs code that ends the process with os._exit(); checks the expected point was reached."""
+    proc = subprocess.run(
+        [sys.executable, "-c", PRELUDE + textwrap.dedent(code) + "\nos._exit(0)\n"],
+        cwd=tmp_path, capture_output=True, text=True, timeout=120,
+    )
+    assert proc.returncode == exit_code, proc.stderr
+
+
+def assert_consistent(state: dict, expected: dict):
+    """Rows are exactly `expected` (id -> text), each indexed and found first by its own text."""
+    assert state["rows"] == {str(i): text for i, text in expected.items()}
+    assert state["index_ids"] == sorted(expected)
+    for text, hits in state["top"].items():
+        assert hits[0] == text
+        assert len(hits) == len(expected)
+
+
+def test_wal_replay_after_crash(tmp_path):
+    crash(tmp_path, f"""
+        import modules.vector_store as vs
+        vs.add_many({TEXTS!r}, [{{"topic": "unknown"}}] * 3)
+        vs.delete_from_vector_store([2])
+        os._exit(1)  # nothing compacted; everything is in the log
+    """)
+    assert os.path.getsize(tmp_path / "memory/long_term/store.wal") > 0
+    state = run(tmp_path, "report()")
+    assert_consistent(state, {1: TEXTS[0], 3: TEXTS[2]})
+
+
+def test_torn_wal_tail_is_truncated_and_rows_recovered(tmp_path):
+    crash(tmp_path, f"""
+        import modules.vector_store as vs
+        vs.add_many({TEXTS[:2]!r}, [{{}}] * 2)
+        vs.add_many({TEXTS[2:]!r}, [{{}}])
+        os._exit(1)
+    """)
+    wal = tmp_path / "memory/long_term/store.wal"
+    size = wal.stat().st_size
+    with open(wal, "r+b") as f:
+        f.truncate(size - 7)  # the last record was only partly written
+
+    state = run(tmp_path, "report()")
+    # SQLite has the third row, so it is re-embedded rather than lost
+    assert_consistent(state, {1: TEXTS[0], 2: TEXTS[1], 3: TEXTS[2]})
+    # and the torn bytes are gone: a second restart reads the log cleanly
+    assert_consistent(run(tmp_path, "report()"), {1: TEXTS[0], 2: TEXTS[1], 3: TEXTS[2]})
+
+
+@pytest.mark.parametrize("crash_point", [
+    "vs._write_durable",   # log sealed, index not yet written
+    "vs.store.set_state",  # index replaced, checkpoint not recorded, sealed segment kept
+    "vs.os.remove",        # checkpoint recorded, sealed segment not yet deleted
+])
+def test_compaction_crash_loses_and_resurrects_nothing(tmp_path, crash_point):
+    crash(tmp_path, f"""
+        import modules.vector_store as vs
+        vs.add_many({TEXTS!r}, [{{}}] * 3)
+        vs.delete_from_vector_store([1])
+
+        def die(*args, **kwargs):
+            os._exit(1)
+
+        {crash_point} = die
+        vs.compact_vector_store()
+    """)
+    expected = {2: TEXTS[1], 3: TEXTS[2]}
+    assert_consistent(run(tmp_path, "report()"), expected)
+
+    # A clean compaction afterwards leaves only the checkpoint and an empty log
+    state = run(tmp_path, """
+        import modules.vector_store as vs
+        vs.add_many(["a fourth memory"], [{}])
+        vs.compact_vector_store()
+        report()
+    """)
+    expected[4] = "a fourth memory"
+    assert_consistent(state, expected)
+    assert sorted(os.listdir(tmp_path / "memory/long_term")) == ["index.faiss", "store.db", "store.wal"]
+    assert_consistent(run(tmp_path, "report()"), expected)
+
+
+def test_migrates_store_json_and_flat_l2_index(tmp_path):
+    # The pre-SQLite layout: a bare IndexFlatL2 over raw vectors, linked to store.json by row
+    crash(tmp_path, f"""
+        import faiss
+        os.makedirs("memory/long_term")
+        index = faiss.IndexFlatL2(384)
+        index.add(HashEmbedder(None).encode({TEXTS!r}))
+        faiss.write_index(index, "memory/long_term/index.faiss")
+        with open("memory/long_term/store.json", "w") as f:
+            json.dump({{"items": [{{"text": t, "topic": "unknown"}} for t in {TEXTS!r}], "last_seq": 0}}, f)
+    """, exit_code=0)
+    expected = {i + 1: text for i, text in enumerate(TEXTS)}
+    assert_consistent(run(tmp_path, "report()"), expected)
+    assert not (tmp_path / "memory/long_term/store.json").exists()
+    assert (tmp_path / "memory/long_term/store.json.migrated").exists()
+    # Migrating again on the next start must not duplicate anything
+    assert_consistent(run(tmp_path, "report()"), expected)